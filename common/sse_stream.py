@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Analyseur de flux SSE (Server-Sent Events) pour les réponses en streaming de l'API LLMaaS.
+
+Module partagé par les démos simple_tool_calling et simple_translate, qui l'importent depuis ce
+dossier. Il est volontairement autonome et entièrement annoté : il peut être compilé en extension
+native avec mypyc (`mypyc sse_stream.py`), sans modifier les scripts qui l'importent.
+"""
+import json
+from typing import Any, Callable, List
+
+try:
+    import orjson  # Optionnel : décodage JSON plus rapide des événements
+
+    _json_loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+_EVENT_END = b"\n\n"
+_DATA_PREFIX = b"data:"
+_DONE = b"[DONE]"
+
+
+def response_chunks(response: Any) -> Any:
+    """
+    Renvoie l'itérateur asynchrone des octets d'une réponse httpx en streaming.
+
+    Sans `Content-Encoding`, les octets sont lus bruts (`aiter_raw`), sans passer par la couche
+    de décodage de httpx. Aucune taille de chunk n'est imposée : httpx retiendrait alors les
+    octets jusqu'à en avoir accumulé autant, ce qui retarderait l'affichage des tokens.
+    """
+    if "content-encoding" in response.headers:
+        return response.aiter_bytes()
+    return response.aiter_raw()
+
+
+class SSEParser:
+    """
+    Découpe les octets reçus en événements SSE et renvoie leurs données JSON décodées.
+
+    Les chunks sont accumulés dans un tampon : seul un événement complet (terminé par une
+    ligne vide) est traité, si bien qu'un événement ou un caractère UTF-8 coupé entre deux
+    chunks reste intact. Les fins de ligne CRLF (`\\r\\n`) sont ramenées à `\\n`, y compris
+    quand le `\\r` et le `\\n` arrivent dans deux chunks différents. `done` passe à True à la
+    réception de `data: [DONE]`.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Ajoute un chunk au tampon et renvoie les événements qu'il a complétés."""
+        events: List[Any] = []
+        if self.done:
+            return events
+        buffer = self.buffer
+        buffer.extend(chunk)
+        if b"\r" in buffer:
+            # Le tampon ne contient que l'événement en cours : le normaliser en entier traite aussi
+            # un `\r` resté en fin de chunk précédent, dont le `\n` arrive dans ce chunk.
+            buffer = self.buffer = bytearray(buffer.replace(b"\r\n", b"\n"))
+        start = 0
+        while True:
+            end = buffer.find(_EVENT_END, start)
+            if end == -1:
+                break
+            event = bytes(buffer[start:end])
+            start = end + 2
+            if not event.startswith(_DATA_PREFIX):
+                continue
+            data = event[len(_DATA_PREFIX) :].strip()
+            if data == _DONE:
+                self.done = True
+                break
+            try:
+                events.append(_json_loads(data))
+            except ValueError:
+                continue  # Événement JSON invalide : ignoré
+        del buffer[:start]
+        return events
+
+
+if __name__ == "__main__":
+    # Auto-vérification : `python sse_stream.py`
+    stream = (
+        b'data: {"n": 1}\r\n\r\n'
+        b": commentaire\r\n\r\n"
+        b'data: {"n": 2, "texte": "\xc3\xa9t\xc3\xa9"}\n\n'
+        b'data: {"n": 3}\r\n\r\n'
+        b"data: [DONE]\r\n\r\n"
+        b'data: {"n": 4}\r\n\r\n'
+    )
+    expected = [{"n": 1}, {"n": 2, "texte": "été"}, {"n": 3}]
+    for size in range(1, len(stream) + 1):
+        parser = SSEParser()
+        received: List[Any] = []
+        for offset in range(0, len(stream), size):
+            received.extend(parser.feed(stream[offset : offset + size]))
+        assert received == expected, (size, received)
+        assert parser.done, size
+    print("SSEParser : OK")
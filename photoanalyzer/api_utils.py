@@ -6,70 +6,167 @@ Module API pour PhotoAnalyzer.
 Fournit des fonctions pour interagir avec l'API LLMaaS pour l'analyse d'images multimodales.
 """
 
+import os
+import atexit
 import httpx
 import json
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, Iterator, Tuple
 from cli_ui import print_message, print_debug_data
+from image_utils import base64_encoded_length, encode_image_to_base64_stream
 
-def analyze_image_ollama(
+try:
+    import orjson  # Optionnel : sérialisation JSON plus rapide
+except ImportError:
+    orjson = None
+
+# Marqueur remplacé par le flux base64 de l'image lors de l'envoi en streaming
+_IMAGE_PLACEHOLDER = "__PHOTOANALYZER_IMAGE_BASE64__"
+
+# Client HTTP partagé (keep-alive) : réutilise les connexions TCP/TLS d'un appel à l'autre
+_HTTP_CLIENT: Optional[httpx.Client] = None
+
+def _get_http_client() -> httpx.Client:
+    """
+    Retourne le client HTTP partagé du module, créé au premier appel.
+
+    Le pool de connexions est conservé entre les requêtes ; les échecs de connexion
+    sont retentés par le transport. Le timeout est fixé à chaque requête.
+    """
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        _HTTP_CLIENT = httpx.Client(
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+            transport=httpx.HTTPTransport(retries=2)
+        )
+        atexit.register(_HTTP_CLIENT.close)
+    return _HTTP_CLIENT
+
+def _json_bytes(payload: Dict[str, Any]) -> bytes:
+    """Sérialise un payload en JSON UTF-8 (orjson si disponible, sinon json)."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode('utf-8')
+
+def _build_streamed_body(payload: Dict[str, Any], image_path: str) -> Tuple[Iterator[bytes], int]:
+    """
+    Construit un corps JSON dont les données base64 de l'image sont produites à la volée.
+
+    Le payload doit contenir _IMAGE_PLACEHOLDER à l'emplacement des données de l'image.
+    Les caractères base64 ne nécessitant aucun échappement JSON, ils sont insérés tels quels
+    entre les deux moitiés du JSON sérialisé. La longueur totale est calculée à l'avance
+    pour envoyer un Content-Length plutôt qu'un transfert chunked.
+    """
+    head, tail = _json_bytes(payload).split(_IMAGE_PLACEHOLDER.encode('ascii'), 1)
+    content_length = len(head) + base64_encoded_length(os.path.getsize(image_path)) + len(tail)
+
+    def body() -> Iterator[bytes]:
+        yield head
+        yield from encode_image_to_base64_stream(image_path)
+        yield tail
+
+    return body(), content_length
+
+async def _aiter_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Adapte un itérateur synchrone de blocs pour httpx.AsyncClient."""
+    for chunk in chunks:
+        yield chunk
+
+def _prepare_ollama_request(
     ollama_url: str,
     model: str,
-    image_base64: str,
+    image_base64: Optional[str],
     prompt: str,
-    silent: bool = False,
-    debug_mode: bool = False,
-    timeout: int = 120
-) -> Optional[str]:
-    """
-    Analyse une image via une API Ollama directe.
-    """
-    if not ollama_url.endswith('/'):
-        ollama_url += '/'
-    
+    silent: bool,
+    debug_mode: bool,
+    image_path: Optional[str]
+) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """Construit l'URL, les en-têtes et le corps d'une requête Ollama /api/generate."""
     full_url = f"{ollama_url}api/generate"
     
     payload = {
         "model": model,
         "prompt": prompt,
-        "images": [image_base64],
+        "images": [image_base64 if image_base64 is not None else _IMAGE_PLACEHOLDER],
         "stream": False
     }
     
     headers = {"Content-Type": "application/json"}
     
+    if image_base64 is not None:
+        request_kwargs: Dict[str, Any] = {"content": _json_bytes(payload)}
+    else:
+        body, content_length = _build_streamed_body(payload, image_path)
+        headers["Content-Length"] = str(content_length)
+        request_kwargs = {"content": body}
+    
     if debug_mode and not silent:
         print_debug_data("Requête API Ollama", {
             "URL": full_url,
             "Modèle": model,
             "Prompt": prompt,
         }, silent=silent, debug_mode=debug_mode)
+    
+    return full_url, headers, request_kwargs
 
-    start_time = time.time()
+def _parse_ollama_response(
+    response: httpx.Response,
+    request_duration: float,
+    silent: bool,
+    debug_mode: bool
+) -> Optional[str]:
+    """Extrait le résultat d'analyse d'une réponse Ollama."""
+    if response.status_code != 200:
+        print_message(f"Erreur API Ollama (HTTP {response.status_code}): {response.text[:200]}", style="error", silent=silent, debug_mode=debug_mode)
+        return None
     
     try:
-        with httpx.Client(timeout=timeout) as client:
-            print_message(f"Envoi de la requête à l'API Ollama sur {ollama_url}...", style="info", silent=silent, debug_mode=debug_mode)
-            response = client.post(full_url, headers=headers, json=payload)
-            request_duration = time.time() - start_time
-            
-            if response.status_code != 200:
-                print_message(f"Erreur API Ollama (HTTP {response.status_code}): {response.text[:200]}", style="error", silent=silent, debug_mode=debug_mode)
-                return None
-            
-            try:
-                response_data = response.json()
-                analysis_result = response_data.get("response")
-                if not analysis_result:
-                    print_message("Réponse API Ollama invalide: champ 'response' manquant.", style="error", silent=silent, debug_mode=debug_mode)
-                    return None
-                
-                print_message(f"Analyse via Ollama terminée avec succès en {request_duration:.2f}s.", style="success", silent=silent, debug_mode=debug_mode)
-                return analysis_result
+        response_data = response.json()
+        analysis_result = response_data.get("response")
+        if not analysis_result:
+            print_message("Réponse API Ollama invalide: champ 'response' manquant.", style="error", silent=silent, debug_mode=debug_mode)
+            return None
+        
+        print_message(f"Analyse via Ollama terminée avec succès en {request_duration:.2f}s.", style="success", silent=silent, debug_mode=debug_mode)
+        return analysis_result
 
-            except json.JSONDecodeError:
-                print_message("Erreur lors du décodage de la réponse JSON de Ollama.", style="error", silent=silent, debug_mode=debug_mode)
-                return None
+    except json.JSONDecodeError:
+        print_message("Erreur lors du décodage de la réponse JSON de Ollama.", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+
+def analyze_image_ollama(
+    ollama_url: str,
+    model: str,
+    image_base64: Optional[str],
+    prompt: str,
+    silent: bool = False,
+    debug_mode: bool = False,
+    timeout: int = 120,
+    image_path: Optional[str] = None,
+    client: Optional[httpx.Client] = None,
+    image_format: str = "jpeg"
+) -> Optional[str]:
+    """
+    Analyse une image via une API Ollama directe.
+
+    Si image_base64 est None, l'image est lue depuis image_path et encodée en flux
+    pendant l'envoi de la requête. Sans client fourni, le client partagé du module est utilisé.
+    image_format est ignoré (Ollama détecte le format) ; il aligne la signature sur analyze_image_api.
+    """
+    if not ollama_url.endswith('/'):
+        ollama_url += '/'
+    
+    full_url, headers, request_kwargs = _prepare_ollama_request(
+        ollama_url, model, image_base64, prompt, silent, debug_mode, image_path
+    )
+
+    start_time = time.time()
+    
+    try:
+        http_client = client or _get_http_client()
+        print_message(f"Envoi de la requête à l'API Ollama sur {ollama_url}...", style="info", silent=silent, debug_mode=debug_mode)
+        response = http_client.post(full_url, headers=headers, timeout=timeout, **request_kwargs)
+        return _parse_ollama_response(response, time.time() - start_time, silent, debug_mode)
 
     except httpx.TimeoutException:
         print_message(f"Timeout de la requête API Ollama ({timeout}s).", style="error", silent=silent, debug_mode=debug_mode)
@@ -81,35 +178,67 @@ def analyze_image_ollama(
         print_message(f"Erreur inattendue lors de l'appel API Ollama: {e}", style="error", silent=silent, debug_mode=debug_mode)
         return None
 
-def analyze_image_api(
-    api_url: str,
-    api_key: str,
+async def analyze_image_ollama_async(
+    client: httpx.AsyncClient,
+    ollama_url: str,
     model: str,
-    image_base64: str,
+    image_base64: Optional[str],
     prompt: str,
-    max_tokens: int = 1000,
-    temperature: float = 0.3,
     silent: bool = False,
     debug_mode: bool = False,
     timeout: int = 120,
-    min_pixels: Optional[int] = None,
-    max_pixels: Optional[int] = None,
+    image_path: Optional[str] = None,
     image_format: str = "jpeg"
 ) -> Optional[str]:
     """
-    Analyse une image via l'API LLMaaS en utilisant un modèle multimodal.
+    Variante asynchrone de analyze_image_ollama utilisant un httpx.AsyncClient partagé.
     """
+    if not ollama_url.endswith('/'):
+        ollama_url += '/'
     
-    if not api_url.endswith('/'):
-        api_url += '/'
+    full_url, headers, request_kwargs = _prepare_ollama_request(
+        ollama_url, model, image_base64, prompt, silent, debug_mode, image_path
+    )
+    if not isinstance(request_kwargs["content"], bytes):
+        # Corps base64 en flux : httpx.AsyncClient attend un itérateur asynchrone
+        request_kwargs["content"] = _aiter_chunks(request_kwargs["content"])
+
+    start_time = time.time()
     
+    try:
+        print_message(f"Envoi de la requête à l'API Ollama sur {ollama_url}...", style="info", silent=silent, debug_mode=debug_mode)
+        response = await client.post(full_url, headers=headers, timeout=timeout, **request_kwargs)
+        return _parse_ollama_response(response, time.time() - start_time, silent, debug_mode)
+
+    except httpx.TimeoutException:
+        print_message(f"Timeout de la requête API Ollama ({timeout}s).", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+    except httpx.ConnectError:
+        print_message("Erreur de connexion à l'API Ollama. Vérifiez l'URL et votre connexion réseau.", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+    except Exception as e:
+        print_message(f"Erreur inattendue lors de l'appel API Ollama: {e}", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+
+def _prepare_api_request(
+    api_url: str,
+    api_key: str,
+    model: str,
+    image_base64: Optional[str],
+    prompt: str,
+    silent: bool,
+    debug_mode: bool,
+    image_format: str,
+    image_path: Optional[str]
+) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """Construit l'URL, les en-têtes et le corps d'une requête LLMaaS /v1/chat/completions."""
     full_url = f"{api_url}v1/chat/completions"
     
     # Format standard OpenAI pour les modèles multimodaux (compatible Qwen VL, Llama Vision, etc.)
     image_content: Dict[str, Any] = {
         "type": "image_url",
         "image_url": {
-            "url": f"data:image/{image_format};base64,{image_base64}"
+            "url": f"data:image/{image_format};base64,{image_base64 if image_base64 is not None else _IMAGE_PLACEHOLDER}"
         }
     }
     
@@ -140,11 +269,20 @@ def analyze_image_api(
         "Authorization": f"Bearer {api_key}"
     }
     
+    if image_base64 is not None:
+        encoded_length = len(image_base64)
+        request_kwargs: Dict[str, Any] = {"content": _json_bytes(payload)}
+    else:
+        body, content_length = _build_streamed_body(payload, image_path)
+        encoded_length = base64_encoded_length(os.path.getsize(image_path))
+        headers["Content-Length"] = str(content_length)
+        request_kwargs = {"content": body}
+    
     if debug_mode and not silent:
         import copy
         debug_payload = copy.deepcopy(payload)
         try:
-            debug_payload["messages"][1]["content"][0]["image"] = f"data:image/{image_format};base64,<BASE64_DATA_{len(image_base64)}_CHARS>"
+            debug_payload["messages"][1]["content"][0]["image_url"]["url"] = f"data:image/{image_format};base64,<BASE64_DATA_{encoded_length}_CHARS>"
         except (IndexError, KeyError):
             pass
         
@@ -154,74 +292,162 @@ def analyze_image_api(
             "Body": debug_payload
         }, silent=silent, debug_mode=debug_mode)
 
+    return full_url, headers, request_kwargs
+
+def _parse_api_response(
+    response: httpx.Response,
+    request_duration: float,
+    silent: bool,
+    debug_mode: bool
+) -> Optional[str]:
+    """Extrait le résultat d'analyse d'une réponse LLMaaS (format OpenAI)."""
+    if response.status_code != 200:
+        error_msg = f"Erreur API (HTTP {response.status_code})"
+        try:
+            error_detail = response.json()
+            if 'error' in error_detail:
+                error_msg += f": {error_detail['error'].get('message', 'Erreur inconnue')}"
+        except:
+            error_msg += f": {response.text[:200]}"
+
+        print_message(error_msg, style="error", silent=silent, debug_mode=debug_mode)
+        if debug_mode and not silent:
+            print_debug_data("Payload Réponse (Erreur)", {
+                "Status Code": response.status_code,
+                "Headers": dict(response.headers),
+                "Body (text)": response.text
+            }, silent=silent, debug_mode=debug_mode)
+        return None
+
+    try:
+        response_data = response.json()
+    except json.JSONDecodeError:
+        print_message("Erreur lors du décodage de la réponse JSON.", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+
+    if 'choices' not in response_data or not response_data['choices']:
+        print_message("Réponse API invalide: aucun choix trouvé.", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+
+    choice = response_data['choices'][0]
+    if 'message' not in choice or 'content' not in choice['message']:
+        print_message("Réponse API invalide: contenu manquant.", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+
+    analysis_result = choice['message']['content']
+
+    if debug_mode and not silent:
+        usage = response_data.get('usage', {})
+        print_debug_data("Réponse API", {
+            "Durée requête": f"{request_duration:.2f}s",
+            "Tokens prompt": usage.get('prompt_tokens', 'N/A'),
+            "Tokens completion": usage.get('completion_tokens', 'N/A'),
+            "Tokens total": usage.get('total_tokens', 'N/A'),
+            "Longueur réponse": f"{len(analysis_result):,} caractères",
+            "Finish reason": choice.get('finish_reason', 'N/A')
+        }, silent=silent, debug_mode=debug_mode)
+
+        print_debug_data("Payload Réponse", {
+            "Status Code": response.status_code,
+            "Headers": dict(response.headers),
+            "Body": response_data
+        }, silent=silent, debug_mode=debug_mode)
+
+    print_message(f"Analyse terminée avec succès en {request_duration:.2f}s.", style="success", silent=silent, debug_mode=debug_mode)
+    return analysis_result
+
+def analyze_image_api(
+    api_url: str,
+    api_key: str,
+    model: str,
+    image_base64: Optional[str],
+    prompt: str,
+    max_tokens: int = 1000,
+    temperature: float = 0.3,
+    silent: bool = False,
+    debug_mode: bool = False,
+    timeout: int = 120,
+    min_pixels: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    image_format: str = "jpeg",
+    image_path: Optional[str] = None,
+    client: Optional[httpx.Client] = None
+) -> Optional[str]:
+    """
+    Analyse une image via l'API LLMaaS en utilisant un modèle multimodal.
+
+    Si image_base64 est None, l'image est lue depuis image_path et encodée en flux
+    pendant l'envoi de la requête (pas de copie base64 complète en mémoire).
+    Sans client fourni, le client partagé du module est utilisé.
+    """
+    
+    if not api_url.endswith('/'):
+        api_url += '/'
+    
+    full_url, headers, request_kwargs = _prepare_api_request(
+        api_url, api_key, model, image_base64, prompt, silent, debug_mode, image_format, image_path
+    )
+
     start_time = time.time()
     
     try:
-        with httpx.Client(timeout=timeout) as client:
-            print_message("Envoi de la requête à l'API...", style="info", silent=silent, debug_mode=debug_mode)
-            
-            response = client.post(
-                full_url,
-                headers=headers,
-                json=payload
-            )
-            
-            request_duration = time.time() - start_time
-            
-            if response.status_code != 200:
-                error_msg = f"Erreur API (HTTP {response.status_code})"
-                try:
-                    error_detail = response.json()
-                    if 'error' in error_detail:
-                        error_msg += f": {error_detail['error'].get('message', 'Erreur inconnue')}"
-                except:
-                    error_msg += f": {response.text[:200]}"
-                
-                print_message(error_msg, style="error", silent=silent, debug_mode=debug_mode)
-                if debug_mode and not silent:
-                    print_debug_data("Payload Réponse (Erreur)", {
-                        "Status Code": response.status_code,
-                        "Headers": dict(response.headers),
-                        "Body (text)": response.text
-                    }, silent=silent, debug_mode=debug_mode)
-                return None
-            
-            try:
-                response_data = response.json()
-            except json.JSONDecodeError:
-                print_message("Erreur lors du décodage de la réponse JSON.", style="error", silent=silent, debug_mode=debug_mode)
-                return None
-            
-            if 'choices' not in response_data or not response_data['choices']:
-                print_message("Réponse API invalide: aucun choix trouvé.", style="error", silent=silent, debug_mode=debug_mode)
-                return None
-            
-            choice = response_data['choices'][0]
-            if 'message' not in choice or 'content' not in choice['message']:
-                print_message("Réponse API invalide: contenu manquant.", style="error", silent=silent, debug_mode=debug_mode)
-                return None
-            
-            analysis_result = choice['message']['content']
-            
-            if debug_mode and not silent:
-                usage = response_data.get('usage', {})
-                print_debug_data("Réponse API", {
-                    "Durée requête": f"{request_duration:.2f}s",
-                    "Tokens prompt": usage.get('prompt_tokens', 'N/A'),
-                    "Tokens completion": usage.get('completion_tokens', 'N/A'),
-                    "Tokens total": usage.get('total_tokens', 'N/A'),
-                    "Longueur réponse": f"{len(analysis_result):,} caractères",
-                    "Finish reason": choice.get('finish_reason', 'N/A')
-                }, silent=silent, debug_mode=debug_mode)
-                
-                print_debug_data("Payload Réponse", {
-                    "Status Code": response.status_code,
-                    "Headers": dict(response.headers),
-                    "Body": response_data
-                }, silent=silent, debug_mode=debug_mode)
-            
-            print_message(f"Analyse terminée avec succès en {request_duration:.2f}s.", style="success", silent=silent, debug_mode=debug_mode)
-            return analysis_result
+        http_client = client or _get_http_client()
+        print_message("Envoi de la requête à l'API...", style="info", silent=silent, debug_mode=debug_mode)
+        
+        response = http_client.post(
+            full_url,
+            headers=headers,
+            timeout=timeout,
+            **request_kwargs
+        )
+        return _parse_api_response(response, time.time() - start_time, silent, debug_mode)
+        
+    except httpx.TimeoutException:
+        print_message(f"Timeout de la requête API ({timeout}s).", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+    except httpx.ConnectError:
+        print_message("Erreur de connexion à l'API. Vérifiez l'URL et votre connexion réseau.", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+    except Exception as e:
+        print_message(f"Erreur inattendue lors de l'appel API: {e}", style="error", silent=silent, debug_mode=debug_mode)
+        return None
+
+async def analyze_image_api_async(
+    client: httpx.AsyncClient,
+    api_url: str,
+    api_key: str,
+    model: str,
+    image_base64: Optional[str],
+    prompt: str,
+    max_tokens: int = 1000,
+    temperature: float = 0.3,
+    silent: bool = False,
+    debug_mode: bool = False,
+    timeout: int = 120,
+    min_pixels: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    image_format: str = "jpeg",
+    image_path: Optional[str] = None
+) -> Optional[str]:
+    """
+    Variante asynchrone de analyze_image_api utilisant un httpx.AsyncClient partagé.
+    """
+    if not api_url.endswith('/'):
+        api_url += '/'
+    
+    full_url, headers, request_kwargs = _prepare_api_request(
+        api_url, api_key, model, image_base64, prompt, silent, debug_mode, image_format, image_path
+    )
+    if not isinstance(request_kwargs["content"], bytes):
+        # Corps base64 en flux : httpx.AsyncClient attend un itérateur asynchrone
+        request_kwargs["content"] = _aiter_chunks(request_kwargs["content"])
+
+    start_time = time.time()
+    
+    try:
+        print_message("Envoi de la requête à l'API...", style="info", silent=silent, debug_mode=debug_mode)
+        response = await client.post(full_url, headers=headers, timeout=timeout, **request_kwargs)
+        return _parse_api_response(response, time.time() - start_time, silent, debug_mode)
             
     except httpx.TimeoutException:
         print_message(f"Timeout de la requête API ({timeout}s).", style="error", silent=silent, debug_mode=debug_mode)
@@ -12,7 +12,7 @@ from rich.text import Text
 from rich.table import Table
 from rich import box
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Optional, Union
 
 # Console Rich globale
 console = Console()
@@ -67,7 +67,7 @@ def print_message(
 
 def print_debug_data(
     title: str, 
-    data: Dict[str, Any], 
+    data: Union[Dict[str, Any], Callable[[], Dict[str, Any]]], 
     silent: bool = False, 
     debug_mode: bool = False
 ) -> None:
@@ -76,13 +76,17 @@ def print_debug_data(
     
     Args:
         title: Titre du tableau
-        data: Dictionnaire de données à afficher
+        data: Dictionnaire de données à afficher, ou fonction le construisant
+              (évaluée uniquement si le tableau est effectivement affiché)
         silent: Si True, n'affiche rien
         debug_mode: Si False, n'affiche rien
     """
     if silent or not debug_mode:
         return
     
+    if callable(data):
+        data = data()
+    
     # Créer un tableau Rich
     table = Table(
         title=f"🔍 {title}",
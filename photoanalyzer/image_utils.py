@@ -8,10 +8,16 @@ pour l'analyse avec les modèles multimodaux.
 """
 
 import os
+import json
 import base64
-import mimetypes
+import hashlib
+import tempfile
+import mmap
+from dataclasses import asdict, dataclass
+from enum import IntEnum
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from PIL import Image, ImageFile
 from cli_ui import print_message, print_debug_data
 
@@ -19,90 +25,268 @@ from cli_ui import print_message, print_debug_data
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 # Formats d'images supportés
-SUPPORTED_FORMATS = {
+SUPPORTED_FORMATS = frozenset({
     'JPEG', 'JPG', 'PNG', 'GIF', 'BMP', 'TIFF', 'TIF', 'WEBP'
-}
+})
 
 # Extensions de fichiers supportées
-SUPPORTED_EXTENSIONS = {
+SUPPORTED_EXTENSIONS = frozenset({
     '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp'
+})
+
+# Listes pré-formatées pour les messages d'erreur
+_FORMAT_LIST_STR = ', '.join(sorted(SUPPORTED_FORMATS))
+_EXT_LIST_STR = ', '.join(sorted(SUPPORTED_EXTENSIONS))
+
+# Type MIME par extension supportée (évite mimetypes et la lecture de mime.types)
+_EXT_MIME = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+    '.webp': 'image/webp'
 }
 
 # Taille maximale recommandée (en pixels)
 MAX_RECOMMENDED_DIMENSION = 2048
 MAX_FILE_SIZE_MB = 50
 
-def load_and_validate_image(image_path: str, silent: bool = False, debug_mode: bool = False) -> bool:
+# Taille des blocs lus pour l'encodage base64 en flux (multiple de 3 : pas de padding intermédiaire)
+_B64_BLOCK_SIZE = 3 * 64 * 1024
+
+class ContentType(IntEnum):
+    """Types de contenu détectables dans une image."""
+    PHOTO = 0
+    SCREENSHOT = 1
+    DIAGRAM = 2
+    TEXT = 3
+    MIXED = 4
+
+# Préfixes spécialisés selon le type de contenu (indexés par ContentType)
+_PREFIXES = (
+    "En analysant cette photographie, ",
+    "En analysant cette capture d'écran, ",
+    "En analysant ce diagramme ou schéma, ",
+    "En analysant cette image contenant du texte, ",
+    "En analysant cette image, ",
+)
+
+# Format transmis à l'API selon le format détecté par Pillow (signature du fichier)
+_API_FORMATS = {'JPEG': 'jpeg', 'PNG': 'png', 'WEBP': 'webp'}
+
+# Répertoire où sont mémorisées les métadonnées sondées des images (un fichier JSON par image).
+# Le fichier image lui-même n'est jamais modifié.
+_META_CACHE_DIR = Path(os.getenv('PHOTOANALYZER_CACHE_DIR', Path.home() / '.cache' / 'photoanalyzer')).expanduser()
+
+# Taille de la vignette utilisée pour la détection du type de contenu
+_ANALYSIS_SIZE = (100, 100)
+
+# Table de quantification (7 bits par canal) appliquée avant le comptage des couleurs :
+# absorbe le bruit de compression et borne le nombre de couleurs distinctes
+_QUANT_LUT = [v & 0xFE for v in range(256)] * 3
+
+@dataclass
+class ImageMetadata:
+    """
+    Métadonnées d'une image lues en une seule ouverture (en-tête uniquement).
+
+    Permet aux fonctions de ce module de ne pas ré-ouvrir le fichier
+    lorsque l'appelant a déjà sondé l'image.
+    """
+    path: str
+    file_size: int
+    format: Optional[str]
+    mode: str
+    width: int
+    height: int
+    has_transparency: bool
+    is_animated: bool
+    has_exif: bool
+
+def _metadata_cache_file(image_path: str) -> Path:
+    """Fichier de cache des métadonnées d'une image, nommé d'après le SHA-256 de son chemin absolu."""
+    digest = hashlib.sha256(os.path.realpath(image_path).encode('utf-8')).hexdigest()
+    return _META_CACHE_DIR / f"{digest}.json"
+
+def _read_cached_metadata(image_path: str, cache_key: List[int]) -> Optional[ImageMetadata]:
+    """Relit les métadonnées mémorisées dans le répertoire de cache, si toujours valides."""
+    try:
+        cached = json.loads(_metadata_cache_file(image_path).read_bytes())
+        if cached.get('key') != cache_key:
+            return None  # Fichier modifié depuis la mise en cache
+        return ImageMetadata(path=image_path, **cached['meta'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _write_cached_metadata(meta: ImageMetadata, cache_key: List[int]) -> None:
+    """Mémorise les métadonnées dans le répertoire de cache (sans effet s'il n'est pas accessible en écriture)."""
+    fields = asdict(meta)
+    del fields['path']
+    cache_file = _metadata_cache_file(meta.path)
+    try:
+        cache_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage : un lecteur ne voit jamais de JSON partiel
+        with tempfile.NamedTemporaryFile('w', dir=cache_file.parent, suffix='.tmp', delete=False, encoding='utf-8') as tmp:
+            json.dump({'key': cache_key, 'meta': fields}, tmp)
+        os.replace(tmp.name, cache_file)
+    except (OSError, TypeError, ValueError):
+        pass  # Cache non disponible : les métadonnées seront simplement re-sondées
+
+def probe_image(image_path: str) -> Optional[ImageMetadata]:
+    """
+    Lit une seule fois les métadonnées d'une image (taille, format, dimensions...).
+    
+    Le résultat est mémorisé dans un répertoire de cache (~/.cache/photoanalyzer par défaut,
+    PHOTOANALYZER_CACHE_DIR pour le changer), associé au chemin du fichier, à sa date de
+    modification et à sa taille : les analyses suivantes du même fichier n'ont pas besoin
+    de l'ouvrir avec Pillow. Le fichier image n'est jamais modifié.
+    
+    Args:
+        image_path: Chemin vers le fichier image
+    
+    Returns:
+        ImageMetadata de l'image, None si le fichier n'existe pas ou n'est pas lisible
+    """
+    try:
+        return _probe_image_or_raise(image_path)
+    except Exception:
+        return None
+
+def _probe_image_or_raise(image_path: str) -> ImageMetadata:
+    """
+    Comme probe_image, mais laisse remonter l'exception d'origine (fichier absent,
+    format non reconnu par Pillow...) pour qu'elle puisse être rapportée telle quelle.
+    """
+    stat = os.stat(image_path)
+    cache_key = [stat.st_mtime_ns, stat.st_size]
+    
+    cached = _read_cached_metadata(image_path, cache_key)
+    if cached is not None:
+        return cached
+    
+    with Image.open(image_path) as img:
+        width, height = img.size
+        
+        # EXIF data si disponible
+        try:
+            exif_method = getattr(img, '_getexif', None)
+            has_exif = exif_method is not None and exif_method() is not None
+        except Exception:
+            has_exif = False
+        
+        meta = ImageMetadata(
+            path=image_path,
+            file_size=stat.st_size,
+            format=img.format,
+            mode=img.mode,
+            width=width,
+            height=height,
+            has_transparency=(
+                img.mode in ('RGBA', 'LA') or
+                'transparency' in img.info
+            ),
+            is_animated=getattr(img, 'is_animated', False),
+            has_exif=has_exif
+        )
+    
+    _write_cached_metadata(meta, cache_key)
+    return meta
+
+def load_and_validate_image(
+    image_path: str,
+    silent: bool = False,
+    debug_mode: bool = False,
+    meta: Optional[ImageMetadata] = None
+) -> Tuple[bool, Optional[str]]:
     """
     Charge et valide un fichier image.
     
+    Le format est déduit du contenu du fichier (signature lue par Pillow),
+    et non de son extension.
+    
     Args:
         image_path: Chemin vers le fichier image
         silent: Si True, n'affiche pas les messages
         debug_mode: Si True, affiche des informations de debug
+        meta: Métadonnées déjà sondées (évite de ré-ouvrir le fichier)
     
     Returns:
-        True si l'image est valide et peut être chargée, False sinon
+        (True, format pour l'API : 'jpeg', 'png' ou 'webp', 'jpeg' par défaut) si l'image
+        est valide, (False, None) sinon
     """
     try:
-        # Vérifier l'existence du fichier
-        if not os.path.exists(image_path):
-            print_message(f"Le fichier image '{image_path}' n'existe pas.", style="error", silent=silent, debug_mode=debug_mode)
-            return False
+        if meta is None:
+            # Vérifier l'existence du fichier
+            if not os.path.exists(image_path):
+                print_message(f"Le fichier image '{image_path}' n'existe pas.", style="error", silent=silent, debug_mode=debug_mode)
+                return False, None
+            file_size = os.path.getsize(image_path)
+        else:
+            file_size = meta.file_size
         
         # Vérifier la taille du fichier
-        file_size = os.path.getsize(image_path)
         file_size_mb = file_size / (1024 * 1024)
         
         if file_size_mb > MAX_FILE_SIZE_MB:
             print_message(f"Le fichier image est trop volumineux ({file_size_mb:.2f} MB). Taille maximale: {MAX_FILE_SIZE_MB} MB.", 
                          style="error", silent=silent, debug_mode=debug_mode)
-            return False
+            return False, None
         
         # Vérifier l'extension
         file_extension = Path(image_path).suffix.lower()
         if file_extension not in SUPPORTED_EXTENSIONS:
-            print_message(f"Format de fichier '{file_extension}' non supporté. Formats supportés: {', '.join(SUPPORTED_EXTENSIONS)}", 
+            print_message(f"Format de fichier '{file_extension}' non supporté. Formats supportés: {_EXT_LIST_STR}", 
                          style="error", silent=silent, debug_mode=debug_mode)
-            return False
+            return False, None
         
-        # Essayer de charger l'image avec PIL
-        with Image.open(image_path) as img:
-            # Vérifier le format
-            if img.format not in SUPPORTED_FORMATS:
-                print_message(f"Format d'image '{img.format}' non supporté. Formats supportés: {', '.join(SUPPORTED_FORMATS)}", 
-                             style="error", silent=silent, debug_mode=debug_mode)
-                return False
-            
-            # Vérifier les dimensions
-            width, height = img.size
-            max_dimension = max(width, height)
-            
-            if max_dimension > MAX_RECOMMENDED_DIMENSION:
-                print_message(f"Image très grande ({width}x{height}). La dimension maximale recommandée est {MAX_RECOMMENDED_DIMENSION}px.", 
-                             style="warning", silent=silent, debug_mode=debug_mode)
-                print_message("L'analyse peut être plus lente et consommer plus de tokens.", 
-                             style="warning", silent=silent, debug_mode=debug_mode)
-            
-            # Affichage des informations en mode debug
-            if debug_mode and not silent:
-                print_debug_data("Validation Image", {
-                    "Format": img.format,
-                    "Mode": img.mode,
-                    "Dimensions": f"{width} × {height}",
-                    "Taille fichier": f"{file_size_mb:.2f} MB",
-                    "Transparence": getattr(img, 'transparency', None) is not None,
-                    "Animée": getattr(img, 'is_animated', False)
-                }, silent=silent, debug_mode=debug_mode)
+        # Essayer de charger l'image avec PIL (sauf si déjà sondée)
+        if meta is None:
+            # Exception d'origine (ex: format non reconnu par Pillow) remontée au gestionnaire ci-dessous
+            meta = _probe_image_or_raise(image_path)
+        
+        # Vérifier le format
+        if meta.format not in SUPPORTED_FORMATS:
+            print_message(f"Format d'image '{meta.format}' non supporté. Formats supportés: {_FORMAT_LIST_STR}", 
+                         style="error", silent=silent, debug_mode=debug_mode)
+            return False, None
+        
+        # Vérifier les dimensions
+        width, height = meta.width, meta.height
+        max_dimension = max(width, height)
+        
+        if max_dimension > MAX_RECOMMENDED_DIMENSION:
+            print_message(f"Image très grande ({width}x{height}). La dimension maximale recommandée est {MAX_RECOMMENDED_DIMENSION}px.", 
+                         style="warning", silent=silent, debug_mode=debug_mode)
+            print_message("L'analyse peut être plus lente et consommer plus de tokens.", 
+                         style="warning", silent=silent, debug_mode=debug_mode)
+        
+        # Affichage des informations en mode debug
+        if debug_mode and not silent:
+            print_debug_data("Validation Image", {
+                "Format": meta.format,
+                "Mode": meta.mode,
+                "Dimensions": f"{width} × {height}",
+                "Taille fichier": f"{file_size_mb:.2f} MB",
+                "Transparence": meta.has_transparency,
+                "Animée": meta.is_animated
+            }, silent=silent, debug_mode=debug_mode)
         
         print_message("Image validée avec succès.", style="success", silent=silent, debug_mode=debug_mode)
-        return True
+        return True, _API_FORMATS.get(meta.format, "jpeg")
         
     except Exception as e:
         print_message(f"Erreur lors de la validation de l'image: {e}", style="error", silent=silent, debug_mode=debug_mode)
-        return False
+        return False, None
 
-def get_image_info(image_path: str, silent: bool = False, debug_mode: bool = False) -> Optional[Dict[str, Any]]:
+def get_image_info(
+    image_path: str,
+    silent: bool = False,
+    debug_mode: bool = False,
+    meta: Optional[ImageMetadata] = None
+) -> Optional[Dict[str, Any]]:
     """
     Récupère des informations détaillées sur une image.
     
@@ -110,49 +294,36 @@ def get_image_info(image_path: str, silent: bool = False, debug_mode: bool = Fal
         image_path: Chemin vers le fichier image
         silent: Si True, n'affiche pas les messages
         debug_mode: Si True, affiche des informations de debug
+        meta: Métadonnées déjà sondées (évite de ré-ouvrir le fichier)
     
     Returns:
         Dictionnaire contenant les informations de l'image, None en cas d'erreur
     """
     try:
-        with Image.open(image_path) as img:
-            # Informations de base
-            width, height = img.size
-            info = {
-                'filename': os.path.basename(image_path),
-                'format': img.format,
-                'mode': img.mode,
-                'size': img.size,
-                'width': width,  # Ajouter width explicitement
-                'height': height,  # Ajouter height explicitement
-                'file_size': os.path.getsize(image_path)
-            }
-            
-            # Informations supplémentaires
-            info['has_transparency'] = (
-                img.mode in ('RGBA', 'LA') or 
-                (img.mode == 'P' and 'transparency' in img.info) or
-                'transparency' in img.info
-            )
-            
-            info['is_animated'] = getattr(img, 'is_animated', False)
-            
-            # EXIF data si disponible
-            try:
-                exif_method = getattr(img, '_getexif', None)
-                if exif_method is not None and exif_method() is not None:
-                    info['has_exif'] = True
-                else:
-                    info['has_exif'] = False
-            except (AttributeError, Exception):
-                info['has_exif'] = False
-            
-            # Informations sur le type MIME
-            mime_type, _ = mimetypes.guess_type(image_path)
-            if mime_type:
-                info['mime_type'] = mime_type
-            
-            return info
+        if meta is None:
+            # Exception d'origine (ex: format non reconnu par Pillow) remontée au gestionnaire ci-dessous
+            meta = _probe_image_or_raise(image_path)
+        
+        # Informations de base
+        info = {
+            'filename': os.path.basename(image_path),
+            'format': meta.format,
+            'mode': meta.mode,
+            'size': (meta.width, meta.height),
+            'width': meta.width,  # Ajouter width explicitement
+            'height': meta.height,  # Ajouter height explicitement
+            'file_size': meta.file_size,
+            'has_transparency': meta.has_transparency,
+            'is_animated': meta.is_animated,
+            'has_exif': meta.has_exif
+        }
+        
+        # Informations sur le type MIME
+        mime_type = _EXT_MIME.get(Path(image_path).suffix.lower())
+        if mime_type:
+            info['mime_type'] = mime_type
+        
+        return info
             
     except Exception as e:
         print_message(f"Erreur lors de la récupération des informations de l'image: {e}", 
@@ -200,13 +371,47 @@ def encode_image_to_base64(image_path: str, silent: bool = False, debug_mode: bo
         print_message(f"Erreur lors de l'encodage de l'image: {e}", style="error", silent=silent, debug_mode=debug_mode)
         return None
 
+def base64_encoded_length(file_size: int) -> int:
+    """
+    Calcule la longueur de l'encodage base64 d'un contenu de taille donnée.
+    
+    Args:
+        file_size: Taille du contenu brut en octets
+    
+    Returns:
+        Nombre de caractères base64 (padding inclus)
+    """
+    return 4 * ((file_size + 2) // 3)
+
+def encode_image_to_base64_stream(image_path: str, block_size: int = _B64_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Encode une image en base64 par blocs, sans charger la chaîne complète en mémoire.
+    
+    Le fichier est projeté en mémoire (mmap) et encodé par tranches dont la taille
+    est un multiple de 3, de sorte que la concaténation des blocs produits est
+    identique à l'encodage base64 du fichier entier.
+    
+    Args:
+        image_path: Chemin vers le fichier image
+        block_size: Taille des tranches lues (multiple de 3)
+    
+    Yields:
+        Blocs base64 (bytes ASCII)
+    """
+    with open(image_path, "rb") as image_file:
+        with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, len(mapped), block_size):
+                yield base64.b64encode(mapped[offset:offset + block_size])
+
 def optimize_image_for_analysis(
     image_path: str, 
     max_dimension: int = MAX_RECOMMENDED_DIMENSION,
     quality: int = 85,
     output_path: Optional[str] = None,
     silent: bool = False,
-    debug_mode: bool = False
+    debug_mode: bool = False,
+    meta: Optional[ImageMetadata] = None,
+    output_format: Optional[str] = None
 ) -> Optional[str]:
     """
     Optimise une image pour l'analyse (redimensionnement et compression).
@@ -218,14 +423,25 @@ def optimize_image_for_analysis(
         output_path: Chemin de sortie (optionnel, génère automatiquement si None)
         silent: Si True, n'affiche pas les messages
         debug_mode: Si True, affiche des informations de debug
+        meta: Métadonnées déjà sondées (le fichier n'est ouvert que si un redimensionnement est nécessaire)
+        output_format: Format d'enregistrement imposé ('jpeg', 'png' ou 'webp'), quelle que soit
+            l'extension de output_path (par défaut, déduit de l'extension)
     
     Returns:
         Chemin vers le fichier optimisé, None en cas d'erreur
     """
     try:
+        if meta is not None:
+            # Décision prise sans ré-ouvrir le fichier
+            if max(meta.width, meta.height) <= max_dimension:
+                print_message("Image déjà dans les dimensions optimales.", style="info", silent=silent, debug_mode=debug_mode)
+                return image_path
+            original_file_size = meta.file_size
+        else:
+            original_file_size = os.path.getsize(image_path)
+        
         with Image.open(image_path) as img:
             original_size = img.size
-            original_file_size = os.path.getsize(image_path)
             
             # Calculer les nouvelles dimensions
             width, height = img.size
@@ -238,8 +454,16 @@ def optimize_image_for_analysis(
             new_width = int(width * ratio)
             new_height = int(height * ratio)
             
+            # Réduction entière préalable (filtre boîte, bien plus rapide que LANCZOS)
+            # puis LANCZOS uniquement sur le reste éventuel
+            resized_img = img
+            factor = max(width, height) // max_dimension
+            if factor >= 2 and img.mode not in ('P', '1'):
+                resized_img = img.reduce(factor)
+            
             # Redimensionner l'image
-            resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            if resized_img.size != (new_width, new_height):
+                resized_img = resized_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
             
             # Déterminer le chemin de sortie
             if not output_path:
@@ -248,9 +472,17 @@ def optimize_image_for_analysis(
             
             # Sauvegarder l'image optimisée
             save_kwargs = {}
-            if resized_img.format == 'JPEG' or image_path.lower().endswith(('.jpg', '.jpeg')):
+            if output_format:
+                save_kwargs['format'] = output_format.upper()
+                is_jpeg = save_kwargs['format'] == 'JPEG'
+            else:
+                is_jpeg = resized_img.format == 'JPEG' or output_path.lower().endswith(('.jpg', '.jpeg'))
+            if is_jpeg:
                 save_kwargs['quality'] = quality
                 save_kwargs['optimize'] = True
+                if resized_img.mode not in ('RGB', 'L', 'CMYK'):
+                    # JPEG n'accepte ni transparence ni palette
+                    resized_img = resized_img.convert('RGB')
             
             resized_img.save(output_path, **save_kwargs)
             
@@ -275,7 +507,7 @@ def optimize_image_for_analysis(
         print_message(f"Erreur lors de l'optimisation de l'image: {e}", style="error", silent=silent, debug_mode=debug_mode)
         return None
 
-def detect_image_content_type(image_path: str) -> Optional[str]:
+def detect_image_content_type(image_path: str) -> ContentType:
     """
     Détecte le type de contenu d'une image pour optimiser le prompt d'analyse.
     
@@ -283,7 +515,7 @@ def detect_image_content_type(image_path: str) -> Optional[str]:
         image_path: Chemin vers le fichier image
     
     Returns:
-        Type de contenu détecté ('photo', 'screenshot', 'diagram', 'text', 'mixed')
+        Type de contenu détecté (ContentType.PHOTO, SCREENSHOT, DIAGRAM, TEXT ou MIXED)
     """
     try:
         with Image.open(image_path) as img:
@@ -291,37 +523,44 @@ def detect_image_content_type(image_path: str) -> Optional[str]:
             width, height = img.size
             aspect_ratio = width / height
             
+            # Pour les JPEG, laisser libjpeg décoder directement à échelle réduite
+            # (mise à l'échelle DCT en C, sans décoder l'image pleine résolution)
+            img.draft('RGB', _ANALYSIS_SIZE)
+            
             # Analyser les couleurs dominantes
             if img.mode != 'RGB':
                 img = img.convert('RGB')
             
             # Réduire l'image pour l'analyse rapide
-            small_img = img.resize((100, 100))
-            colors = small_img.getcolors(maxcolors=256*256*256)
+            small_img = img.resize(_ANALYSIS_SIZE).point(_QUANT_LUT)
+            # Le nombre de couleurs ne peut dépasser le nombre de pixels de la vignette
+            colors = small_img.getcolors(maxcolors=_ANALYSIS_SIZE[0] * _ANALYSIS_SIZE[1])
             
             if colors:
-                # Analyser la distribution des couleurs
-                total_pixels = sum(count for count, color in colors)
-                dominant_colors = sorted(colors, key=lambda x: x[0], reverse=True)[:10]
-                
-                # Calculer la diversité des couleurs
+                # Calculer la diversité des couleurs (la vignette a une taille fixe)
+                total_pixels = small_img.width * small_img.height
                 unique_colors = len(colors)
                 color_diversity = unique_colors / total_pixels
                 
                 # Heuristiques pour déterminer le type de contenu
                 if unique_colors < 20 and color_diversity < 0.1:
-                    return 'diagram'  # Diagramme ou schéma (peu de couleurs)
+                    return ContentType.DIAGRAM  # Diagramme ou schéma (peu de couleurs)
                 elif aspect_ratio > 1.5 and unique_colors < 50:
-                    return 'screenshot'  # Capture d'écran (format large, couleurs limitées)
-                elif color_diversity > 0.3:
-                    return 'photo'  # Photo (grande diversité de couleurs)
+                    return ContentType.SCREENSHOT  # Capture d'écran (format large, couleurs limitées)
+                elif color_diversity > 0.2:
+                    return ContentType.PHOTO  # Photo (grande diversité de couleurs)
                 else:
-                    return 'mixed'  # Contenu mixte
+                    return ContentType.MIXED  # Contenu mixte
             
-            return 'mixed'  # Par défaut
+            return ContentType.MIXED  # Par défaut
             
     except Exception:
-        return 'mixed'  # En cas d'erreur, retourner le type par défaut
+        return ContentType.MIXED  # En cas d'erreur, retourner le type par défaut
+
+@lru_cache(maxsize=8)
+def _lower(text: str) -> str:
+    """Version minuscule mise en cache (le même prompt est réutilisé pour chaque image)."""
+    return text.lower()
 
 def get_optimal_analysis_prompt(image_path: str, base_prompt: str) -> str:
     """
@@ -335,15 +574,4 @@ def get_optimal_analysis_prompt(image_path: str, base_prompt: str) -> str:
         Prompt optimisé pour le type de contenu
     """
     content_type = detect_image_content_type(image_path)
-    
-    # Préfixes spécialisés selon le type de contenu
-    type_prefixes = {
-        'photo': "En analysant cette photographie, ",
-        'screenshot': "En analysant cette capture d'écran, ",
-        'diagram': "En analysant ce diagramme ou schéma, ",
-        'text': "En analysant cette image contenant du texte, ",
-        'mixed': "En analysant cette image, "
-    }
-    
-    prefix = type_prefixes.get(content_type or 'mixed', type_prefixes['mixed'])
-    return prefix + base_prompt.lower()
+    return _PREFIXES[content_type] + _lower(base_prompt)
@@ -9,19 +9,24 @@ et support de différents types de prompts d'analyse.
 """
 
 import os
+import re
 import argparse
+import asyncio
 import json
 import time
+import itertools
+import tempfile
 import sys
 import base64
-from pathlib import Path
-from dotenv import load_dotenv
-from typing import Dict, Any, Optional, List
+import hashlib
+import pickle
+from functools import lru_cache, partial
+from typing import Callable, Dict, Any, Optional, List, Tuple
 
 # Importations des modules locaux
+# Seul cli_ui est importé au chargement (nécessaire pour --help) ; api_utils et
+# image_utils (httpx, Pillow) sont importés à la demande pour accélérer --help / --list-types.
 from cli_ui import print_message, print_debug_data, console, TermColors
-from api_utils import analyze_image_api, analyze_image_ollama
-from image_utils import load_and_validate_image, encode_image_to_base64, get_image_info
 
 # --- Configuration par défaut ---
 DEFAULT_CONFIG_FILENAME = "config.json"
@@ -31,6 +36,23 @@ DEFAULT_MAX_TOKENS = 1000
 DEFAULT_TEMPERATURE = 0.3
 DEFAULT_TIMEOUT = 120
 
+# Répertoire du script et chemin par défaut de config.json (calculés une seule fois)
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_DEFAULT_CFG_PATH = os.path.join(_SCRIPT_DIR, DEFAULT_CONFIG_FILENAME)
+
+# Répertoire de cache propre à l'utilisateur (partagé avec le cache des métadonnées d'image d'image_utils)
+_CACHE_DIR = os.path.expanduser(os.getenv('PHOTOANALYZER_CACHE_DIR', os.path.join('~', '.cache', 'photoanalyzer')))
+
+# Ligne 'CLE=valeur' d'un fichier .env (préfixe 'export' optionnel)
+_ENV_LINE_RE = re.compile(r'^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*?)\s*$')
+
+# Répertoires de sortie déjà créés (évite un mkdir par image en mode batch)
+_ENSURED_DIRS = set()
+
+# Horodatage des noms de fichiers générés : part de l'heure de lancement puis
+# s'incrémente, garantissant des noms uniques en mode batch
+_TIMESTAMP_COUNTER = itertools.count(int(time.time()))
+
 # --- Prompts d'analyse prédéfinis ---
 ANALYSIS_PROMPTS = {
     "general": "Décris cette image de manière détaillée. Identifie tous les éléments visuels importants, les personnes, objets, lieux, couleurs, et l'ambiance générale.",
@@ -47,20 +69,117 @@ ANALYSIS_PROMPTS = {
     "count": "Compte précisément tous les éléments dénombrables dans cette image (personnes, objets, véhicules, etc.) et fournis des totaux."
 }
 
+class _NullColors:
+    """Équivalent sans couleur de TermColors, utilisé lorsque la sortie n'est pas un terminal."""
+    HEADER = OKBLUE = OKCYAN = OKGREEN = WARNING = FAIL = ENDC = BOLD = UNDERLINE = DEBUG = ''
+
+# Pas de séquences ANSI dans l'aide lorsque la sortie est redirigée (pipe, CI)
+_COLORS = TermColors if sys.stdout.isatty() else _NullColors
+
 class ColoredHelpFormatter(argparse.RawDescriptionHelpFormatter):
     """Formateur d'aide personnalisé pour colorer la sortie d'aide."""
     def _format_action_invocation(self, action):
         if not action.option_strings or action.nargs == 0:
             return super()._format_action_invocation(action)
-        return f"{TermColors.OKCYAN}{', '.join(action.option_strings)}{TermColors.ENDC} {self._format_args(action, self._get_default_metavar_for_optional(action))}"
+        return f"{_COLORS.OKCYAN}{', '.join(action.option_strings)}{_COLORS.ENDC} {self._format_args(action, self._get_default_metavar_for_optional(action))}"
+
+    # En-têtes de section remplacés en une seule passe regex
+    _HEADER_RE = re.compile(r'^(usage|options|positional arguments):', re.M)
+    _HEADER_MAP = {
+        'usage': f'{_COLORS.BOLD}Usage:{_COLORS.ENDC}',
+        'options': f'{_COLORS.BOLD}Options:{_COLORS.ENDC}',
+        'positional arguments': f'{_COLORS.BOLD}Arguments Positionnels:{_COLORS.ENDC}'
+    }
 
     def format_help(self):
         help_text = super().format_help()
-        help_text = help_text.replace('usage:', f'{TermColors.BOLD}Usage:{TermColors.ENDC}')
-        help_text = help_text.replace('options:', f'{TermColors.BOLD}Options:{TermColors.ENDC}')
-        help_text = help_text.replace('positional arguments:', f'{TermColors.BOLD}Arguments Positionnels:{TermColors.ENDC}')
-        
-        return help_text
+        return self._HEADER_RE.sub(lambda m: self._HEADER_MAP[m.group(1)], help_text)
+
+@lru_cache(maxsize=None)
+def _load_env_once() -> None:
+    """
+    Charge le fichier .env une seule fois par processus.
+
+    Comme python-dotenv, le fichier est recherché depuis le répertoire du script
+    en remontant vers la racine, et les variables déjà définies ne sont pas écrasées.
+    Gère les lignes 'export CLE=valeur', les valeurs entre guillemets et les commentaires.
+    """
+    directory = _SCRIPT_DIR
+    while True:
+        env_path = os.path.join(directory, ".env")
+        if os.path.isfile(env_path):
+            break
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return  # Aucun fichier .env trouvé
+        directory = parent
+
+    with open(env_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = _ENV_LINE_RE.match(line)
+            if not match:
+                continue
+            key, value = match.group(1), match.group(2)
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+                value = value[1:-1]
+            else:
+                value = value.split(' #', 1)[0].rstrip()
+            os.environ.setdefault(key, value)
+
+def _config_cache_path(config_path: str) -> str:
+    """Fichier du cache pickle d'une configuration, nommé d'après le SHA-256 de son chemin absolu."""
+    digest = hashlib.sha256(os.path.realpath(config_path).encode('utf-8')).hexdigest()
+    return os.path.join(_CACHE_DIR, f"config-{digest}.pickle")
+
+def _read_config_file(config_path: str) -> Dict[str, Any]:
+    """
+    Lit un fichier de configuration JSON via un cache pickle.
+
+    Le cache, qui contient le jeton d'API, est rangé dans le répertoire de cache de
+    l'utilisateur (0700, fichier en 0600) et jamais à côté du fichier JSON. Il n'est relu
+    que s'il appartient à l'utilisateur courant et n'est modifiable par personne d'autre
+    (pickle.load exécuterait le code d'un fichier forgé), et il est invalidé dès que la date
+    de modification ou la taille du fichier JSON change.
+    """
+    stat = os.stat(config_path)
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+    cache_path = _config_cache_path(config_path)
+    
+    try:
+        with open(cache_path, 'rb') as f:
+            cache_stat = os.fstat(f.fileno())
+            trusted = not hasattr(os, 'getuid') or (
+                cache_stat.st_uid == os.getuid() and not cache_stat.st_mode & 0o022
+            )
+            if trusted:
+                cached_key, cached_config = pickle.load(f)
+                if cached_key == cache_key:
+                    return cached_config
+    except Exception:
+        pass  # Cache absent, illisible ou obsolète
+    
+    try:
+        import orjson  # Optionnel : analyse JSON plus rapide
+    except ImportError:
+        orjson = None
+
+    if orjson is not None:
+        with open(config_path, 'rb') as f:
+            file_config = orjson.loads(f.read())
+    else:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            file_config = json.load(f)
+    
+    try:
+        os.makedirs(_CACHE_DIR, mode=0o700, exist_ok=True)
+        # Fichier temporaire (créé en 0600) puis renommage : jamais lisible par les autres utilisateurs
+        with tempfile.NamedTemporaryFile(dir=_CACHE_DIR, suffix='.tmp', delete=False) as tmp:
+            pickle.dump((cache_key, file_config), tmp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp.name, cache_path)
+    except OSError:
+        pass  # Répertoire de cache non accessible en écriture : on se passe du cache
+    
+    return file_config
 
 def load_configuration(config_path: Optional[str], silent: bool, debug_mode: bool) -> Dict[str, Any]:
     """Charge la configuration depuis un fichier JSON et les variables d'environnement."""
@@ -76,7 +195,7 @@ def load_configuration(config_path: Optional[str], silent: bool, debug_mode: boo
     }
 
     # Charger les variables d'environnement
-    load_dotenv()
+    _load_env_once()
     env_api_key = os.getenv("LLMAAS_API_KEY")
     env_api_url = os.getenv("LLMAAS_API_URL")
 
@@ -86,12 +205,11 @@ def load_configuration(config_path: Optional[str], silent: bool, debug_mode: boo
         config["api_url"] = env_api_url
     
     # Déterminer le chemin du fichier de configuration
-    actual_config_path = config_path or os.path.join(os.path.dirname(__file__), DEFAULT_CONFIG_FILENAME)
+    actual_config_path = config_path or _DEFAULT_CFG_PATH
     
     if os.path.exists(actual_config_path):
         try:
-            with open(actual_config_path, 'r', encoding='utf-8') as f:
-                file_config = json.load(f)
+            file_config = _read_config_file(actual_config_path)
             
             # Fusionner la configuration du fichier
             config["api_url"] = file_config.get("api_url", config["api_url"])
@@ -113,6 +231,21 @@ def load_configuration(config_path: Optional[str], silent: bool, debug_mode: boo
     
     return config
 
+@lru_cache(maxsize=None)
+def _resolve_prompt(custom_prompt: Optional[str], analysis_type: str) -> Tuple[str, str]:
+    """Retourne le prompt final et sa provenance pour un couple (prompt personnalisé, type d'analyse)."""
+    if custom_prompt:
+        return custom_prompt, "prompt personnalisé"
+    if analysis_type in ANALYSIS_PROMPTS:
+        return ANALYSIS_PROMPTS[analysis_type], f"prompt prédéfini '{analysis_type}'"
+    return ANALYSIS_PROMPTS["general"], "prompt prédéfini 'general' (par défaut)"
+
+def _ensure_dir(directory: str) -> None:
+    """Crée un répertoire (et ses parents) une seule fois par processus."""
+    if directory and directory not in _ENSURED_DIRS:
+        os.makedirs(directory, exist_ok=True)
+        _ENSURED_DIRS.add(directory)
+
 def save_analysis_result(
     result: str,
     output_file: Optional[str],
@@ -126,24 +259,20 @@ def save_analysis_result(
     if not output_file:
         return None
     
-    output_path = Path(output_file)
-    
     # Si ce n'est pas un chemin absolu, utiliser le répertoire de sortie
-    if not output_path.is_absolute():
-        output_dir_path = Path(output_dir)
-        output_dir_path.mkdir(parents=True, exist_ok=True)
-        
+    if not os.path.isabs(output_file):
         # Si pas d'extension, générer un nom automatique
         if '.' not in output_file:
-            timestamp = int(time.time())
-            base_name = Path(image_filename).stem
+            timestamp = next(_TIMESTAMP_COUNTER)
+            base_name = os.path.splitext(os.path.basename(image_filename))[0]
             output_file = f"{base_name}_{analysis_type}_{timestamp}.txt"
         
-        output_path = output_dir_path / output_file
+        output_path = os.path.join(output_dir, output_file)
     else:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path = output_file
     
     try:
+        _ensure_dir(os.path.dirname(output_path))
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(result)
         
@@ -153,18 +282,205 @@ def save_analysis_result(
         print_message(f"Erreur lors de la sauvegarde dans '{output_path}': {e}", style="error", silent=silent, debug_mode=debug_mode)
         return None
 
+def batch_output_file(output_file: str, image_path: str, used: set) -> str:
+    """
+    Nom du fichier de sortie d'une image en mode batch : '-o analyses.txt' donne
+    'analyses_<image>_<ext>.txt' (extension '.txt' si '-o' n'en a pas). Le répertoire de '-o'
+    est conservé ; un suffixe numérique départage deux images de même nom.
+    """
+    stem, ext = os.path.splitext(output_file)
+    image_name = os.path.basename(image_path).replace('.', '_')
+    candidate = f"{stem}_{image_name}{ext or '.txt'}"
+    index = 2
+    while candidate in used:
+        candidate = f"{stem}_{image_name}_{index}{ext or '.txt'}"
+        index += 1
+    used.add(candidate)
+    return candidate
+
+def collect_batch_images(batch_files: Optional[List[str]], batch_dir: Optional[str]) -> List[str]:
+    """Construit la liste des images à traiter en mode batch (fichiers explicites puis répertoire)."""
+    from image_utils import SUPPORTED_EXTENSIONS
+
+    paths = list(batch_files or [])
+    if batch_dir:
+        for entry in sorted(os.listdir(batch_dir)):
+            full_path = os.path.join(batch_dir, entry)
+            if os.path.isfile(full_path) and os.path.splitext(entry)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(full_path)
+    return paths
+
+def _prepare_image_file(
+    image_file_path: str,
+    model: str,
+    max_dimension: Optional[int],
+    silent_mode: bool,
+    debug_mode: bool
+) -> Optional[Tuple[str, str]]:
+    """
+    Charge et valide une image, puis la réduit si max_dimension est fourni.
+
+    Retourne le chemin du fichier à envoyer (fichier temporaire si l'image a été
+    réduite) et le format à transmettre à l'API, ou None si l'image est invalide.
+    """
+    # Importation différée (Pillow n'est chargé que pour une analyse réelle)
+    from image_utils import load_and_validate_image, get_image_info, probe_image, optimize_image_for_analysis
+
+    # Charger et valider l'image
+    print_message(f"Chargement et validation de l'image '{image_file_path}'...", silent=silent_mode, debug_mode=debug_mode)
+    
+    # Sonder l'image une seule fois et réutiliser ses métadonnées
+    image_meta = probe_image(image_file_path)
+    is_valid, image_format = load_and_validate_image(image_file_path, silent=silent_mode, debug_mode=debug_mode, meta=image_meta)
+    if not is_valid:
+        return None
+
+    # Obtenir les informations sur l'image
+    image_info = get_image_info(image_file_path, silent=silent_mode, debug_mode=debug_mode, meta=image_meta)
+    if image_info and debug_mode and not silent_mode:
+        print_debug_data("Informations Image", image_info, silent=silent_mode, debug_mode=debug_mode)
+
+    # Réduire l'image avant l'envoi si demandé (moins d'octets à encoder et transmettre)
+    upload_path = image_file_path
+    if max_dimension is not None:
+        # Le fichier réduit est enregistré dans le format annoncé à l'API (image_format, déduit du
+        # contenu) : une image à l'extension trompeuse ne produit pas de données incohérentes.
+        fd, temp_path = tempfile.mkstemp(suffix=f".{image_format}")
+        os.close(fd)
+        upload_path = optimize_image_for_analysis(
+            image_file_path,
+            max_dimension=max_dimension,
+            output_path=temp_path,
+            silent=silent_mode,
+            debug_mode=debug_mode,
+            meta=image_meta,
+            output_format=image_format
+        )
+        if upload_path != temp_path:
+            os.remove(temp_path)
+        if upload_path is None:
+            return None
+
+    # L'image est encodée en base64 à la volée pendant l'envoi (pas de copie complète en mémoire)
+    print_message("Encodage de l'image en base64 (flux)...", silent=silent_mode, debug_mode=debug_mode)
+
+    # Exécuter l'analyse via l'API
+    print_message(f"Analyse de l'image avec le modèle {model}...", style="info", silent=silent_mode, debug_mode=debug_mode)
+    
+    # Format détecté lors de la validation (signature du fichier, pas l'extension)
+    return upload_path, image_format
+
+def build_analysis_backend(
+    ollama_url: Optional[str],
+    api_url: Optional[str],
+    api_key: Optional[str],
+    model: str,
+    prompt: str,
+    max_tokens: int,
+    temperature: float,
+    timeout: int,
+    min_pixels: Optional[int],
+    max_pixels: Optional[int],
+    silent_mode: bool,
+    debug_mode: bool,
+    use_async: bool = False
+) -> Callable[..., Any]:
+    """
+    Construit une seule fois l'appel au backend d'analyse (Ollama ou API LLMaaS).
+
+    Le callable retourné n'attend plus que l'image : image_base64, image_path et
+    image_format (plus le client httpx.AsyncClient en premier argument si use_async).
+    """
+    from api_utils import analyze_image_api, analyze_image_ollama, analyze_image_api_async, analyze_image_ollama_async
+
+    common = dict(model=model, prompt=prompt, silent=silent_mode, debug_mode=debug_mode, timeout=timeout)
+    if ollama_url:
+        # Appel direct à Ollama
+        return partial(analyze_image_ollama_async if use_async else analyze_image_ollama, ollama_url=ollama_url, **common)
+
+    # Appel à l'API LLMaaS
+    return partial(
+        analyze_image_api_async if use_async else analyze_image_api,
+        api_url=api_url,
+        api_key=api_key,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        min_pixels=min_pixels,
+        max_pixels=max_pixels,
+        **common
+    )
+
+def analyze_image_file(
+    image_file_path: str,
+    backend: Callable[..., Optional[str]],
+    model: str,
+    max_dimension: Optional[int],
+    silent_mode: bool,
+    debug_mode: bool
+) -> Optional[str]:
+    """Charge, valide et encode une image puis l'envoie au backend d'analyse."""
+    prepared = _prepare_image_file(image_file_path, model, max_dimension, silent_mode, debug_mode)
+    if prepared is None:
+        return None
+    upload_path, image_format = prepared
+
+    try:
+        return backend(image_base64=None, image_path=upload_path, image_format=image_format)
+    finally:
+        # Supprimer la copie réduite temporaire
+        if upload_path != image_file_path:
+            os.remove(upload_path)
+
+async def analyze_image_file_async(
+    client,
+    image_file_path: str,
+    backend: Callable[..., Any],
+    model: str,
+    max_dimension: Optional[int],
+    silent_mode: bool,
+    debug_mode: bool
+) -> Optional[str]:
+    """Variante asynchrone de analyze_image_file, utilisant un httpx.AsyncClient partagé."""
+    prepared = _prepare_image_file(image_file_path, model, max_dimension, silent_mode, debug_mode)
+    if prepared is None:
+        return None
+    upload_path, image_format = prepared
+
+    try:
+        return await backend(client, image_base64=None, image_path=upload_path, image_format=image_format)
+    finally:
+        # Supprimer la copie réduite temporaire
+        if upload_path != image_file_path:
+            os.remove(upload_path)
+
+async def run_batch_analysis(
+    batch_paths: List[str],
+    max_concurrency: int,
+    timeout: int,
+    file_kwargs: Dict[str, Any]
+) -> List[Optional[str]]:
+    """Analyse un lot d'images en parallèle ; au plus max_concurrency requêtes en vol."""
+    import httpx
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        async def analyze_one(path: str) -> Optional[str]:
+            async with semaphore:
+                return await analyze_image_file_async(client, path, **file_kwargs)
+
+        # gather conserve l'ordre d'entrée des images
+        return await asyncio.gather(*(analyze_one(path) for path in batch_paths))
+
 def run_image_analysis_pipeline(args):
     """Exécute le pipeline d'analyse d'image principal."""
     start_time = time.time()
     
     # Assurer que le répertoire du script est utilisé pour trouver config.json par défaut
-    script_dir = os.path.dirname(__file__)
-    default_config_path_in_script_dir = os.path.join(script_dir, DEFAULT_CONFIG_FILENAME)
-
     cfg_input_path = args.config_file
     if args.config_file == DEFAULT_CONFIG_FILENAME and not os.path.exists(args.config_file):
-        if os.path.exists(default_config_path_in_script_dir):
-            cfg_input_path = default_config_path_in_script_dir
+        if os.path.exists(_DEFAULT_CFG_PATH):
+            cfg_input_path = _DEFAULT_CFG_PATH
 
     # Charger la configuration
     cfg = load_configuration(cfg_input_path, args.silent, args.debug)
@@ -181,6 +497,13 @@ def run_image_analysis_pipeline(args):
     cfg_timeout = args.timeout if args.timeout is not None else cfg["default_timeout"]
     
     image_file_path = args.image_file_path
+    batch_paths = collect_batch_images(args.batch, args.batch_dir)
+    if not batch_paths and not image_file_path:
+        # --batch-dir sans aucune image supportée (et pas d'IMAGE_FILE_PATH) : rien à analyser
+        print_message(f"Erreur: Aucune image supportée trouvée dans '{args.batch_dir}'.", style="error")
+        sys.exit(1)
+    if batch_paths and image_file_path:
+        batch_paths.insert(0, image_file_path)
     output_file = args.output_file
     custom_prompt = args.custom_prompt
     debug_mode = args.debug
@@ -199,56 +522,30 @@ def run_image_analysis_pipeline(args):
             return
 
     # Affichage de la configuration en mode debug
-    if debug_mode and not silent_mode:
-        print_debug_data("Configuration Active", cfg, silent=silent_mode, debug_mode=debug_mode)
-        resolved_options = {
-            "Image File Path": image_file_path,
-            "Output File": output_file or "Non spécifié (stdout)",
-            "API URL (LLMaaS)": cfg_api_url,
-            "Ollama URL": cfg_ollama_url or "Non utilisé",
-            "API Key": f"{cfg_api_key[:5]}..." if cfg_api_key else "Non fournie",
-            "Model": cfg_model,
-            "Max Tokens": cfg_max_tokens,
-            "Temperature": cfg_temperature,
-            "Timeout": cfg_timeout,
-            "Analysis Type": cfg_analysis_type,
-            "Custom Prompt": custom_prompt or "Aucun",
-            "Output Directory": cfg_output_directory,
-            "Debug Mode": debug_mode,
-            "Silent Mode": silent_mode
-        }
-        print_debug_data("Options Résolues pour l'Analyse", resolved_options, silent=silent_mode, debug_mode=debug_mode)
-
-    # Charger et valider l'image
-    print_message("Chargement et validation de l'image...", silent=silent_mode, debug_mode=debug_mode)
-    
-    if not load_and_validate_image(image_file_path, silent=silent_mode, debug_mode=debug_mode):
-        return
-
-    # Obtenir les informations sur l'image
-    image_info = get_image_info(image_file_path, silent=silent_mode, debug_mode=debug_mode)
-    if image_info and debug_mode and not silent_mode:
-        print_debug_data("Informations Image", image_info, silent=silent_mode, debug_mode=debug_mode)
-
-    # Encoder l'image en base64
-    print_message("Encodage de l'image en base64...", silent=silent_mode, debug_mode=debug_mode)
-    
-    image_base64 = encode_image_to_base64(image_file_path, silent=silent_mode, debug_mode=debug_mode)
-    if not image_base64:
-        print_message("Échec de l'encodage de l'image.", style="error", silent=silent_mode, debug_mode=debug_mode)
-        return
+    print_debug_data("Configuration Active", cfg, silent=silent_mode, debug_mode=debug_mode)
+    print_debug_data("Options Résolues pour l'Analyse", lambda: {
+        "Image File Path": image_file_path or "Non utilisé (batch)",
+        "Batch Images": len(batch_paths),
+        "Output File": output_file or "Non spécifié (stdout)",
+        "API URL (LLMaaS)": cfg_api_url,
+        "Ollama URL": cfg_ollama_url or "Non utilisé",
+        "API Key": f"{cfg_api_key[:5]}..." if cfg_api_key else "Non fournie",
+        "Model": cfg_model,
+        "Max Tokens": cfg_max_tokens,
+        "Temperature": cfg_temperature,
+        "Timeout": cfg_timeout,
+        "Analysis Type": cfg_analysis_type,
+        "Custom Prompt": custom_prompt or "Aucun",
+        "Output Directory": cfg_output_directory,
+        "Debug Mode": debug_mode,
+        "Silent Mode": silent_mode
+    }, silent=silent_mode, debug_mode=debug_mode)
 
     # Déterminer le prompt à utiliser
-    if custom_prompt:
-        final_prompt = custom_prompt
-        prompt_source = "prompt personnalisé"
-    elif cfg_analysis_type in ANALYSIS_PROMPTS:
-        final_prompt = ANALYSIS_PROMPTS[cfg_analysis_type]
-        prompt_source = f"prompt prédéfini '{cfg_analysis_type}'"
-    else:
-        final_prompt = ANALYSIS_PROMPTS["general"]
-        prompt_source = "prompt prédéfini 'general' (par défaut)"
+    # (argparse valide --analysis-type ; seul un type issu de config.json peut être inconnu)
+    if not custom_prompt and cfg_analysis_type not in ANALYSIS_PROMPTS:
         print_message(f"Type d'analyse '{cfg_analysis_type}' non reconnu, utilisation du prompt général.", style="warning", silent=silent_mode, debug_mode=debug_mode)
+    final_prompt, prompt_source = _resolve_prompt(custom_prompt, cfg_analysis_type)
 
     print_message(f"Utilisation du {prompt_source}.", silent=silent_mode, debug_mode=debug_mode)
     
@@ -283,18 +580,6 @@ def run_image_analysis_pipeline(args):
         if resized_width is not None and resized_height is not None:
             print_message(f"Utilisation des dimensions spécifiées : {resized_width}x{resized_height}.", style="info", silent=silent_mode, debug_mode=debug_mode)
 
-    # Exécuter l'analyse via l'API
-    print_message(f"Analyse de l'image avec le modèle {cfg_model}...", style="info", silent=silent_mode, debug_mode=debug_mode)
-    
-    # Détecter le format de l'image
-    image_format = "jpeg"  # Par défaut
-    if image_file_path.lower().endswith('.png'):
-        image_format = "png"
-    elif image_file_path.lower().endswith('.webp'):
-        image_format = "webp"
-    elif image_file_path.lower().endswith(('.jpg', '.jpeg')):
-        image_format = "jpeg"
-    
     # Calculer min_pixels et max_pixels si dimensions spécifiées
     min_pixels = None
     max_pixels = None
@@ -303,90 +588,111 @@ def run_image_analysis_pipeline(args):
         min_pixels = total_pixels
         max_pixels = total_pixels
 
-    analysis_result = None
-    if cfg_ollama_url:
-        # Appel direct à Ollama
-        analysis_result = analyze_image_ollama(
-            ollama_url=cfg_ollama_url,
-            model=cfg_model,
-            image_base64=image_base64,
-            prompt=final_prompt,
-            silent=silent_mode,
-            debug_mode=debug_mode,
-            timeout=cfg_timeout
-        )
-    else:
-        # Appel à l'API LLMaaS
-        analysis_result = analyze_image_api(
-            api_url=cfg_api_url,
-            api_key=cfg_api_key,
-            model=cfg_model,
-            image_base64=image_base64,
-            prompt=final_prompt,
-            max_tokens=cfg_max_tokens,
-            temperature=cfg_temperature,
-            silent=silent_mode,
-            debug_mode=debug_mode,
-            timeout=cfg_timeout,
-            min_pixels=min_pixels,
-            max_pixels=max_pixels,
-            image_format=image_format
-        )
-
-    if not analysis_result:
-        print_message("Échec de l'analyse de l'image.", style="error", silent=silent_mode, debug_mode=debug_mode)
-        return
+    # Paramètres du backend communs à toutes les images (résolus une seule fois)
+    backend_kwargs = dict(
+        ollama_url=cfg_ollama_url,
+        api_url=cfg_api_url,
+        api_key=cfg_api_key,
+        model=cfg_model,
+        prompt=final_prompt,
+        max_tokens=cfg_max_tokens,
+        temperature=cfg_temperature,
+        timeout=cfg_timeout,
+        min_pixels=min_pixels,
+        max_pixels=max_pixels,
+        silent_mode=silent_mode,
+        debug_mode=debug_mode
+    )
+    file_kwargs = dict(
+        model=cfg_model,
+        max_dimension=args.max_dimension,
+        silent_mode=silent_mode,
+        debug_mode=debug_mode
+    )
 
-    # Afficher le résultat
-    if not silent_mode:
-        console.rule("[bold green]Résultat de l'Analyse")
-        console.print(analysis_result)
-        console.rule()
+    if batch_paths:
+        # Mode batch : les appels réseau sont superposés sur une boucle asyncio
+        workers = max(1, min(args.batch_workers, len(batch_paths)))
+        print_message(f"Mode batch : {len(batch_paths)} image(s) à analyser ({workers} en parallèle).", style="info", silent=silent_mode, debug_mode=debug_mode)
+        backend = build_analysis_backend(**backend_kwargs, use_async=True)
+        results = asyncio.run(run_batch_analysis(batch_paths, workers, cfg_timeout, dict(file_kwargs, backend=backend)))
     else:
-        # En mode silencieux, afficher seulement le résultat
-        console.print(analysis_result)
-
-    # Sauvegarder le résultat si demandé
-    if output_file:
-        saved_path = save_analysis_result(
-            analysis_result,
-            output_file,
-            cfg_output_directory,
-            image_file_path,
-            cfg_analysis_type,
-            silent_mode,
-            debug_mode
-        )
+        batch_paths = [image_file_path]
+        backend = build_analysis_backend(**backend_kwargs)
+        results = [analyze_image_file(image_file_path, backend=backend, **file_kwargs)]
+
+    success_count = 0
+    used_output_files = set()
+    for path, analysis_result in zip(batch_paths, results):
+        if not analysis_result:
+            print_message(f"Échec de l'analyse de l'image '{path}'.", style="error", silent=silent_mode, debug_mode=debug_mode)
+            continue
+        success_count += 1
+
+        # Afficher le résultat
+        if not silent_mode:
+            title = "[bold green]Résultat de l'Analyse"
+            if len(batch_paths) > 1:
+                title += f" - {os.path.basename(path)}"
+            console.rule(title)
+            console.print(analysis_result)
+            console.rule()
+        else:
+            # En mode silencieux, afficher seulement le résultat
+            console.print(analysis_result)
+
+        # Sauvegarder le résultat si demandé
+        if output_file:
+            saved_path = save_analysis_result(
+                analysis_result,
+                # En mode batch, un nom de fichier distinct est dérivé de '-o' pour chaque image
+                batch_output_file(output_file, path, used_output_files) if len(batch_paths) > 1 else output_file,
+                cfg_output_directory,
+                path,
+                cfg_analysis_type,
+                silent_mode,
+                debug_mode
+            )
 
     # Affichage du temps d'exécution
     end_time = time.time()
     total_duration_sec = end_time - start_time
-    print_message(f"Analyse terminée en {total_duration_sec:.2f} secondes.", style="info", silent=silent_mode, debug_mode=debug_mode)
+    if len(batch_paths) > 1:
+        print_message(f"{success_count}/{len(batch_paths)} image(s) analysée(s) en {total_duration_sec:.2f} secondes.", style="info", silent=silent_mode, debug_mode=debug_mode)
+    elif success_count:
+        print_message(f"Analyse terminée en {total_duration_sec:.2f} secondes.", style="info", silent=silent_mode, debug_mode=debug_mode)
 
 def list_analysis_types():
     """Affiche la liste des types d'analyse disponibles."""
     console.rule("[bold blue]Types d'Analyse Disponibles")
     
-    for analysis_type, description in ANALYSIS_PROMPTS.items():
-        console.print(f"[bold cyan]{analysis_type}[/bold cyan]:")
-        console.print(f"  {description}")
-        console.print()
+    # Un seul rendu Rich pour l'ensemble de la liste
+    console.print("".join(
+        f"[bold cyan]{analysis_type}[/bold cyan]:\n  {description}\n\n"
+        for analysis_type, description in ANALYSIS_PROMPTS.items()
+    ), end="")
 
 if __name__ == '__main__':
+    # Chemin rapide pour --list-types : contenu statique, pas besoin du parser
+    if '--list-types' in sys.argv[1:]:
+        list_analysis_types()
+        sys.exit(0)
+
     # Création du parser avec argparse
     parser = argparse.ArgumentParser(
-        description=f"{TermColors.HEADER}{TermColors.BOLD}📸 PhotoAnalyzer Python CLI - Analyse d'Images avec IA Multimodale 📸{TermColors.ENDC}\n{(__doc__ or '').strip()}",
+        description=f"{_COLORS.HEADER}{_COLORS.BOLD}📸 PhotoAnalyzer Python CLI - Analyse d'Images avec IA Multimodale 📸{_COLORS.ENDC}\n{(__doc__ or '').strip()}",
         formatter_class=ColoredHelpFormatter,
-        epilog=f"""{TermColors.OKGREEN}{TermColors.BOLD}Exemples d'utilisation:{TermColors.ENDC}
-  {TermColors.OKCYAN}python photoanalyzer.py image.jpg{TermColors.ENDC}
-  {TermColors.OKCYAN}python photoanalyzer.py photo.png -o description.txt --debug{TermColors.ENDC}
-  {TermColors.OKCYAN}python photoanalyzer.py image.jpg -t people -m "qwen3-vl:8b"{TermColors.ENDC}
-  {TermColors.OKCYAN}python photoanalyzer.py screenshot.png -p "Analyse ce contenu technique"{TermColors.ENDC}
-  {TermColors.OKCYAN}python photoanalyzer.py photo.jpg --silent > description.txt{TermColors.ENDC}"""
+        epilog=f"""{_COLORS.OKGREEN}{_COLORS.BOLD}Exemples d'utilisation:{_COLORS.ENDC}
+  {_COLORS.OKCYAN}python photoanalyzer.py image.jpg{_COLORS.ENDC}
+  {_COLORS.OKCYAN}python photoanalyzer.py photo.png -o description.txt --debug{_COLORS.ENDC}
+  {_COLORS.OKCYAN}python photoanalyzer.py image.jpg -t people -m "qwen3-vl:8b"{_COLORS.ENDC}
+  {_COLORS.OKCYAN}python photoanalyzer.py screenshot.png -p "Analyse ce contenu technique"{_COLORS.ENDC}
+  {_COLORS.OKCYAN}python photoanalyzer.py photo.jpg --silent > description.txt{_COLORS.ENDC}
+  {_COLORS.OKCYAN}python photoanalyzer.py --batch-dir images/ -o analyses.txt{_COLORS.ENDC}"""
     )
 
-    parser.add_argument('image_file_path', metavar="IMAGE_FILE_PATH", type=str, help="Chemin vers le fichier image à analyser.")
-    parser.add_argument('-o', '--output-file', type=str, help="Fichier pour sauvegarder l'analyse (extension ajoutée automatiquement si absente).")
+    parser.add_argument('image_file_path', metavar="IMAGE_FILE_PATH", type=str, nargs='?', help="Chemin vers le fichier image à analyser.")
+    parser.add_argument('-o', '--output-file', type=str, help="Fichier pour sauvegarder l'analyse (extension ajoutée automatiquement si absente). En mode batch, un fichier par image : '-o analyses.txt' donne 'analyses_<image>_<ext>.txt'.")
     
     # Options de connexion
     parser.add_argument('-c', '--config-file', type=str, default=DEFAULT_CONFIG_FILENAME, help=f"Chemin vers le fichier de configuration JSON (défaut: {DEFAULT_CONFIG_FILENAME}).")
@@ -404,6 +710,10 @@ if __name__ == '__main__':
     parser.add_argument('--output-dir', type=str, help=f"Répertoire pour sauvegarder les analyses (défaut: {DEFAULT_OUTPUT_DIR}).")
     parser.add_argument('--resized-width', type=int, help="Largeur de redimensionnement de l'image (doit être multiple de 28).")
     parser.add_argument('--resized-height', type=int, help="Hauteur de redimensionnement de l'image (doit être multiple de 28).")
+    parser.add_argument('--max-dimension', type=int, help="Réduire l'image avant l'envoi si sa plus grande dimension dépasse cette valeur (en pixels).")
+    parser.add_argument('--batch', nargs='+', metavar="IMAGE", help="Analyser plusieurs images dans un seul processus.")
+    parser.add_argument('--batch-dir', type=str, help="Analyser toutes les images supportées d'un répertoire.")
+    parser.add_argument('--batch-workers', type=int, default=4, help="Nombre d'analyses simultanées en mode batch (défaut: 4).")
     parser.add_argument('--list-types', action='store_true', help="Afficher la liste des types d'analyse disponibles et quitter.")
     parser.add_argument('--debug', action='store_true', help="Activer le mode de débogage verbeux.")
     parser.add_argument('--silent', action='store_true', help="Mode silencieux: affiche uniquement le résultat de l'analyse.")
@@ -415,8 +725,15 @@ if __name__ == '__main__':
         list_analysis_types()
         sys.exit(0)
     
+    if not parsed_args.image_file_path and not parsed_args.batch and not parsed_args.batch_dir:
+        parser.error("IMAGE_FILE_PATH est requis (ou utilisez --batch / --batch-dir).")
+
+    if parsed_args.batch_dir and not os.path.isdir(parsed_args.batch_dir):
+        print_message(f"Erreur: Le répertoire '{parsed_args.batch_dir}' n'existe pas.", style="error")
+        sys.exit(1)
+
     # Vérifier si le fichier image existe
-    if not os.path.exists(parsed_args.image_file_path):
+    if parsed_args.image_file_path and not os.path.exists(parsed_args.image_file_path):
         try:
             print_message(f"Erreur: Le fichier image spécifié '{parsed_args.image_file_path}' n'existe pas.", style="error")
         except NameError:
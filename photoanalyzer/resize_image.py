@@ -6,7 +6,7 @@ Script simple pour redimensionner une image en utilisant les utilitaires existan
 
 import sys
 import argparse
-from image_utils import optimize_image_for_analysis, get_image_info, MAX_RECOMMENDED_DIMENSION
+from image_utils import optimize_image_for_analysis, get_image_info, probe_image, MAX_RECOMMENDED_DIMENSION
 
 def main():
     """
@@ -22,7 +22,8 @@ def main():
     args = parser.parse_args()
 
     print("--- Informations sur l'image originale ---")
-    info = get_image_info(args.image_path)
+    meta = probe_image(args.image_path)
+    info = get_image_info(args.image_path, meta=meta)
     if not info:
         sys.exit(1)
     
@@ -37,7 +38,8 @@ def main():
     optimized_path = optimize_image_for_analysis(
         image_path=args.image_path,
         max_dimension=args.max_dim,
-        quality=args.quality
+        quality=args.quality,
+        meta=meta
     )
     
     if optimized_path:
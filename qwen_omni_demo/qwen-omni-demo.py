@@ -8,36 +8,69 @@ Plus d'informations : https://github.com/QwenLM/Qwen3-Omni
 
 import os
 import json
+import asyncio
+import base64
+import hashlib
+import mimetypes
+import time
+from pathlib import Path
 import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.json import JSON
 
+try:
+    import orjson  # Optionnel : décodage JSON plus rapide
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # Chargement de la configuration depuis le fichier .env
 load_dotenv()
 
 # Initialisation de la console Rich pour un affichage soigné
 console = Console()
 
+# Barre de progression unique partagée par tous les tests : chaque test y ajoute sa
+# ligne le temps de son exécution. Désactivée si la sortie n'est pas un terminal.
+progress = Progress(
+    SpinnerColumn(),
+    TextColumn("[progress.description]{task.description}"),
+    console=console,
+    transient=True,
+    disable=not console.is_terminal
+)
+
 # Configuration de l'API
 API_BASE = os.getenv("API_ENDPOINT")
 API_KEY = os.getenv("API_KEY", "EMPTY")
 MODEL_NAME = os.getenv("MODEL_NAME", "qwen3-omni:30b")
 SSL_VERIFY = os.getenv("SSL_VERIFY", "true").lower() == "true"
+MAX_CONCURRENT_TESTS = int(os.getenv("MAX_CONCURRENT_TESTS", "4"))
+INLINE_MEDIA = os.getenv("INLINE_MEDIA", "true").lower() == "true"
+
+# Répertoire de cache local des médias téléchargés (audio, vidéo, images)
+MEDIA_CACHE_DIR = Path(__file__).resolve().parent / ".cache"
 
 # Vérification de la configuration critique
 if not API_BASE:
     console.print("[bold red]Erreur :[/] API_ENDPOINT non défini dans .env")
     exit(1)
 
-# Initialisation du client OpenAI
-client = OpenAI(
+# Initialisation du client OpenAI asynchrone (les tests sont exécutés en parallèle).
+# Un seul client HTTP/2 avec keep-alive : toutes les requêtes réutilisent la même session TLS.
+client = AsyncOpenAI(
     api_key=API_KEY,
     base_url=API_BASE,
-    http_client=httpx.Client(verify=SSL_VERIFY)
+    http_client=httpx.AsyncClient(
+        verify=SSL_VERIFY,
+        http2=True,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16, keepalive_expiry=60.0),
+        timeout=httpx.Timeout(120.0, connect=10.0)
+    )
 )
 
 # --- Prompts Système ---
@@ -61,8 +94,10 @@ You communicate in the same language as the user unless they request otherwise.
 When you are uncertain (e.g., you can't see/hear clearly, don't understand, or the user makes a comment rather than asking a question), use appropriate questions to guide the user to continue the conversation. 
 Keep replies concise and conversational, as if talking face-to-face."""
 
-# Définition des outils pour le test de Function Calling
-TOOLS_DEFINITION = [
+# Définition des outils pour le test de Function Calling.
+# Définie une seule fois au chargement du module et partagée par toutes les requêtes. Les
+# dictionnaires restent modifiables (ne pas les altérer) et le SDK les sérialise à chaque appel.
+TOOLS_DEFINITION = (
     {
         'type': 'function',
         'function': {
@@ -96,7 +131,37 @@ TOOLS_DEFINITION = [
             }
         }
     }
-]
+)
+
+# Téléchargements en cours ou terminés, par URL (un média utilisé par plusieurs tests n'est téléchargé qu'une fois)
+_media_downloads = {}
+
+async def _download_as_data_uri(url):
+    """Télécharge un média (ou le relit depuis le cache disque) et le retourne sous forme de data URI."""
+    cache_path = MEDIA_CACHE_DIR / hashlib.sha1(url.encode("utf-8")).hexdigest()
+    if not cache_path.exists():
+        async with httpx.AsyncClient(verify=SSL_VERIFY, timeout=httpx.Timeout(120.0, connect=10.0)) as http:
+            response = await http.get(url)
+            response.raise_for_status()
+        MEDIA_CACHE_DIR.mkdir(exist_ok=True)
+        cache_path.write_bytes(response.content)
+    mime_type = mimetypes.guess_type(url)[0] or "application/octet-stream"
+    return f"data:{mime_type};base64,{base64.b64encode(cache_path.read_bytes()).decode('ascii')}"
+
+async def inline_media(content_block):
+    """
+    Remplace l'URL distante d'un bloc audio/vidéo/image par son contenu encodé en base64.
+
+    Le serveur d'inférence n'a alors plus à re-télécharger le média à chaque requête.
+    Sans effet si INLINE_MEDIA=false ou si le bloc ne contient pas d'URL http(s).
+    """
+    block_type = content_block["type"]
+    url = content_block[block_type]["url"]
+    if not INLINE_MEDIA or not url.startswith(("http://", "https://")):
+        return content_block
+    if url not in _media_downloads:
+        _media_downloads[url] = asyncio.ensure_future(_download_as_data_uri(url))
+    return {"type": block_type, block_type: {"url": await _media_downloads[url]}}
 
 def print_header():
     """Affiche l'en-tête de la démonstration."""
@@ -107,20 +172,23 @@ def print_header():
         border_style="cyan"
     ))
 
-def run_test(title, content_block, user_text, system_prompt=None):
+async def run_test(title, content_block, user_text, system_prompt=None):
     """
     Exécute un test unitaire simple (Chat Completion).
+
+    Les tests tournant en parallèle, l'affichage est accumulé puis retourné
+    pour être imprimé dans l'ordre des tests.
     """
-    console.print(f"\n[bold yellow]=== Test : {title} ===[/]")
+    output = [f"\n[bold yellow]=== Test : {title} ===[/]"]
     
     messages = []
     
     # Ajout du System Prompt seulement s'il est défini
     if system_prompt:
-        console.print(f"[dim]System Prompt : {system_prompt[:60].replace(chr(10), ' ')}...[/]")
+        output.append(f"[dim]System Prompt : {system_prompt[:60].replace(chr(10), ' ')}...[/]")
         messages.append({"role": "system", "content": system_prompt})
     else:
-        console.print("[dim]System Prompt : Aucun (Utilisation par défaut du modèle)[/]")
+        output.append("[dim]System Prompt : Aucun (Utilisation par défaut du modèle)[/]")
 
     messages.append({
         "role": "user",
@@ -131,180 +199,222 @@ def run_test(title, content_block, user_text, system_prompt=None):
     })
 
     if user_text:
-        console.print(f"[dim]Prompt Utilisateur :[/] {user_text}")
+        output.append(f"[dim]Prompt Utilisateur :[/] {user_text}")
     
+    task_id = progress.add_task(description=title, total=None)
     try:
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
-        ) as progress:
-            progress.add_task(description="Génération en cours...", total=None)
-            
-            completion = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages,
-                max_tokens=200
-            )
+        messages[-1]["content"][0] = await inline_media(content_block)
+        # Réponse en streaming : les tokens arrivent au fil de la génération, ce qui
+        # permet de mesurer le temps jusqu'au premier token.
+        start_time = time.perf_counter()
+        first_token_time = None
+        parts = []
+        stream = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages,
+            max_tokens=200,
+            stream=True
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start_time
+                parts.append(delta)
             
-        response = completion.choices[0].message.content or ""
-        console.print(Panel(response, title="Réponse du Modèle", border_style="green"))
+        response = "".join(parts)
+        subtitle = f"1er token : {first_token_time:.2f} s" if first_token_time is not None else None
+        output.append(Panel(response, title="Réponse du Modèle", subtitle=subtitle, border_style="green"))
         
     except Exception as e:
-        console.print(f"[bold red]Erreur :[/] {e}")
+        output.append(f"[bold red]Erreur :[/] {e}")
+    finally:
+        progress.remove_task(task_id)
 
-def run_tool_test(title, content_block):
+    return output
+
+async def run_tool_test(title, content_block):
     """
     Exécute un test de Function Calling.
+
+    Comme run_test, retourne l'affichage du test au lieu de l'imprimer directement.
     """
-    console.print(f"\n[bold yellow]=== Test : {title} (Tool Use) ===[/]")
+    output = [f"\n[bold yellow]=== Test : {title} (Tool Use) ===[/]"]
     
     messages = [
         {"role": "system", "content": PROMPT_VOICE_ASSISTANT},
         {"role": "user", "content": [content_block]}
     ]
 
+    task_id = progress.add_task(description=f"{title} (Tool Use)", total=None)
     try:
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
-        ) as progress:
-            progress.add_task(description="Analyse Audio & Sélection d'Outil...", total=None)
-            
-            completion = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages,
-                tools=TOOLS_DEFINITION,
-                tool_choice="auto",
-                max_tokens=200
-            )
+        messages[-1]["content"][0] = await inline_media(content_block)
+        completion = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages,
+            tools=TOOLS_DEFINITION,
+            tool_choice="auto",
+            max_tokens=200
+        )
             
         message = completion.choices[0].message
         
         # Affichage du contenu textuel s'il y en a
         if message.content:
-             console.print(Panel(message.content, title="Pensée / Réponse Textuelle", border_style="blue"))
+             output.append(Panel(message.content, title="Pensée / Réponse Textuelle", border_style="blue"))
 
         # Affichage des appels d'outils
         if message.tool_calls:
             for tool_call in message.tool_calls:
                 tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
+                tool_args = json_loads(tool_call.function.arguments)
                 
-                console.print(Panel(
+                output.append(Panel(
                     JSON.from_data(tool_args),
                     title=f"Tool Call: [bold magenta]{tool_name}[/]",
                     border_style="magenta"
                 ))
         else:
-            console.print("[yellow]Aucun outil appelé par le modèle.[/]")
+            output.append("[yellow]Aucun outil appelé par le modèle.[/]")
             
     except Exception as e:
-        console.print(f"[bold red]Erreur :[/] {e}")
+        output.append(f"[bold red]Erreur :[/] {e}")
+    finally:
+        progress.remove_task(task_id)
 
-def main():
-    """Fonction principale."""
+    return output
+
+async def main():
+    """Fonction principale : lance les tests en parallèle et affiche leurs résultats dans l'ordre."""
     print_header()
+    tests = []
     
     # Test 1 : Audio Translation
     # Use Case : Assistant Vocal
     audio_url_1 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/translate_to_chinese.wav"
-    run_test(
+    tests.append(run_test(
         "Audio Translation",
         {"type": "audio_url", "audio_url": {"url": audio_url_1}},
         "Please process this audio and translate/answer. after that, Write an alternative in french.",
         system_prompt=PROMPT_VOICE_ASSISTANT
-    )
+    ))
     
     # Test 2 : Audio Description
     # Use Case : Analyse Audio
     # Prompt : Aucun (Zero-shot)
     audio_url_2 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/caption1.mp3"
-    run_test(
+    tests.append(run_test(
         "Audio Description",
         {"type": "audio_url", "audio_url": {"url": audio_url_2}},
         "Give the detailed description of the audio."
-    )
+    ))
 
     # Test 3 : Audio Function Calling
     # Use Case : Assistant Vocal (Actionnable)
     # Prompt : Géré automatiquement par l'API tools ou PROMPT_VOICE_ASSISTANT
     audio_url_3 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/functioncall_case.wav"
-    run_tool_test(
+    tests.append(run_tool_test(
         "Audio Function Calling",
         {"type": "audio_url", "audio_url": {"url": audio_url_3}}
-    )
+    ))
     
     # Test 4 : Entrée Vidéo
     # Use Case : Analyse Vidéo
     # Prompt : Aucun (Zero-shot)
     video_url = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/draw.mp4"
-    run_test(
+    tests.append(run_test(
         "Vidéo Description",
         {"type": "video_url", "video_url": {"url": video_url}},
         "Describe what is happening in this video."
-    )
+    ))
 
     # Test 5 : Conversational Video Interaction
     # Use Case : Chat Vidéo (Persona Spécifique)
     # Prompt : PROMPT_CONVERSATIONAL (Spécifique)
-    run_test(
+    tests.append(run_test(
         "Conversational Video Interaction",
         {"type": "video_url", "video_url": {"url": video_url}},
         "Hello! I see you are drawing something. Can you tell me what it is?",
         system_prompt=PROMPT_CONVERSATIONAL
-    )
+    ))
 
     # Test 6 : Video Scene Change Detection
     # Use Case : Analyse Vidéo Avancée
     # Prompt : Aucun (Zero-shot)
     video_url_2 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/video4.mp4"
-    run_test(
+    tests.append(run_test(
         "Video Scene Change Detection",
         {"type": "video_url", "video_url": {"url": video_url_2}},
         "How the scenes in the video change?"
-    )
+    ))
 
     # Test 7 : Mixed Audio Analysis
     # Use Case : Analyse Audio Complexe
     # Prompt : Aucun (Zero-shot)
     audio_url_4 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/mixed_audio2.mp3"
-    run_test(
+    tests.append(run_test(
         "Mixed Audio Analysis",
         {"type": "audio_url", "audio_url": {"url": audio_url_4}},
         "Determine which sound effects and musical instruments are present in the audio."
-    )
+    ))
 
     # Test 8 : Object Grounding
     # Use Case : Vision Technique (JSON)
     # Prompt : Aucun (Zero-shot avec consigne dans le user prompt)
     image_url_1 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/grounding1.jpeg"
-    run_test(
+    tests.append(run_test(
         "Object Grounding",
         {"type": "image_url", "image_url": {"url": image_url_1}},
         "Locate the object: bird. Return the bounding box in JSON format."
-    )
+    ))
 
     # Test 9 : Video Navigation
     # Use Case : Raisonnement Spatial
     # Prompt : Aucun (Zero-shot)
     video_url_3 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/video2.mp4"
-    run_test(
+    tests.append(run_test(
         "Video Navigation",
         {"type": "video_url", "video_url": {"url": video_url_3}},
         "If I want to stop at the window. Which direction should I take?"
-    )
+    ))
 
     # Test 10 : OCR
     # Use Case : Extraction Texte
     # Prompt : Aucun (Zero-shot)
     image_url_2 = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen3-Omni/cookbook/ocr1.jpeg"
-    run_test(
+    tests.append(run_test(
         "OCR (Text Extraction)",
         {"type": "image_url", "image_url": {"url": image_url_2}},
         "Extract the text from the image."
-    )
+    ))
+
+    # Les appels au modèle sont indépendants : au plus MAX_CONCURRENT_TESTS sont en vol à la fois.
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
+
+    async def bounded(test):
+        async with semaphore:
+            return await test
+
+    tasks = [asyncio.ensure_future(bounded(test)) for test in tests]
+
+    try:
+        # Un seul rendu (et un seul thread) pour tous les tests ; les tests en cours
+        # d'exécution apparaissent chacun sur leur propre ligne.
+        with progress:
+            # Chaque résultat est affiché dès que lui et ceux qui le précèdent sont terminés,
+            # sans attendre la fin de tous les tests.
+            for task in tasks:
+                try:
+                    result = await task
+                except Exception as e:
+                    console.print(f"[bold red]Erreur :[/] {e}")
+                    continue
+                for renderable in result:
+                    console.print(renderable)
+    finally:
+        await client.close()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
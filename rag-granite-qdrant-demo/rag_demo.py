@@ -25,18 +25,115 @@ Le processus est le suivant :
 import os
 import time
 import json
+import asyncio
+import hashlib
+import sqlite3
+import httpx
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import qdrant_client
+from qdrant_client import models
 from dotenv import load_dotenv
 from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import CharacterTextSplitter
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import ChatOpenAI
 from langchain_community.vectorstores import Qdrant
-from langchain.prompts import PromptTemplate
+from langchain_core.messages import HumanMessage, SystemMessage, get_buffer_string
 from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from typing import List
+from typing import Dict, List, Optional
+
+try:
+    import orjson  # Optionnel : décodage JSON plus rapide des réponses d'embedding
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import tiktoken  # Optionnel : taille des chunks mesurée en tokens plutôt qu'estimée en caractères
+except ImportError:
+    tiktoken = None
+
+# Instructions système du LLM de génération. Ce texte ne doit contenir aucune partie
+# variable : un préfixe de prompt stable permet au serveur de réutiliser son cache.
+RAG_SYSTEM_INSTRUCTIONS = """Utilise les morceaux de contexte fournis par l'utilisateur pour répondre à la question à la fin.
+Si tu ne connais pas la réponse, dis simplement que tu ne sais pas, n'essaie pas d'inventer une réponse."""
+
+# Message utilisateur : le contexte récupéré de Qdrant suivi de la question.
+RAG_USER_TEMPLATE = "{context}\n\nQuestion: {question}\nRéponse en français:"
+
+# Taille des chunks, exprimée en tokens du modèle d'embedding (fenêtre de 512 tokens pour
+# granite-embedding:278m). Si tiktoken est installé, les chunks sont mesurés avec l'encodage
+# TIKTOKEN_ENCODING (proche du tokenizer du modèle) ; sinon la taille est convertie en caractères
+# avec une estimation prudente pour le français. Dans les deux cas on remplit la fenêtre sans la dépasser.
+EMBED_CHUNK_TOKENS = 480
+EMBED_CHUNK_OVERLAP_TOKENS = 48
+CHARS_PER_TOKEN = 3
+TIKTOKEN_ENCODING = "cl100k_base"
+
+# Budget de tokens par requête d'embedding : les lots sont remplis jusqu'à ce budget
+# (et au plus `max_batch` textes), quelle que soit la longueur des textes.
+MAX_TOKENS_PER_BATCH = 8000
+
+# Chargement en masse dans Qdrant : taille des lots, nombre de processus d'envoi, et seuil
+# (en Ko de vecteurs) à partir duquel Qdrant construit l'index HNSW une fois le chargement terminé
+UPLOAD_BATCH_SIZE = 256
+UPLOAD_PARALLEL = 4
+INDEXING_THRESHOLD = 20000
+
+# Recherche dans Qdrant : nombre de chunks récupérés et largeur de la recherche HNSW (ef).
+# ef=64 suffit pour retrouver les 4 plus proches voisins, à moindre coût que la valeur par défaut.
+RETRIEVER_TOP_K = 4
+SEARCH_HNSW_EF = 64
+
+# Fichier du cache disque des embeddings (désactivable avec LLMAAS_EMBED_CACHE=0)
+EMBED_CACHE_PATH = ".embed_cache.sqlite"
+
+# ==============================================================================
+# CACHE DISQUE DES EMBEDDINGS
+# ==============================================================================
+
+class EmbeddingCache:
+    """
+    Cache disque (SQLite) des vecteurs déjà calculés.
+
+    La clé est le SHA-256 de "modèle|texte" : relancer la démo sur le même document
+    ne rappelle pas l'API d'embedding. Les vecteurs sont stockés en float32 binaire (4 octets par composante).
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        # Table dédiée aux vecteurs normalisés (les entrées d'un ancien cache non normalisé sont ignorées).
+        self.conn.execute("CREATE TABLE IF NOT EXISTS normalized_embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}|{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Retourne les vecteurs connus, indexés par clé (les clés absentes sont ignorées)."""
+        found = {}
+        # Requêtes par paquets pour rester sous la limite de paramètres SQLite.
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM normalized_embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO normalized_embeddings (key, vector) VALUES (?, ?)",
+                ((key, vector.astype(np.float32, copy=False).tobytes()) for key, vector in items.items()),
+            )
+
+    def close(self):
+        self.conn.close()
 
 # ==============================================================================
 # CLASSE D'EMBEDDING PERSONNALISÉE
@@ -53,7 +150,16 @@ class LLMaaSEmbeddings(Embeddings):
     2. L'authentification par Bearer Token est correctement gérée.
     """
 
-    def __init__(self, model: str, api_base: str, api_key: str):
+    def __init__(
+        self,
+        model: str,
+        api_base: str,
+        api_key: str,
+        max_batch: int = 64,
+        max_concurrency: int = 8,
+        max_tokens_per_batch: int = MAX_TOKENS_PER_BATCH,
+        cache_path: Optional[str] = EMBED_CACHE_PATH,
+    ):
         """
         Initialise le client d'embedding.
         
@@ -61,6 +167,11 @@ class LLMaaSEmbeddings(Embeddings):
             model (str): Le nom du modèle d'embedding à utiliser (ex: "granite-embedding:278m").
             api_base (str): L'URL de base de l'API LLMaaS (ex: "https://api.ai.cloud-temple.com/v1").
             api_key (str): La clé d'API pour l'authentification.
+            max_batch (int): Nombre maximal de textes envoyés dans une seule requête d'embedding.
+            max_concurrency (int): Nombre maximal de requêtes d'embedding simultanées (embed_documents).
+            max_tokens_per_batch (int): Nombre maximal de tokens (cumulés) envoyés dans une seule requête d'embedding.
+            cache_path (Optional[str]): Fichier du cache disque des vecteurs ; None (ou la variable
+                d'environnement LLMAAS_EMBED_CACHE=0) désactive le cache.
         """
         self.model = model
         self.api_url = f"{api_base.rstrip('/')}/embeddings"
@@ -68,15 +179,62 @@ class LLMaaSEmbeddings(Embeddings):
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         }
-
-    def _embed(self, text: str) -> List[float]:
-        """Méthode interne pour obtenir l'embedding d'un seul texte."""
-        payload = {"model": self.model, "input": text}
+        self.max_batch = max_batch
+        self.max_concurrency = max_concurrency
+        self.max_tokens_per_batch = max_tokens_per_batch
+        use_cache = cache_path and os.getenv("LLMAAS_EMBED_CACHE", "1") != "0"
+        self.cache = EmbeddingCache(cache_path) if use_cache else None
+
+        # Session HTTP persistante : les connexions TCP/TLS sont réutilisées d'un appel à l'autre
+        # (keep-alive) au lieu d'être rouvertes pour chaque requête d'embedding.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 502, 503, 504],
+            allowed_methods=frozenset({"POST"}),  # L'embedding est idempotent : on peut le rejouer.
+            raise_on_status=False,  # Rend la dernière réponse : l'erreur HTTP est levée par raise_for_status.
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        """Ferme la session HTTP et ses connexions, ainsi que le cache disque."""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _parse_embeddings(result: dict) -> np.ndarray:
+        """
+        Extrait les vecteurs d'une réponse de l'API, dans l'ordre des textes envoyés,
+        sous forme d'une matrice float32 contiguë (une ligne par texte, de norme 1).
+        """
+        # L'ordre des résultats n'est pas garanti : on trie selon l'index d'entrée.
+        data = sorted(result["data"], key=lambda item: item["index"])
+        vectors = np.asarray([item["embedding"] for item in data], dtype=np.float32)
+        # Normalisation L2 faite une fois ici : la similarité cosinus devient un simple
+        # produit scalaire côté Qdrant (distance DOT).
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        return vectors
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Méthode interne pour obtenir les embeddings d'un lot de textes en une seule requête."""
+        # L'endpoint /embeddings (compatible OpenAI) accepte une liste de textes en entrée.
+        payload = {"model": self.model, "input": texts}
         try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
+            response = self.session.post(self.api_url, json=payload, timeout=30)
             response.raise_for_status()  # Lève une exception pour les erreurs HTTP.
-            result = response.json()
-            return result["data"][0]["embedding"]
+            return self._parse_embeddings(json_loads(response.content))
         except requests.exceptions.RequestException as e:
             print(f"Erreur lors de l'appel à l'API d'embedding: {e}")
             raise
@@ -84,38 +242,167 @@ class LLMaaSEmbeddings(Embeddings):
             print(f"Erreur dans le format de la réponse de l'API d'embedding: {e}")
             raise
 
+    async def _aembed(self, client: httpx.AsyncClient, texts: List[str]) -> np.ndarray:
+        """
+        Variante asynchrone de `_embed`. Si l'API refuse le lot (413 : trop volumineux,
+        429 : trop de requêtes), il est coupé en deux et chaque moitié est renvoyée.
+        """
+        payload = {"model": self.model, "input": texts}
+        try:
+            response = await client.post(self.api_url, json=payload)
+            response.raise_for_status()  # Lève une exception pour les erreurs HTTP.
+            return self._parse_embeddings(json_loads(response.content))
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status not in (413, 429) or len(texts) == 1:
+                print(f"Erreur lors de l'appel à l'API d'embedding: {e}")
+                raise
+            half = len(texts) // 2
+            print(f"Lot de {len(texts)} textes refusé (HTTP {status}), nouvel essai par lots de {half}...")
+            first, second = await asyncio.gather(self._aembed(client, texts[:half]), self._aembed(client, texts[half:]))
+            return np.concatenate([first, second])
+        except httpx.HTTPError as e:
+            print(f"Erreur lors de l'appel à l'API d'embedding: {e}")
+            raise
+        except (KeyError, IndexError) as e:
+            print(f"Erreur dans le format de la réponse de l'API d'embedding: {e}")
+            raise
+
+    @staticmethod
+    def _count_tokens(texts: List[str]) -> List[int]:
+        """Nombre de tokens de chaque texte (estimé en caractères si tiktoken n'est pas installé)."""
+        if tiktoken is not None:
+            encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+            return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+        return [len(text) // CHARS_PER_TOKEN + 1 for text in texts]
+
+    def _pack_batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Regroupe les textes consécutifs en lots d'au plus `max_tokens_per_batch` tokens et
+        `max_batch` textes : des lots pleins pour les textes courts, sans requête trop
+        volumineuse pour les textes longs. L'ordre des textes est conservé.
+        """
+        batches, batch, batch_tokens = [], [], 0
+        for text, count in zip(texts, self._count_tokens(texts)):
+            if batch and (batch_tokens + count > self.max_tokens_per_batch or len(batch) == self.max_batch):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += count
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _aembed_all(self, texts: List[str]) -> np.ndarray:
+        """
+        Vectorise tous les textes par lots (voir `_pack_batches`), avec au plus `max_concurrency`
+        requêtes en vol, multiplexées sur une connexion HTTP/2 partagée.
+        """
+        batches = self._pack_batches(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+
+        async with httpx.AsyncClient(http2=True, headers=self.headers, limits=limits, timeout=30) as client:
+            async def bounded(batch: List[str]) -> np.ndarray:
+                async with semaphore:
+                    return await self._aembed(client, batch)
+
+            # gather conserve l'ordre des lots, donc l'ordre des textes d'entrée.
+            results = await asyncio.gather(*(bounded(batch) for batch in batches))
+        return np.concatenate(results)
+
+    def _split_cached(self, texts: List[str]):
+        """
+        Sépare les textes déjà présents dans le cache des textes à vectoriser.
+
+        Retourne (clés des textes, vecteurs trouvés par clé, textes manquants sans doublon).
+        """
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        found = self.cache.get_many(keys) if self.cache is not None else {}
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.values())
+        return keys, found, missing
+
+    def _store(self, found: Dict[str, np.ndarray], texts: List[str], vectors: np.ndarray):
+        """Ajoute les nouveaux vecteurs au dictionnaire des résultats et au cache disque."""
+        computed = {EmbeddingCache.key(self.model, text): vector for text, vector in zip(texts, vectors)}
+        if self.cache is not None and computed:
+            self.cache.put_many(computed)
+        found.update(computed)
+
+    @staticmethod
+    def _stack(keys: List[str], found: Dict[str, np.ndarray]) -> np.ndarray:
+        """Assemble les vecteurs dans l'ordre des textes demandés (une ligne par texte)."""
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Génère les embeddings pour une liste de documents, par lots envoyés en parallèle.
+
+        Retourne une matrice float32 (une ligne par document), sans conversion en listes
+        Python : utilisée directement pour l'ingestion dans Qdrant.
+        """
+        print(f"Génération des embeddings pour {len(texts)} documents avec le modèle '{self.model}'...")
+        keys, found, missing = self._split_cached(texts)
+        if found:
+            print(f"  - {sum(key in found for key in keys)} embeddings trouvés dans le cache.")
+        if missing:
+            self._store(found, missing, asyncio.run(self._aembed_all(missing)))
+        return self._stack(keys, found)
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Génère les embeddings pour une liste de documents."""
+        """Génère les embeddings pour une liste de documents (format liste attendu par LangChain)."""
+        return self.embed_documents_array(texts).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Variante asynchrone de `embed_documents` (utilisée par les chaînes LangChain asynchrones)."""
         print(f"Génération des embeddings pour {len(texts)} documents avec le modèle '{self.model}'...")
-        # Note : Pour une meilleure performance en production, on pourrait envoyer les textes par lots (batch).
-        return [self._embed(text) for text in texts]
+        keys, found, missing = self._split_cached(texts)
+        if missing:
+            self._store(found, missing, await self._aembed_all(missing))
+        return self._stack(keys, found).tolist()
 
     def embed_query(self, text: str) -> List[float]:
         """Génère l'embedding pour une seule requête (question)."""
         print(f"Génération de l'embedding pour la requête avec le modèle '{self.model}'...")
-        return self._embed(text)
+        keys, found, missing = self._split_cached([text])
+        if missing:
+            self._store(found, missing, self._embed(missing))
+        return found[keys[0]].tolist()
 
 # ==============================================================================
 # FONCTIONS UTILITAIRES
 # ==============================================================================
 
-def wait_for_qdrant(qdrant_url, retries=15, delay=5):
+def wait_for_qdrant(qdrant_url, max_wait=15.0, initial_delay=0.1, max_delay=2.0):
     """
     Attend que le service Qdrant soit disponible.
     C'est essentiel dans un environnement Docker Compose où les conteneurs
     peuvent démarrer à des moments différents.
+
+    Interroge l'endpoint léger `/readyz` de Qdrant avec un délai croissant
+    (100 ms, 200 ms, 400 ms... plafonné à `max_delay`) : réponse quasi immédiate
+    si Qdrant est déjà prêt, attente bornée à `max_wait` secondes sinon.
     """
     print(f"En attente de Qdrant sur {qdrant_url}...")
-    client = qdrant_client.QdrantClient(url=qdrant_url)
-    for i in range(retries):
+    ready_url = f"{qdrant_url.rstrip('/')}/readyz"
+    deadline = time.monotonic() + max_wait
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
         try:
-            # Tente une opération simple pour vérifier si le service est prêt.
-            client.get_collections()
-            print("Qdrant est prêt.")
-            return qdrant_url
-        except Exception:
-            print(f"Tentative {i+1}/{retries}: Qdrant n'est pas encore accessible.")
-            time.sleep(delay)
+            if httpx.get(ready_url, timeout=1.0).status_code == 200:
+                print("Qdrant est prêt.")
+                return qdrant_url
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() + delay > deadline:
+            break
+        print(f"Tentative {attempt}: Qdrant n'est pas encore accessible, nouvel essai dans {delay:.1f}s.")
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
     print("Erreur: Impossible de se connecter à Qdrant après plusieurs tentatives.")
     return None
 
@@ -162,7 +449,22 @@ def main():
     loader = TextLoader("./source_document.txt")
     documents = loader.load()
     # Découpe le document en plus petits morceaux (chunks) pour une meilleure pertinence de recherche.
-    text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    # Le découpage récursif coupe d'abord entre paragraphes, puis lignes, phrases et mots, et
+    # remplit chaque chunk jusqu'à la fenêtre du modèle d'embedding : moins de chunks à vectoriser.
+    separators = ["\n\n", "\n", ". ", " ", ""]
+    if tiktoken is not None:
+        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=TIKTOKEN_ENCODING,
+            chunk_size=EMBED_CHUNK_TOKENS,
+            chunk_overlap=EMBED_CHUNK_OVERLAP_TOKENS,
+            separators=separators,
+        )
+    else:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=EMBED_CHUNK_TOKENS * CHARS_PER_TOKEN,
+            chunk_overlap=EMBED_CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN,
+            separators=separators,
+        )
     docs = text_splitter.split_documents(documents)
     print(f"Document segmenté en {len(docs)} chunks.")
 
@@ -181,16 +483,44 @@ def main():
     texts = [doc.page_content for doc in docs]
     metadatas = [doc.metadata for doc in docs]
 
-    # Cette fonction de LangChain gère automatiquement la vectorisation des textes
-    # via notre classe `embeddings` et les stocke dans la base de données vectorielle Qdrant.
-    vector_store = Qdrant.from_texts(
-        texts,
-        embeddings,
-        metadatas=metadatas,
-        url=qdrant_url,
+    # Vectorisation des chunks via notre classe `embeddings` (matrice float32, une ligne par chunk).
+    vectors = embeddings.embed_documents_array(texts)
+
+    # La collection est recréée à chaque exécution. Les vecteurs étant normalisés, la distance
+    # DOT (produit scalaire) donne le même classement que COSINE sans renormaliser à chaque requête.
+    # La collection utilise une quantification scalaire int8 :
+    # les vecteurs float32 complets restent sur disque, leur version int8 (4x plus petite)
+    # est gardée en RAM pour la recherche, puis les meilleurs candidats sont re-notés.
+    # L'indexation HNSW est désactivée pendant le chargement (indexing_threshold=0).
+    client = qdrant_client.QdrantClient(url=qdrant_url)
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(
         collection_name=collection_name,
-        force_recreate=True,  # Supprime et recrée la collection à chaque exécution.
+        vectors_config=models.VectorParams(size=vectors.shape[1], distance=models.Distance.DOT, on_disk=True),
+        quantization_config=models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True),
+        ),
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0),
     )
+
+    # Chargement en masse par lots, avec le format de payload attendu par le vector store LangChain.
+    client.upload_collection(
+        collection_name=collection_name,
+        vectors=vectors,
+        payload=[{Qdrant.CONTENT_KEY: text, Qdrant.METADATA_KEY: metadata} for text, metadata in zip(texts, metadatas)],
+        ids=range(len(texts)),  # Identifiants entiers séquentiels : la collection est recréée à chaque exécution.
+        batch_size=UPLOAD_BATCH_SIZE,
+        parallel=UPLOAD_PARALLEL,
+        wait=True,  # Les points doivent être interrogeables dès l'étape suivante.
+    )
+
+    # Réactive l'indexation : l'index HNSW est construit une seule fois, après le chargement.
+    client.update_collection(
+        collection_name=collection_name,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD),
+    )
+    vector_store = Qdrant(client=client, collection_name=collection_name, embeddings=embeddings, distance_strategy="DOT")
     print("Documents stockés avec succès.")
 
     # --- 4. Configurer le LLM et la Chaîne RAG ---
@@ -204,33 +534,47 @@ def main():
         temperature=0.2, # Température basse pour des réponses factuelles.
     )
 
-    # Template du prompt qui sera envoyé au LLM de génération.
-    # Il contient des placeholders pour le contexte (récupéré de Qdrant) et la question.
-    prompt_template = """Utilise les morceaux de contexte suivants pour répondre à la question à la fin.
-Si tu ne connais pas la réponse, dis simplement que tu ne sais pas, n'essaie pas d'inventer une réponse.
-
-{context}
+    # Prompt envoyé au LLM de génération : les instructions fixes vont dans un message
+    # système, le contexte (récupéré de Qdrant) et la question dans le message utilisateur.
+    # Le début du prompt reste ainsi identique d'une requête à l'autre, ce qui permet au
+    # serveur de réutiliser son cache de préfixe (KV-cache).
+    # Le gabarit étant fixe, il est rendu avec un simple str.format, sans passer par
+    # ChatPromptTemplate (analyse du gabarit et validation des entrées à chaque appel).
+    system_message = SystemMessage(content=RAG_SYSTEM_INSTRUCTIONS)
 
-Question: {question}
-Réponse en français:"""
-    PROMPT = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
+    def render_prompt(context, question):
+        return [system_message, HumanMessage(content=RAG_USER_TEMPLATE.format(context=context, question=question))]
 
     # Le "retriever" est l'objet qui sait comment interroger la base de données vectorielle.
-    retriever = vector_store.as_retriever()
+    retriever = vector_store.as_retriever(search_kwargs={
+        "k": RETRIEVER_TOP_K,
+        "search_params": models.SearchParams(hnsw_ef=SEARCH_HNSW_EF, exact=False),
+    })
+
+    # Cache des résultats de recherche, indexé par le SHA-256 de la question normalisée :
+    # une question déjà posée ne déclenche ni embedding ni recherche dans Qdrant.
+    retrieval_cache = {}
+
+    def retrieve(question):
+        key = hashlib.sha256(" ".join(question.lower().split()).encode("utf-8")).hexdigest()
+        if key not in retrieval_cache:
+            retrieval_cache[key] = retriever.invoke(question)
+        return retrieval_cache[key]
 
     def format_docs(docs):
-        """Fonction simple pour concaténer le contenu des documents récupérés."""
-        return "\n\n".join(doc.page_content for doc in docs)
+        """
+        Concatène le contenu des documents récupérés, sans espaces superflus ni doublons :
+        un chunk identique récupéré plusieurs fois n'est envoyé qu'une fois au LLM.
+        """
+        parts = dict.fromkeys(doc.page_content.strip() for doc in docs)  # dict : dédoublonne en gardant l'ordre
+        return "\n\n".join(part for part in parts if part)
 
-    # Construction de la chaîne RAG avec LangChain Expression Language (LCEL).
+    # Construction de la chaîne de génération avec LangChain Expression Language (LCEL).
     # C'est une manière moderne et déclarative de définir des pipelines de traitement.
-    # Le `|` (pipe) enchaîne les étapes.
-    rag_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | PROMPT
-        | llm
-        | StrOutputParser()
-    )
+    # Le `|` (pipe) enchaîne les étapes. La récupération des documents et la construction
+    # du prompt sont faites une seule fois avant l'appel (étape 5) : le prompt obtenu sert
+    # à la fois à la journalisation et à la génération.
+    rag_chain = llm | StrOutputParser()
 
     # --- 5. Exécuter la Chaîne RAG ---
     print("\n" + "="*50)
@@ -242,24 +586,26 @@ Réponse en français:"""
 
     # --- Journalisation manuelle pour la transparence du processus ---
     print("\n[Détails du processus de récupération...]")
-    relevant_docs = retriever.get_relevant_documents(query)
+    relevant_docs = retrieve(query)
     print(f"  - {len(relevant_docs)} documents pertinents récupérés de Qdrant.")
     context_text = format_docs(relevant_docs)
-    final_prompt_str = PROMPT.format(context=context_text, question=query)
+    final_prompt = render_prompt(context_text, query)
     print("  - Construction du prompt final pour le LLM de génération:")
     print("-" * 20)
-    print(final_prompt_str)
+    print(get_buffer_string(final_prompt))
     print("-" * 20)
     # --- Fin de la journalisation ---
 
     print(f"\nAppel de la chaîne RAG avec le contexte...")
-    final_result = rag_chain.invoke(query)
+    final_result = rag_chain.invoke(final_prompt)
 
     print("\n" + "="*50)
     print("--- RÉSULTAT FINAL ---")
     print("="*50)
     print(final_result)
 
+    embeddings.close()
+
 
 if __name__ == "__main__":
     main()
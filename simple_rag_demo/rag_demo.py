@@ -6,12 +6,18 @@ mettant en évidence les étapes clés du processus RAG de manière claire et vi
 """
 
 import os
+import atexit
+import asyncio
+import hashlib
+import sqlite3
 import httpx
 import numpy as np
 import argparse
 import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
 # Import des composants de la bibliothèque 'rich' pour une sortie console améliorée
 from rich.console import Console
@@ -21,6 +27,23 @@ from rich.spinner import Spinner
 from rich.markdown import Markdown
 from rich.table import Table
 from rich.markup import escape
+from rich.live import Live
+
+try:
+    import orjson  # Optionnel : décodage JSON plus rapide des réponses de l'API
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    from numba import njit, prange  # Optionnel : noyau compilé pour la similarité cosinus
+except ImportError:
+    njit = None
+
+try:
+    import faiss  # Optionnel : index HNSW pour les corpus volumineux
+except ImportError:
+    faiss = None
 
 # ==============================================================================
 # 1. CONFIGURATION INITIALE
@@ -46,11 +69,53 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
+# Client HTTP partagé par tous les appels synchrones : les connexions (TCP + TLS) restent ouvertes
+# d'un appel à l'autre, et HTTP/2 permet plusieurs requêtes simultanées sur une même connexion.
+http_client = httpx.Client(
+    http2=True,
+    headers=HEADERS,
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+)
+atexit.register(http_client.close)
+
 # Définition des modèles spécifiques qui seront utilisés pour chaque étape du RAG.
 # Il est crucial d'utiliser un modèle spécialisé pour l'embedding et un autre pour la génération.
 EMBEDDING_MODEL = "granite-embedding:278m"
 GENERATION_MODEL = "mistral-small3.2:24b"
 
+# Nombre maximal de textes envoyés dans une seule requête d'embedding.
+EMBEDDING_BATCH_SIZE = 64
+# Nombre maximal de requêtes d'embedding simultanées (respect des limites de débit du serveur).
+EMBEDDING_MAX_CONCURRENCY = 8
+
+# Troncature des embeddings (type Matryoshka) : ne garder que les N premières composantes de chaque vecteur,
+# renormalisé ensuite, pour une recherche plus légère. 0 (défaut) conserve toutes les composantes ; à n'activer
+# qu'après avoir vérifié que le modèle d'embedding s'y prête et que la pertinence ne se dégrade pas.
+EMBEDDING_TRUNCATE_DIM = int(os.getenv("LLMAAS_EMBED_TRUNCATE_DIM", "0"))
+
+# Noyau numba pour la similarité cosinus (LLMAAS_NUMBA_DOT=1, numba requis). Désactivé par défaut : le produit
+# matrice-vecteur de NumPy (`@`) s'appuie sur BLAS, plus rapide dès qu'une BLAS optimisée est installée.
+USE_NUMBA_DOT = os.getenv("LLMAAS_NUMBA_DOT", "0") == "1" and njit is not None
+
+# Fichier du cache disque des embeddings (désactivable avec LLMAAS_EMBED_CACHE=0)
+EMBED_CACHE_PATH = ".embed_cache.sqlite"
+
+# Cache sémantique des réponses (désactivable avec LLMAAS_ANSWER_CACHE=0) : une question dont la
+# similarité cosinus avec une question déjà traitée dépasse ce seuil, pour le même document de
+# contexte, reçoit la réponse enregistrée sans nouvel appel au modèle de génération.
+ANSWER_CACHE_THRESHOLD = 0.95
+
+# Recherche approchée (index HNSW de faiss, si installé) à partir de ce nombre de documents ; en dessous,
+# le parcours exact du corpus (un produit matrice-vecteur) est plus rapide. HNSW_TOP_K documents sont alors affichés.
+HNSW_MIN_DOCS = 1000
+HNSW_NEIGHBORS = 32
+HNSW_TOP_K = 10
+
+# Réponses de repli de `generate_answer` en cas d'erreur (jamais enregistrées dans le cache).
+ANSWER_HTTP_ERROR = "Désolé, je n'ai pas pu générer de réponse."
+ANSWER_UNEXPECTED_ERROR = "Désolé, une erreur est survenue."
+
 # ==============================================================================
 # 2. CORPUS DE DOCUMENTS
 # ==============================================================================
@@ -72,39 +137,197 @@ CORPUS = [
     "Article 89: L'initiative de la révision de la Constitution appartient concurremment au Président de la République sur proposition du Premier ministre et aux membres du Parlement. Le projet ou la proposition de révision doit être examiné dans les conditions de délai fixées au troisième alinéa de l'article 42 et voté par les deux assemblées en termes identiques. La révision est définitive après avoir été approuvée par référendum."
 ]
 
+# Mode CAG (--cag) : le corpus complet, assemblé une fois, précède la question dans le prompt.
+CAG_CORPUS_TEXT = "\n".join(CORPUS)
+CAG_PROMPT_TEMPLATE = "Voici des articles de la Constitution française :\n{corpus}\n\nRéponds en français à la question : \"{question}\", en t'aidant de ces articles."
+
 # ==============================================================================
-# 3. FONCTIONS D'INTERACTION AVEC L'API LLMAAS
+# 3. CACHES DISQUE (EMBEDDINGS ET RÉPONSES)
 # ==============================================================================
 
-def get_embedding(text: str, debug: bool = False) -> np.ndarray:
+class EmbeddingCache:
     """
-    Appelle l'endpoint /embeddings de l'API LLMaaS pour convertir un texte en vecteur numérique (embedding).
-    
-    Args:
-        text (str): Le texte à vectoriser.
-        debug (bool): Si True, affiche les payloads de la requête et de la réponse.
+    Cache disque (SQLite) des vecteurs déjà calculés.
 
-    Returns:
-        np.ndarray: Le vecteur numpy représentant le texte. Retourne un tableau vide en cas d'erreur.
+    La clé est le SHA-256 de "modèle|texte" : relancer la démo ne revectorise pas le corpus.
+    Les vecteurs sont stockés en float32 binaire (4 octets par composante).
+    """
+
+    def __init__(self, path: str):
+        # Le corpus peut être vectorisé dans un thread d'arrière-plan : la connexion n'est pas
+        # liée au thread qui l'a ouverte (les accès restent successifs, jamais simultanés).
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}|{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Retourne les vecteurs connus, indexés par clé (les clés absentes sont ignorées)."""
+        found = {}
+        # Requêtes par paquets pour rester sous la limite de paramètres SQLite.
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                ((key, vector.tobytes()) for key, vector in items.items()),
+            )
+
+embedding_cache = EmbeddingCache(EMBED_CACHE_PATH) if os.getenv("LLMAAS_EMBED_CACHE", "1") != "0" else None
+
+class AnswerCache:
+    """
+    Cache sémantique (SQLite) des réponses finales.
+
+    Chaque entrée associe le vecteur d'une question, le document de contexte utilisé et la réponse
+    du modèle. Une nouvelle question réutilise la réponse si elle est assez proche (similarité
+    cosinus >= `threshold`) d'une question déjà posée avec le même contexte.
+
+    Seuls les vecteurs du même modèle d'embedding et de même dimension sont comparés : changer
+    `EMBEDDING_MODEL` ou `LLMAAS_EMBED_TRUNCATE_DIM` entre deux exécutions ignore les anciennes
+    entrées au lieu de comparer des vecteurs incompatibles.
     """
-    payload = {"input": [text], "model": EMBEDDING_MODEL}
+
+    COLUMNS = ["model", "embedding_model", "dim", "context", "query_vector", "answer"]
+
+    def __init__(self, path: str, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.threshold = threshold
+        self.conn = sqlite3.connect(path)
+        existing = [row[1] for row in self.conn.execute("PRAGMA table_info(answers)")]
+        if existing and existing != self.COLUMNS:
+            # Table d'une version précédente (sans modèle d'embedding ni dimension) : ce n'est
+            # qu'un cache, on la recrée.
+            with self.conn:
+                self.conn.execute("DROP TABLE answers")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers "
+            "(model TEXT, embedding_model TEXT, dim INTEGER, context TEXT, query_vector BLOB, answer TEXT)"
+        )  # query_vector : vecteur normalisé de la question, en float32, de `dim` composantes
+
+    def lookup(self, query_embedding: np.ndarray, context: str) -> Optional[str]:
+        """Retourne la réponse d'une question similaire posée avec le même contexte, ou None."""
+        rows = self.conn.execute(
+            "SELECT query_vector, answer FROM answers "
+            "WHERE model = ? AND embedding_model = ? AND dim = ? AND context = ?",
+            (GENERATION_MODEL, EMBEDDING_MODEL, int(query_embedding.shape[-1]), context),
+        ).fetchall()
+        if not rows:
+            return None
+        vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+        similarities = cosine_similarity(vectors, normalize_rows(query_embedding)[0])
+        best = int(np.argmax(similarities))
+        return rows[best][1] if similarities[best] >= self.threshold else None
+
+    def store(self, query_embedding: np.ndarray, context: str, answer: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO answers (model, embedding_model, dim, context, query_vector, answer) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    GENERATION_MODEL, EMBEDDING_MODEL, int(query_embedding.shape[-1]), context,
+                    normalize_rows(query_embedding)[0].tobytes(), answer,
+                ),
+            )
+
+answer_cache = AnswerCache(EMBED_CACHE_PATH) if os.getenv("LLMAAS_ANSWER_CACHE", "1") != "0" else None
+
+# ==============================================================================
+# 4. FONCTIONS D'INTERACTION AVEC L'API LLMAAS
+# ==============================================================================
+
+async def _aembed_batch(client: httpx.AsyncClient, texts: List[str], debug: bool = False) -> np.ndarray:
+    """
+    Envoie un lot de textes à l'endpoint /embeddings de l'API LLMaaS (une seule requête HTTP).
+    L'endpoint (compatible OpenAI) accepte une liste de textes en entrée.
+    Retourne une matrice float32 (une ligne par texte), construite directement depuis la réponse JSON.
+    """
+    payload = {"input": texts, "model": EMBEDDING_MODEL}
     if debug:
         console.print(Panel(Syntax(json.dumps(payload, indent=2), "json", theme="solarized-dark", line_numbers=True), title="[blue]Payload de la Requête Embedding[/blue]", border_style="blue"))
 
+    response = await client.post(f"{BASE_URL}/embeddings", json=payload)
+    response.raise_for_status()
+
+    response_json = json_loads(response.content)
+    if debug:
+        # Copie superficielle : seul le premier vecteur est tronqué pour l'affichage, sans recopier toute la réponse.
+        display_json = response_json
+        if response_json.get('data'):
+            first, *others = response_json['data']
+            display_json = {**response_json, 'data': [{**first, 'embedding': first['embedding'][:5] + ['...']}, *others]}
+        console.print(Panel(Syntax(json.dumps(display_json, indent=2), "json", theme="solarized-dark", line_numbers=True), title="[blue]Réponse de l'API Embedding[/blue]", border_style="blue"))
+
+    # L'ordre des résultats n'est pas garanti : on trie selon l'index d'entrée.
+    data = sorted(response_json['data'], key=lambda item: item['index'])
+    # float32 dès la lecture de la réponse : la précision float64 n'apporte rien à la similarité,
+    # et la matrice est deux fois plus légère à parcourir (et à stocker dans le cache).
+    return np.asarray([item['embedding'] for item in data], dtype=np.float32)
+
+async def _aembed_all(texts: List[str], debug: bool = False) -> np.ndarray:
+    """
+    Vectorise les textes par lots de `EMBEDDING_BATCH_SIZE` ; les lots partent en parallèle
+    sur un client HTTP partagé (au plus `EMBEDDING_MAX_CONCURRENCY` requêtes simultanées).
+    Chaque lot est écrit directement à sa place dans une matrice allouée une seule fois.
+    """
+    starts = range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
+    out = None
+    async with httpx.AsyncClient(http2=True, headers=HEADERS, timeout=30.0, limits=httpx.Limits(max_connections=16)) as client:
+        async def bounded(start: int):
+            nonlocal out
+            async with semaphore:
+                vectors = await _aembed_batch(client, texts[start:start + EMBEDDING_BATCH_SIZE], debug=debug)
+            if out is None:
+                # La dimension n'est connue qu'à la première réponse.
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[start:start + len(vectors)] = vectors
+
+        await asyncio.gather(*(bounded(start) for start in starts))
+    return out
+
+async def aget_embeddings(texts: List[str], debug: bool = False) -> np.ndarray:
+    """
+    Convertit une liste de textes en vecteurs numériques (embeddings).
+    Les vecteurs déjà présents dans le cache disque sont relus ; seuls les textes manquants
+    sont envoyés à l'API, par lots parallèles.
+
+    Args:
+        texts (List[str]): Les textes à vectoriser.
+        debug (bool): Si True, affiche les payloads des requêtes et des réponses.
+
+    Returns:
+        np.ndarray: Une matrice numpy float32 (une ligne par texte). Retourne un tableau vide en cas d'erreur.
+    """
+    if not texts:
+        return np.array([])
+    keys = [EmbeddingCache.key(EMBEDDING_MODEL, text) for text in texts]
+    found = embedding_cache.get_many(keys) if embedding_cache is not None else {}
+    # Textes à vectoriser, sans doublon, dans l'ordre des lignes de la matrice des nouveaux vecteurs.
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
     try:
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(f"{BASE_URL}/embeddings", headers=HEADERS, json=payload)
-            response.raise_for_status()
-            
-            response_json = response.json()
-            if debug:
-                display_json = json.loads(json.dumps(response_json))
-                if 'data' in display_json and display_json['data']:
-                    display_json['data'][0]['embedding'] = display_json['data'][0]['embedding'][:5] + ['...']
-                console.print(Panel(Syntax(json.dumps(display_json, indent=2), "json", theme="solarized-dark", line_numbers=True), title="[blue]Réponse de l'API Embedding[/blue]", border_style="blue"))
-
-            embedding_data = response_json['data'][0]['embedding']
-            return np.array(embedding_data)
+        computed = await _aembed_all(list(missing.values()), debug=debug) if missing else None
+        if computed is not None and embedding_cache is not None:
+            embedding_cache.put_many(dict(zip(missing, computed)))
+        if not found and len(missing) == len(keys):
+            return computed  # Aucun vecteur en cache ni doublon : la matrice est déjà dans l'ordre des textes.
+
+        # Matrice résultat allouée une fois, remplie ligne à ligne (cache ou nouveaux vecteurs).
+        rows = {key: i for i, key in enumerate(missing)}
+        dim = computed.shape[1] if computed is not None else len(next(iter(found.values())))
+        result = np.empty((len(keys), dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            result[i] = found[key] if key in found else computed[rows[key]]
+        return result
     except httpx.HTTPStatusError as e:
         console.print(f"[bold red]Erreur HTTP (Embedding)[/bold red]: {e.response.status_code}\n{e.response.text}")
         return np.array([])
@@ -112,13 +335,39 @@ def get_embedding(text: str, debug: bool = False) -> np.ndarray:
         console.print(f"[bold red]Erreur inattendue (Embedding)[/bold red]: {e}")
         return np.array([])
 
-def generate_answer(prompt: str, debug: bool = False) -> str:
+def get_embeddings(texts: List[str], debug: bool = False) -> np.ndarray:
+    """
+    Variante synchrone de `aget_embeddings`. Les vecteurs sont tronqués à `EMBEDDING_TRUNCATE_DIM`
+    composantes si cette troncature est activée (le cache disque garde les vecteurs complets).
+    """
+    embeddings = asyncio.run(aget_embeddings(texts, debug=debug))
+    if EMBEDDING_TRUNCATE_DIM and embeddings.ndim == 2:
+        embeddings = embeddings[:, :EMBEDDING_TRUNCATE_DIM]
+    return embeddings
+
+def get_embedding(text: str, debug: bool = False) -> np.ndarray:
+    """
+    Convertit un seul texte en vecteur numérique (embedding).
+
+    Args:
+        text (str): Le texte à vectoriser.
+        debug (bool): Si True, affiche les payloads de la requête et de la réponse.
+
+    Returns:
+        np.ndarray: Le vecteur numpy représentant le texte. Retourne un tableau vide en cas d'erreur.
+    """
+    embeddings = get_embeddings([text], debug=debug)
+    return embeddings[0] if embeddings.size > 0 else embeddings
+
+def generate_answer(prompt: str, debug: bool = False, on_update: Optional[Callable[[str], None]] = None) -> str:
     """
     Appelle l'endpoint /chat/completions de l'API LLMaaS pour générer une réponse textuelle à partir d'un prompt.
+    La réponse est reçue en streaming (SSE) : les premiers tokens peuvent être affichés sans attendre la fin de la génération.
 
     Args:
         prompt (str): Le prompt complet (contexte + question) à envoyer au modèle de génération.
-        debug (bool): Si True, affiche les payloads de la requête et de la réponse.
+        debug (bool): Si True, affiche le payload de la requête et le dernier événement reçu.
+        on_update (Optional[Callable[[str], None]]): Appelée avec le texte reçu jusque-là, à chaque nouveau fragment.
 
     Returns:
         str: La réponse textuelle générée par le modèle.
@@ -128,100 +377,238 @@ def generate_answer(prompt: str, debug: bool = False) -> str:
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": 500,
         "temperature": 0.2,
+        "stream": True,
     }
     if debug:
-        display_payload = payload.copy()
-        display_payload["messages"][0]["content"] = display_payload["messages"][0]["content"][:200] + "..."
+        # Copie superficielle : le prompt est tronqué pour l'affichage sans modifier le payload envoyé.
+        message = payload["messages"][0]
+        display_payload = {**payload, "messages": [{**message, "content": message["content"][:200] + "..."}]}
         console.print(Panel(Syntax(json.dumps(display_payload, indent=2), "json", theme="solarized-dark", line_numbers=True), title="[blue]Payload de la Requête Génération[/blue]", border_style="blue"))
 
     try:
-        with httpx.Client(timeout=60.0) as client:
-            response = client.post(f"{BASE_URL}/chat/completions", headers=HEADERS, json=payload)
+        parts = []
+        last_event = None
+        with http_client.stream("POST", f"{BASE_URL}/chat/completions", json=payload) as response:
+            if response.is_error:
+                response.read()  # Charge le corps de la réponse pour le message d'erreur.
             response.raise_for_status()
-            
-            response_json = response.json()
-            if debug:
-                console.print(Panel(Syntax(json.dumps(response_json, indent=2), "json", theme="solarized-dark", line_numbers=True), title="[blue]Réponse de l'API Génération[/blue]", border_style="blue"))
 
-            return response_json["choices"][0]["message"]["content"]
+            for line in response.iter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):].strip()
+                if data == "[DONE]":
+                    break
+                last_event = json_loads(data)
+                choices = last_event.get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    parts.append(content)
+                    if on_update:
+                        on_update("".join(parts))
+
+        if debug and last_event is not None:
+            console.print(Panel(Syntax(json.dumps(last_event, indent=2), "json", theme="solarized-dark", line_numbers=True), title="[blue]Dernier événement de l'API Génération (streaming)[/blue]", border_style="blue"))
+
+        return "".join(parts)
     except httpx.HTTPStatusError as e:
         console.print(f"[bold red]Erreur HTTP (Génération)[/bold red]: {e.response.status_code}\n{e.response.text}")
-        return "Désolé, je n'ai pas pu générer de réponse."
+        return ANSWER_HTTP_ERROR
     except Exception as e:
         console.print(f"[bold red]Erreur inattendue (Génération)[/bold red]: {e}")
-        return "Désolé, une erreur est survenue."
+        return ANSWER_UNEXPECTED_ERROR
 
 # ==============================================================================
-# 4. LOGIQUE FONDAMENTALE DU RAG
+# 5. LOGIQUE FONDAMENTALE DU RAG
 # ==============================================================================
 
-def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
+def normalize_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalise chaque ligne de `matrix` (norme L2 = 1). Retourne la matrice normalisée et les normes d'origine.
+    Le corpus n'est normalisé qu'une fois : chaque recherche se réduit ensuite à un produit matrice-vecteur.
+    """
+    norms = np.linalg.norm(matrix, axis=-1)
+    return matrix / np.where(norms == 0, 1, norms)[..., None], norms
+
+@dataclass
+class Int8Matrix:
+    """
+    Matrice quantifiée en int8 (quantification scalaire symétrique, une échelle par ligne) :
+    `values[i] / scales[i]` approche la ligne i d'origine, pour 4 fois moins de mémoire qu'en float32.
+    """
+    values: np.ndarray
+    scales: np.ndarray
+
+def quantize_rows(matrix: np.ndarray) -> Int8Matrix:
+    """Quantifie chaque ligne de `matrix` en int8, sur l'intervalle [-127, 127]."""
+    max_abs = np.abs(matrix).max(axis=-1, keepdims=True)
+    scales = 127.0 / np.where(max_abs == 0, 1, max_abs)
+    return Int8Matrix(values=np.round(matrix * scales).astype(np.int8), scales=scales[..., 0].astype(np.float32))
+
+if USE_NUMBA_DOT:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _dot_rows(matrix, vec):
+        """Produit scalaire de chaque ligne de `matrix` avec `vec`, compilé (SIMD) et réparti sur les cœurs."""
+        out = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in prange(matrix.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                acc += matrix[i, j] * vec[j]
+            out[i] = acc
+        return out
+else:
+    _dot_rows = None
+
+def cosine_similarity(unit_matrix, unit_vec: np.ndarray) -> np.ndarray:
+    """
+    Calcule la similarité cosinus entre chaque ligne de `unit_matrix` et `unit_vec` (tous deux déjà normalisés).
+    Score de -1 à 1. Plus haut = mieux. Un seul produit matrice-vecteur, sans recalcul des normes.
+
+    `unit_matrix` peut être une matrice quantifiée (`Int8Matrix`) : la question est alors quantifiée
+    à son tour, le produit est calculé en entiers puis remis à l'échelle.
+    """
+    if isinstance(unit_matrix, Int8Matrix):
+        query = quantize_rows(unit_vec)
+        dots = unit_matrix.values.astype(np.int32) @ query.values.astype(np.int32)
+        return dots / (unit_matrix.scales * query.scales)
+    if _dot_rows is not None:
+        # Noyau numba demandé explicitement (LLMAAS_NUMBA_DOT=1) : utile sans BLAS optimisée pour NumPy.
+        return _dot_rows(unit_matrix.astype(np.float32, copy=False), unit_vec.astype(np.float32, copy=False))
+    return unit_matrix @ unit_vec
+
+def euclidean_distance(similarities: np.ndarray, norms: np.ndarray, query_norm: float) -> np.ndarray:
     """
-    Calcule la similarité cosinus. Score de -1 à 1. Plus haut = mieux.
+    Calcule la distance euclidienne entre chaque vecteur du corpus et la question. Score >= 0. Plus bas = mieux.
+    Déduite des similarités cosinus et des normes : ||a - b||² = ||a||² + ||b||² - 2·||a||·||b||·cos(a, b).
     """
-    return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    squared = norms ** 2 + query_norm ** 2 - 2 * norms * query_norm * similarities
+    return np.sqrt(np.maximum(squared, 0))
 
-def euclidean_distance(vec1: np.ndarray, vec2: np.ndarray) -> float:
+def build_hnsw_index(corpus_unit):
     """
-    Calcule la distance euclidienne. Score >= 0. Plus bas = mieux.
+    Construit un index HNSW (faiss, produit scalaire sur vecteurs normalisés) pour les corpus d'au moins
+    `HNSW_MIN_DOCS` documents : la recherche devient approchée mais logarithmique en la taille du corpus.
+    Retourne None si faiss n'est pas installé, si le corpus est petit ou s'il est quantifié en int8.
     """
-    return float(np.linalg.norm(vec1 - vec2))
+    if faiss is None or isinstance(corpus_unit, Int8Matrix) or len(corpus_unit) < HNSW_MIN_DOCS:
+        return None
+    index = faiss.IndexHNSWFlat(corpus_unit.shape[1], HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+    index.add(np.ascontiguousarray(corpus_unit, dtype=np.float32))
+    return index
 
-def find_most_relevant_document(query_embedding: np.ndarray, corpus_embeddings: Dict[str, np.ndarray]) -> Dict[str, Any]:
+def find_most_relevant_document(query_embedding: np.ndarray, corpus_unit, corpus_norms: np.ndarray, docs: List[str], index=None) -> Dict[str, Any]:
     """
-    Compare le vecteur de la question à tous les vecteurs du corpus.
+    Compare le vecteur de la question à tous les vecteurs du corpus (une ligne de `corpus_unit`, normalisée,
+    par document de `docs`, éventuellement quantifiée en `Int8Matrix` ; `corpus_norms` contient leurs normes d'origine).
     Le choix du document pertinent se base sur la similarité cosinus (standard de l'industrie).
+
+    Les résultats sont des tableaux parallèles (indexés comme `docs`) plutôt qu'une liste de
+    dictionnaires : `order` donne les indices triés par similarité décroissante, `winner` l'indice retenu.
+    Avec un index HNSW (voir `build_hnsw_index`), seuls les `HNSW_TOP_K` plus proches documents sont
+    évalués et listés dans `order` (les autres scores valent NaN).
     """
-    if not corpus_embeddings:
-        return {"winner": "Aucun document.", "details": []}
-
-    winner = ""
-    best_similarity = -1
-    details = []
-
-    for doc, doc_embedding in corpus_embeddings.items():
-        similarity = cosine_similarity(query_embedding, doc_embedding)
-        distance = euclidean_distance(query_embedding, doc_embedding)
-        details.append({"doc": doc, "similarity": similarity, "distance": distance})
-        
-        if similarity > best_similarity:
-            best_similarity = similarity
-            winner = doc
-    
-    details.sort(key=lambda x: x['similarity'], reverse=True)
-            
-    return {"winner": winner, "details": details}
+    if not docs:
+        return {"winner": None, "order": np.empty(0, dtype=np.intp), "similarities": np.empty(0), "distances": np.empty(0)}
+
+    query_unit, query_norm = normalize_rows(query_embedding)
+    if index is not None:
+        scores, ids = index.search(query_unit[None, :].astype(np.float32), HNSW_TOP_K)
+        found = ids[0] >= 0
+        order = ids[0][found]
+        similarities = np.full(len(docs), np.nan, dtype=np.float32)
+        similarities[order] = scores[0][found]
+        distances = euclidean_distance(similarities, corpus_norms, query_norm)
+        return {"winner": int(order[0]), "order": order, "similarities": similarities, "distances": distances}
+
+    similarities = cosine_similarity(corpus_unit, query_unit)
+    distances = euclidean_distance(similarities, corpus_norms, query_norm)
+
+    # Tri par similarité décroissante : le premier document est le plus pertinent.
+    order = np.argsort(-similarities)
+
+    return {"winner": int(order[0]), "order": order, "similarities": similarities, "distances": distances}
 
 # ==============================================================================
-# 5. ORCHESTRATION PRINCIPALE DU SCRIPT
+# 6. ORCHESTRATION PRINCIPALE DU SCRIPT
 # ==============================================================================
 
+def answer_panel(text: str) -> Panel:
+    """Panneau d'affichage de la réponse finale du modèle."""
+    return Panel(Markdown(text), title="[bold green]Réponse Finale du Modèle[/bold green]", border_style="green", title_align="left")
+
+def stream_answer(prompt: str, debug: bool = False) -> str:
+    """Génère la réponse et l'affiche au fil de la génération, dès le premier token reçu."""
+    with Live(Spinner("dots", text="[bold yellow]Génération de la réponse finale...[/bold yellow]"), console=console, refresh_per_second=8) as live:
+        answer = generate_answer(prompt, debug=debug, on_update=lambda text: live.update(answer_panel(text)))
+        live.update(answer_panel(answer))
+    return answer
+
+def main_cag(args):
+    """
+    Variante CAG (Cache-Augmented Generation) : le corpus, court, tient entièrement dans le contexte du
+    modèle. Il est envoyé en entier avec la question, sans embedding ni recherche par similarité.
+    """
+    console.print(Panel("[bold]Mode CAG (Cache-Augmented Generation)[/bold]\nLe corpus complet est placé dans le prompt : aucune vectorisation ni recherche.", title_align="left", border_style="magenta"))
+    user_query = console.input("[bold yellow]Votre question > [/bold yellow]")
+    console.print("")
+
+    # Le corpus est placé en tête du prompt et la question à la fin : le début du prompt est
+    # identique d'une question à l'autre, ce qui permet au serveur de réutiliser son cache de préfixe.
+    prompt = CAG_PROMPT_TEMPLATE.format(corpus=CAG_CORPUS_TEXT, question=user_query)
+    console.print("[bold green]   => Prompt final envoyé au modèle de génération :[/bold green]")
+    console.print(Syntax(prompt, "markdown", theme="solarized-dark", line_numbers=True))
+    stream_answer(prompt, debug=args.payload)
+
 def main(args):
     """
     Fonction principale qui orchestre toutes les étapes du processus RAG.
     """
     console.print(Panel("[bold cyan]Démonstrateur RAG (Retrieval-Augmented Generation)[/bold cyan]\nUtilisation de la Constitution Française comme base de connaissances", title="Bienvenue", border_style="green"))
+    if args.cag:
+        main_cag(args)
+        return
 
     # --- ÉTAPE 1: Vectorisation du Corpus ---
     console.print(Panel("[bold]ÉTAPE 1: Vectorisation du Corpus[/bold]\nChaque article est converti en vecteur numérique (embedding).", title_align="left", border_style="magenta"))
-    corpus_embeddings = {}
-    with console.status("[bold yellow]Vectorisation en cours...[/bold yellow]") as status:
-        for doc in CORPUS:
-            status.update(f"Vectorisation: \"{doc[:40]}...\"")
-            embedding = get_embedding(doc, debug=args.payload)
-            if embedding.size > 0:
-                corpus_embeddings[doc] = embedding
-    console.print(f"[green]   => {len(corpus_embeddings)} documents vectorisés avec succès.[/green]\n")
-
-    if not corpus_embeddings:
-        console.print("[bold red]Erreur: Impossible de vectoriser le corpus.[/bold red]")
-        return
+    corpus_future = None
+    if args.payload:
+        # En mode --payload, les affichages détaillés ne doivent pas se mêler à la saisie de la question.
+        with console.status(f"[bold yellow]Vectorisation de {len(CORPUS)} articles par lots de {EMBEDDING_BATCH_SIZE}...[/bold yellow]"):
+            corpus_matrix = get_embeddings(CORPUS, debug=True)
+    else:
+        # La vectorisation du corpus se fait en arrière-plan pendant que l'utilisateur saisit sa question.
+        executor = ThreadPoolExecutor(max_workers=1)
+        corpus_future = executor.submit(get_embeddings, CORPUS)
+        executor.shutdown(wait=False)
+        console.print(f"[yellow]   => Vectorisation de {len(CORPUS)} articles lancée en arrière-plan...[/yellow]\n")
 
     # --- ÉTAPE 2: Question de l'Utilisateur ---
     console.print(Panel("[bold]ÉTAPE 2: Question de l'Utilisateur[/bold]\nPosez une question sur la Constitution.", title_align="left", border_style="magenta"))
     user_query = console.input("[bold yellow]Votre question > [/bold yellow]")
     console.print("")
 
+    if corpus_future is not None:
+        with console.status("[bold yellow]Fin de la vectorisation du corpus...[/bold yellow]"):
+            corpus_matrix = corpus_future.result()
+
+    if corpus_matrix.size == 0:
+        console.print("[bold red]Erreur: Impossible de vectoriser le corpus.[/bold red]")
+        return
+    console.print(f"[green]   => {len(corpus_matrix)} documents vectorisés avec succès.[/green]\n")
+
+    # Le corpus est gardé sous forme de tableaux parallèles : les textes d'un côté, et de l'autre une
+    # matrice (N, D) float32 normalisée une seule fois (avec les normes d'origine, pour les distances).
+    corpus_docs = list(CORPUS)
+    corpus_unit, corpus_norms = normalize_rows(corpus_matrix)
+    if args.int8:
+        # Quantification int8 : 4 fois moins de mémoire à parcourir à chaque recherche, au prix d'une légère
+        # approximation des scores de similarité.
+        corpus_unit = quantize_rows(corpus_unit)
+        console.print(f"[green]   => Corpus quantifié en int8 ({corpus_unit.values.nbytes} octets au lieu de {corpus_matrix.size * 4}).[/green]\n")
+    search_index = build_hnsw_index(corpus_unit)
+    if search_index is not None:
+        console.print(f"[green]   => Index HNSW construit : recherche approchée des {HNSW_TOP_K} documents les plus proches.[/green]\n")
+
     # --- ÉTAPE 3: Vectorisation de la Question ---
     console.print(Panel("[bold]ÉTAPE 3: Vectorisation de la Question[/bold]\nLa question est convertie en vecteur pour la comparer au corpus.", title_align="left", border_style="magenta"))
     with console.status("[bold yellow]Vectorisation de la question...[/bold yellow]"):
@@ -235,9 +622,11 @@ def main(args):
     # --- ÉTAPE 4: Recherche du Document Pertinent (Retrieval) ---
     console.print(Panel("[bold]ÉTAPE 4: Recherche par Similarité (Retrieval)[/bold]\nLe vecteur de la question est comparé à tous les vecteurs du corpus.", title_align="left", border_style="magenta"))
     
-    search_results = find_most_relevant_document(query_embedding, corpus_embeddings)
-    relevant_document = search_results["winner"]
-    details = search_results["details"]
+    search_results = find_most_relevant_document(query_embedding, corpus_unit, corpus_norms, corpus_docs, index=search_index)
+    winner = search_results["winner"]
+    relevant_document = corpus_docs[winner]
+    similarities = search_results["similarities"]
+    distances = search_results["distances"]
 
     table = Table(title="[bold]Calcul de Proximité[/bold]", show_header=True, header_style="bold cyan")
     table.add_column("Article (extrait)", style="dim", width=60)
@@ -245,12 +634,12 @@ def main(args):
     table.add_column("Distance Euclidienne ↓", justify="right", style="red")
     table.add_column("Choix (par Cosinus)", justify="center")
 
-    for item in details:
-        is_winner = (item["doc"] == relevant_document)
+    for i in search_results["order"]:
+        is_winner = (i == winner)
         winner_emoji = "✅" if is_winner else ""
-        similarity_cell = f"[bold]{item['similarity']:.4f}[/bold]" if is_winner else f"{item['similarity']:.4f}"
-        distance_cell = f"{item['distance']:.4f}"
-        doc_text = escape(item["doc"][:70] + "...")
+        similarity_cell = f"[bold]{similarities[i]:.4f}[/bold]" if is_winner else f"{similarities[i]:.4f}"
+        distance_cell = f"{distances[i]:.4f}"
+        doc_text = escape(corpus_docs[i][:70] + "...")
         table.add_row(doc_text, similarity_cell, distance_cell, winner_emoji)
     
     console.print(table)
@@ -265,11 +654,15 @@ def main(args):
     console.print("[bold green]   => Prompt final envoyé au modèle de génération :[/bold green]")
     console.print(Syntax(prompt, "markdown", theme="solarized-dark", line_numbers=True))
 
-    with console.status("[bold yellow]Génération de la réponse finale...[/bold yellow]"):
-        answer = generate_answer(prompt, debug=args.payload)
-
     # --- ÉTAPE 6: Affichage de la Réponse Finale ---
-    console.print(Panel(Markdown(answer), title="[bold green]Réponse Finale du Modèle[/bold green]", border_style="green", title_align="left"))
+    answer = answer_cache.lookup(query_embedding, relevant_document) if answer_cache is not None else None
+    if answer is not None:
+        console.print("[green]   => Question similaire déjà traitée avec ce contexte : réponse lue dans le cache sémantique.[/green]\n")
+        console.print(answer_panel(answer))
+    else:
+        answer = stream_answer(prompt, debug=args.payload)
+        if answer_cache is not None and answer not in (ANSWER_HTTP_ERROR, ANSWER_UNEXPECTED_ERROR):
+            answer_cache.store(query_embedding, relevant_document, answer)
 
 
 if __name__ == "__main__":
@@ -279,5 +672,15 @@ if __name__ == "__main__":
         action="store_true",
         help="Affiche les payloads détaillés des requêtes et réponses API."
     )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Quantifie les vecteurs du corpus en int8 pour la recherche par similarité."
+    )
+    parser.add_argument(
+        "--cag",
+        action="store_true",
+        help="Mode CAG : envoie tout le corpus dans le prompt, sans embedding ni recherche."
+    )
     args = parser.parse_args()
     main(args)
@@ -7,10 +7,42 @@ l'envoyer à un modèle compatible, et interpréter la réponse du modèle
 pour exécuter l'outil et renvoyer le résultat.
 """
 import os
+import re
+import sys
+import ast
+import time
+import asyncio
 import json
+import operator
+import functools
+import threading
 import httpx
 import argparse
+import io
 from dotenv import load_dotenv
+# sse_stream.py est partagé entre les démos : il se trouve dans le dossier common/ à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from sse_stream import SSEParser, response_chunks  # noqa: E402
+
+try:
+    import orjson  # Optionnel : (dé)sérialisation JSON plus rapide
+
+    json_loads = orjson.loads
+
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def json_dumps_indent(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def json_dumps_indent(obj) -> str:
+        return json.dumps(obj, indent=2)
 
 # --- Configuration ---
 # Charger les variables d'environnement depuis un fichier .env
@@ -19,29 +51,150 @@ load_dotenv()
 API_URL = os.getenv("API_URL", "https://api.ai.cloud-temple.com/v1")
 API_KEY = os.getenv("API_KEY")
 
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "qwen3:30b-a3b")
+DEFAULT_QUESTION = "Bonjour, peux-tu calculer 15 + (3 * 5) ?"
+
+# --- Affichage du streaming ---
+
+
+class StreamPrinter:
+    """
+    Affiche les fragments de texte reçus en streaming en regroupant les écritures : la sortie
+    n'est vidée (flush) qu'à chaque fin de ligne ou toutes les `interval` secondes (~60 Hz),
+    au lieu d'un appel système par token. Le texte est écrit dans `out` (la sortie standard par défaut).
+    """
+
+    def __init__(self, out=None, interval: float = 0.016):
+        self.out = out if out is not None else sys.stdout
+        self.interval = interval
+        self.last_flush = time.monotonic()
+
+    def write(self, text: str):
+        self.out.write(text)
+        now = time.monotonic()
+        if "\n" in text or now - self.last_flush >= self.interval:
+            self.out.flush()
+            self.last_flush = now
+
+    def close(self):
+        self.out.flush()
+
+
 # --- Définition de l'outil ---
 
 
+# Opérateurs autorisés dans les expressions de la calculatrice. Pas de puissance (`**`) : les arguments
+# viennent du modèle, et `9**9**9**9` suffirait à bloquer le processus sur un entier gigantesque.
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.USub: operator.neg,
+}
+
+# Caractères hors de l'alphabet d'une expression arithmétique : une seule recherche regex (en C)
+# rejette ces expressions avant toute analyse syntaxique.
+_FORBIDDEN_CHARS = re.compile(r"[^0-9+\-*/().\s]")
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_expression(expression: str) -> ast.Expression:
+    """Analyse l'expression une seule fois : un même appel d'outil répété réutilise l'arbre syntaxique."""
+    return ast.parse(expression, mode="eval")
+
+
+def _evaluate(node: ast.AST):
+    """Évalue un arbre syntaxique ne contenant que des nombres et les opérateurs de `_OPERATORS`."""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.operand))
+    raise ValueError(f"élément non autorisé : {ast.dump(node)}")
+
+
 def calculator(expression: str) -> str:
     """
     Évalue une expression mathématique simple.
     Exemple: "2 + 2 * 10"
     """
+    if _FORBIDDEN_CHARS.search(expression):
+        return "Erreur: L'expression contient des éléments non autorisés."
     try:
-        # Sécurité : ne pas utiliser eval() directement en production sans validation stricte.
-        # Pour cet exemple, nous limitons les caractères autorisés.
-        allowed_chars = "0123456789+-*/(). "
-        if not all(char in allowed_chars for char in expression):
-            return "Erreur: L'expression contient des caractères non autorisés."
-        # eval() est utilisé ici pour la simplicité de l'exemple.
-        result = eval(expression)
+        # Pas d'eval() : l'expression est analysée en arbre syntaxique, et seuls les nombres
+        # et les opérateurs arithmétiques (+, -, *, /) sont évalués.
+        result = _evaluate(_parse_expression(expression))
         return str(result)
+    except SyntaxError:
+        return "Erreur: L'expression n'est pas une expression mathématique valide."
+    except ValueError:
+        return "Erreur: L'expression contient des éléments non autorisés."
     except Exception as e:
         return f"Erreur de calcul: {str(e)}"
 
 
+def self_test():
+    """Vérifie la calculatrice sans appeler l'API (`python test_tool_calling.py --self-test`)."""
+    rejected = "Erreur: L'expression contient des éléments non autorisés."
+    assert calculator("15 + (3 * 5)") == "30"
+    assert calculator("-8 / 2") == "-4.0"
+    assert calculator("9**9**9**9") == rejected  # Puissance refusée avant tout calcul
+    assert calculator("10**100000") == rejected
+    assert calculator("7 // 2") == rejected
+    assert calculator("+3") == rejected
+    assert calculator("__import__('os')") == rejected
+    print("✅ Calculatrice : OK")
+
+
+class ToolRegistry:
+    """
+    Registre des outils exposés au modèle : définition au format de l'API et fonction Python.
+
+    La forme sérialisée des définitions est mise en cache au niveau de la classe, indexée par
+    l'ensemble des noms d'outils : des sessions de courte durée qui recréent chacune leur registre
+    avec les mêmes outils réutilisent les mêmes octets (un nom désigne toujours le même outil).
+    """
+
+    _wire_cache: dict = {}
+    _wire_lock = threading.Lock()
+
+    def __init__(self):
+        self._tools = {}
+
+    def register(self, definition: dict, function):
+        """Ajoute un outil : `definition` au format attendu par l'API, `function` l'implémente."""
+        self._tools[definition["function"]["name"]] = (definition, function)
+
+    @property
+    def definitions(self) -> list:
+        """Définitions des outils, au format attendu par l'API (clé "tools")."""
+        return [definition for definition, _ in self._tools.values()]
+
+    @property
+    def functions(self) -> dict:
+        """Mapping entre le nom de l'outil et la fonction Python à appeler."""
+        return {name: function for name, (_, function) in self._tools.items()}
+
+    def wire_tools(self) -> bytes:
+        """Définitions sérialisées en JSON, calculées une seule fois par ensemble d'outils."""
+        key = frozenset(self._tools)
+        wire = self._wire_cache.get(key)
+        if wire is None:
+            with self._wire_lock:
+                wire = self._wire_cache.get(key)
+                if wire is None:
+                    wire = self._wire_cache[key] = json_dumps(self.definitions)
+        return wire
+
+
+TOOL_REGISTRY = ToolRegistry()
+
 # Description de l'outil au format attendu par l'API
-TOOLS_AVAILABLE = [
+TOOL_REGISTRY.register(
     {
         "type": "function",
         "function": {
@@ -53,141 +206,168 @@ TOOLS_AVAILABLE = [
                 "required": ["expression"],
             },
         },
-    }
-]
+    },
+    calculator,
+)
 
+TOOLS_AVAILABLE = TOOL_REGISTRY.definitions
 # Mapping entre le nom de l'outil et la fonction Python à appeler
-TOOL_FUNCTIONS_MAP = {"calculator": calculator}
+TOOL_FUNCTIONS_MAP = TOOL_REGISTRY.functions
 
-# --- Logique principale ---
+# Les définitions d'outils ne changent pas : elles sont sérialisées une seule fois, puis insérées
+# telles quelles dans le corps de chaque requête.
+TOOLS_JSON = TOOL_REGISTRY.wire_tools()
 
 
-def run_chat_with_tool_calling(args):
+def build_request_body(payload: dict, tools_json: bytes = TOOLS_JSON) -> bytes:
     """
-    Fonction principale qui exécute le scénario de test.
+    Sérialise `payload` (sans la clé "tools") et y ajoute les définitions d'outils déjà sérialisées :
+    seules les parties variables de la requête (modèle, messages...) sont encodées à chaque appel.
     """
-    if not API_KEY:
-        print("❌ Erreur: La variable d'environnement API_KEY n'est pas définie.")
-        print("Veuillez créer un fichier .env ou l'exporter dans votre session.")
-        return
+    body = json_dumps(payload)
+    return body[:-1] + b',"tools":' + tools_json + b"}"
 
-    model_to_use = args.model if args.model else os.getenv("DEFAULT_MODEL", "qwen3:30b-a3b")
+# --- Logique principale ---
 
-    print(f"🤖 Modèle utilisé : {model_to_use}")
-    print(f"⚡ Mode streaming : {'Activé' if args.stream else 'Désactivé'}")
-    print(f"🐛 Mode debug    : {'Activé' if args.debug else 'Désactivé'}")
-    print("-" * 30)
+
+async def run_chat_with_tool_calling(args, client: httpx.AsyncClient, question: str = DEFAULT_QUESTION, out=None):
+    """
+    Exécute le scénario de test pour une question : appel initial, exécution de l'outil, appel final.
+    Les requêtes passent par `client`, partagé entre toutes les sessions lancées en parallèle.
+    Tout l'affichage de la session est écrit dans `out` (la sortie standard par défaut).
+    """
+    if out is None:
+        out = sys.stdout
+    model_to_use = args.model or DEFAULT_MODEL
 
     # 1. Premier appel à l'API avec la question de l'utilisateur
     # ---------------------------------------------------------
-    print("➡️ Étape 1: Envoi de la requête initiale au LLM...")
+    print("➡️ Étape 1: Envoi de la requête initiale au LLM...", file=out)
 
     # L'historique des messages commence avec la question de l'utilisateur
-    messages = [{"role": "user", "content": "Bonjour, peux-tu calculer 15 + (3 * 5) ?"}]
+    messages = [{"role": "user", "content": question}]
 
+    # Les outils ("tools": TOOLS_AVAILABLE) sont ajoutés par build_request_body, déjà sérialisés.
     payload = {
         "model": model_to_use,
         "messages": messages,
-        "tools": TOOLS_AVAILABLE,
         "tool_choice": "auto",  # Le modèle décide s'il doit utiliser un outil
         "stream": args.stream,
     }
+    body = build_request_body(payload)
+    headers = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
 
     if args.debug:
-        print("\n--- Payload envoyé (Étape 1) ---")
-        print(json.dumps(payload, indent=2))
-        print("----------------------------------")
+        print("\n--- Payload envoyé (Étape 1) ---", file=out)
+        print(json_dumps_indent({**payload, "tools": TOOLS_AVAILABLE}), file=out)
+        print("----------------------------------", file=out)
 
     try:
-        with httpx.Client() as client:
-            if args.stream:
-                with client.stream("POST", f"{API_URL}/chat/completions", headers={"Authorization": f"Bearer {API_KEY}"}, json=payload, timeout=60) as response:
-                    response.raise_for_status()
-
-                    # Logique de reconstruction du message de l'assistant
-                    assistant_message = {"role": "assistant", "content": None, "tool_calls": []}
-
-                    buffer = ""
-                    for chunk in response.iter_bytes():
-                        buffer += chunk.decode("utf-8")
-                        while "\n\n" in buffer:
-                            event_str, buffer = buffer.split("\n\n", 1)
-                            if not event_str.startswith("data:"):
-                                continue
-
-                            json_data = event_str[len("data: ") :].strip()
-                            if json_data == "[DONE]":
-                                break
-
-                            try:
-                                data = json.loads(json_data)
-                                delta = data["choices"][0].get("delta", {})
-
-                                if args.debug:
-                                    print(f"DEBUG (Stream Delta): {delta}")
-
-                                # Agréger le contenu textuel
-                                if delta.get("content"):
-                                    if assistant_message["content"] is None:
-                                        assistant_message["content"] = ""
-                                    assistant_message["content"] += delta["content"]
-                                    print(delta["content"], end="", flush=True)
-
-                                # Agréger les tool_calls
-                                if delta.get("tool_calls"):
-                                    for tc_delta in delta["tool_calls"]:
-                                        index = tc_delta["index"]
-                                        # S'assurer que la liste est assez grande
-                                        while len(assistant_message["tool_calls"]) <= index:
-                                            assistant_message["tool_calls"].append({"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
-
-                                        # Mettre à jour l'id, le nom et les arguments
-                                        if tc_delta.get("id"):
-                                            assistant_message["tool_calls"][index]["id"] = tc_delta["id"]
-                                        if tc_delta.get("function", {}).get("name"):
-                                            assistant_message["tool_calls"][index]["function"]["name"] = tc_delta["function"]["name"]
-                                        if "arguments" in tc_delta.get("function", {}):
-                                            new_args = tc_delta["function"]["arguments"]
-                                            # Gérer les arguments qui peuvent être un dict (Ollama) ou un str (VLLM)
-                                            if isinstance(new_args, dict):
-                                                # Si c'est un dictionnaire, on le convertit en chaîne JSON et on remplace
-                                                assistant_message["tool_calls"][index]["function"]["arguments"] = json.dumps(new_args)
-                                            else:
-                                                # Sinon, on concatène la chaîne
-                                                if not isinstance(assistant_message["tool_calls"][index]["function"]["arguments"], str):
-                                                    assistant_message["tool_calls"][index]["function"]["arguments"] = ""
-                                                assistant_message["tool_calls"][index]["function"]["arguments"] += new_args
-
-                            except (json.JSONDecodeError, KeyError) as e:
-                                if args.debug:
-                                    print(f"DEBUG (JSON Error/KeyError): {e} - Data: {json_data}")
-                                continue
-                        if json_data == "[DONE]":
-                            break
-                    print()  # Nouvelle ligne après le stream
-                    response_data = {"choices": [{"message": assistant_message}]}
-            else:
-                response = client.post(
-                    f"{API_URL}/chat/completions",
-                    headers={"Authorization": f"Bearer {API_KEY}"},
-                    json=payload,
-                    timeout=60,
-                )
+        if args.stream:
+            async with client.stream("POST", f"{API_URL}/chat/completions", headers=headers, content=body, timeout=60) as response:
+                if response.is_error:
+                    await response.aread()  # Charge le corps de la réponse pour le message d'erreur.
                 response.raise_for_status()
-                response_data = response.json()
+
+                # Logique de reconstruction du message de l'assistant : les fragments reçus sont
+                # rangés dans des listes parallèles (une entrée par tool_call) et ne sont joints
+                # qu'une seule fois, à la fin du stream, plutôt que concaténés à chaque delta.
+                content_chunks = []
+                ids, names, arg_chunks = [], [], []
+                parsed_args = []  # Arguments déjà reçus sous forme de dict (Ollama), sinon None
+                printer = StreamPrinter(out)
+
+                # Le découpage du flux en événements SSE est confié à SSEParser (sse_stream.py),
+                # qui renvoie directement les données JSON décodées de chaque événement complet.
+                parser = SSEParser()
+                async for chunk in response_chunks(response):
+                    for data in parser.feed(chunk):
+                        try:
+                            delta = data["choices"][0].get("delta", {})
+
+                            if args.debug:
+                                print(f"DEBUG (Stream Delta): {delta}", file=out)
+
+                            # Agréger le contenu textuel
+                            if delta.get("content"):
+                                content_chunks.append(delta["content"])
+                                printer.write(delta["content"])
+
+                            # Agréger les tool_calls
+                            if delta.get("tool_calls"):
+                                for tc_delta in delta["tool_calls"]:
+                                    index = tc_delta["index"]
+                                    # S'assurer que les listes sont assez grandes
+                                    while len(ids) <= index:
+                                        ids.append("")
+                                        names.append("")
+                                        arg_chunks.append([])
+                                        parsed_args.append(None)
+
+                                    # Mettre à jour l'id, le nom et les arguments
+                                    function_delta = tc_delta.get("function", {})
+                                    if tc_delta.get("id"):
+                                        ids[index] = tc_delta["id"]
+                                    if function_delta.get("name"):
+                                        names[index] = function_delta["name"]
+                                    if "arguments" in function_delta:
+                                        new_args = function_delta["arguments"]
+                                        # Gérer les arguments qui peuvent être un dict (Ollama) ou un str (VLLM)
+                                        if isinstance(new_args, dict):
+                                            # Si c'est un dictionnaire, on le conserve tel quel (et il remplace
+                                            # les fragments éventuels) : pas d'aller-retour par une chaîne JSON
+                                            parsed_args[index] = new_args
+                                        else:
+                                            # Sinon, on ajoute le fragment de chaîne
+                                            arg_chunks[index].append(new_args)
+
+                        except (KeyError, IndexError) as e:
+                            if args.debug:
+                                print(f"DEBUG (KeyError): {e} - Data: {data}", file=out)
+                            continue
+                    if parser.done:
+                        break
+                printer.close()
+                print(file=out)  # Nouvelle ligne après le stream
+
+                assistant_message = {
+                    "role": "assistant",
+                    "content": "".join(content_chunks) if content_chunks else None,
+                    "tool_calls": [
+                        {
+                            "id": ids[i],
+                            "type": "function",
+                            "function": {
+                                "name": names[i],
+                                "arguments": parsed_args[i] if parsed_args[i] is not None else "".join(arg_chunks[i]),
+                            },
+                        }
+                        for i in range(len(ids))
+                    ],
+                }
+                response_data = {"choices": [{"message": assistant_message}]}
+        else:
+            response = await client.post(
+                f"{API_URL}/chat/completions",
+                headers=headers,
+                content=body,
+                timeout=60,
+            )
+            response.raise_for_status()
+            response_data = json_loads(response.content)
 
     except httpx.HTTPStatusError as e:
-        print(f"❌ Erreur API (HTTP Status) lors de l'étape 1: {e}")
-        print(f"Réponse de l'API : {e.response.text}")
+        print(f"❌ Erreur API (HTTP Status) lors de l'étape 1: {e}", file=out)
+        print(f"Réponse de l'API : {e.response.text}", file=out)
         return
     except httpx.RequestError as e:
-        print(f"❌ Erreur API (Request) lors de l'étape 1: {e}")
+        print(f"❌ Erreur API (Request) lors de l'étape 1: {e}", file=out)
         return
 
     if args.debug:
-        print("\n--- Payload reçu (Étape 1) ---")
-        print(json.dumps(response_data, indent=2))
-        print("----------------------------------")
+        print("\n--- Payload reçu (Étape 1) ---", file=out)
+        print(json_dumps_indent(response_data), file=out)
+        print("----------------------------------", file=out)
 
     # Le message de l'assistant contient la demande d'appel d'outil
     assistant_message = response_data["choices"][0]["message"]
@@ -200,38 +380,40 @@ def run_chat_with_tool_calling(args):
 
     # 2. Vérification et exécution de l'appel d'outil
     # ------------------------------------------------
-    print("\n✅ Le LLM a demandé d'utiliser un outil.")
+    print("\n✅ Le LLM a demandé d'utiliser un outil.", file=out)
 
     if "tool_calls" not in assistant_message:
-        print("🤔 Le modèle n'a pas demandé d'utiliser un outil. Réponse directe :")
-        print(assistant_message.get("content", "Pas de contenu."))
+        print("🤔 Le modèle n'a pas demandé d'utiliser un outil. Réponse directe :", file=out)
+        print(assistant_message.get("content", "Pas de contenu."), file=out)
         return
 
     tool_call = assistant_message["tool_calls"][0]
     function_name = tool_call["function"]["name"]
-    function_args_str = tool_call["function"]["arguments"]
+    function_args_raw = tool_call["function"]["arguments"]
     tool_call_id = tool_call["id"]
 
-    print(f"   - Outil à appeler : {function_name}")
-    print(f"   - Arguments       : {function_args_str}")
+    print(f"   - Outil à appeler : {function_name}", file=out)
+    print(f"   - Arguments       : {function_args_raw}", file=out)
 
     if function_name in TOOL_FUNCTIONS_MAP:
         function_to_call = TOOL_FUNCTIONS_MAP[function_name]
         try:
-            # Les arguments sont une chaîne JSON, il faut les parser
-            function_args = json.loads(function_args_str)
+            # Les arguments sont une chaîne JSON (VLLM), à parser, ou déjà un dict (Ollama)
+            function_args = function_args_raw if isinstance(function_args_raw, dict) else json_loads(function_args_raw)
             tool_result = function_to_call(**function_args)
-            print(f"   - Résultat de l'outil : {tool_result}")
+            print(f"   - Résultat de l'outil : {tool_result}", file=out)
         except Exception as e:
-            print(f"❌ Erreur lors de l'exécution de l'outil: {e}")
+            print(f"❌ Erreur lors de l'exécution de l'outil: {e}", file=out)
             tool_result = f"Erreur: {e}"
     else:
-        print(f"❌ Outil inconnu : {function_name}")
+        print(f"❌ Outil inconnu : {function_name}", file=out)
         tool_result = f"Erreur: Outil '{function_name}' non trouvé."
 
     # 3. Second appel à l'API avec le résultat de l'outil
     # ----------------------------------------------------
-    print("\n➡️ Étape 2: Envoi du résultat de l'outil au LLM...")
+    # Cet appel passe par le même `client` que l'étape 1 : il réutilise la connexion HTTP/2 déjà
+    # ouverte (TCP + TLS + négociation ALPN `h2`) au lieu de refaire une poignée de main complète.
+    print("\n➡️ Étape 2: Envoi du résultat de l'outil au LLM...", file=out)
 
     # On ajoute le résultat de l'outil à l'historique des messages
     messages.append({"role": "tool", "tool_call_id": tool_call_id, "content": tool_result})
@@ -242,66 +424,120 @@ def run_chat_with_tool_calling(args):
         "messages": messages,
         "stream": args.stream,
     }
+    # Corps sérialisé une seule fois, en JSON compact (orjson s'il est installé) ; l'affichage
+    # indenté du mode debug est une sérialisation distincte, faite seulement si --debug est actif.
+    body_final = json_dumps(payload_final)
 
     if args.debug:
-        print("\n--- Payload envoyé (Étape 2) ---")
-        print(json.dumps(payload_final, indent=2))
-        print("----------------------------------")
+        print("\n--- Payload envoyé (Étape 2) ---", file=out)
+        print(json_dumps_indent(payload_final), file=out)
+        print("----------------------------------", file=out)
 
     try:
-        with httpx.Client() as client:
-            if args.stream:
-                with client.stream(
-                    "POST", f"{API_URL}/chat/completions", headers={"Authorization": f"Bearer {API_KEY}"}, json=payload_final, timeout=60
-                ) as response_final:
-                    response_final.raise_for_status()
-                    final_answer_stream = ""
-                    for chunk in response_final.iter_bytes():
+        if args.stream:
+            async with client.stream(
+                "POST", f"{API_URL}/chat/completions", headers=headers, content=body_final, timeout=60
+            ) as response_final:
+                if response_final.is_error:
+                    await response_final.aread()  # Charge le corps de la réponse pour le message d'erreur.
+                response_final.raise_for_status()
+                answer_chunks = []
+                printer = StreamPrinter(out)
+                # Même analyseur SSE qu'à l'étape 1 (sse_stream.py)
+                parser = SSEParser()
+                async for chunk in response_chunks(response_final):
+                    for data in parser.feed(chunk):
                         try:
-                            decoded_chunk = chunk.decode("utf-8")
-                            for line in decoded_chunk.splitlines():
-                                if line.startswith("data: "):
-                                    json_data = line[len("data: ") :]
-                                    if json_data.strip() == "[DONE]":
-                                        continue
-
-                                    data = json.loads(json_data)
-                                    delta = data["choices"][0]["delta"]
-
-                                    if args.debug:
-                                        print(f"DEBUG (Stream Delta Final): {delta}")
-
-                                    if "content" in delta and delta["content"]:
-                                        final_answer_stream += delta["content"]
-                                        print(delta["content"], end="", flush=True)
-                        except json.JSONDecodeError as e:
+                            delta = data["choices"][0]["delta"]
+                        except (KeyError, IndexError) as e:
                             if args.debug:
-                                print(f"DEBUG (JSON Decode Error Final): {e} - Chunk: {decoded_chunk}")
+                                print(f"DEBUG (KeyError Final): {e} - Data: {data}", file=out)
                             continue
-                    print()  # Nouvelle ligne après le stream
-                    final_answer = final_answer_stream
-            else:
-                response_final = client.post(
-                    f"{API_URL}/chat/completions",
-                    headers={"Authorization": f"Bearer {API_KEY}"},
-                    json=payload_final,
-                    timeout=60,
-                )
-                response_final.raise_for_status()
-                final_data = response_final.json()
-                final_answer = final_data["choices"][0]["message"]["content"]
+
+                        if args.debug:
+                            print(f"DEBUG (Stream Delta Final): {delta}", file=out)
+
+                        if delta.get("content"):
+                            answer_chunks.append(delta["content"])
+                            printer.write(delta["content"])
+                    if parser.done:
+                        break
+                printer.close()
+                print(file=out)  # Nouvelle ligne après le stream
+                final_answer = "".join(answer_chunks)
+        else:
+            response_final = await client.post(
+                f"{API_URL}/chat/completions",
+                headers=headers,
+                content=body_final,
+                timeout=60,
+            )
+            response_final.raise_for_status()
+            final_data = json_loads(response_final.content)
+            final_answer = final_data["choices"][0]["message"]["content"]
 
     except (httpx.HTTPStatusError, httpx.RequestError) as e:
-        print(f"❌ Erreur API lors de l'étape 2: {e}")
+        print(f"❌ Erreur API lors de l'étape 2: {e}", file=out)
         return
 
     if args.debug and not args.stream:  # Pour le stream, le debug est déjà affiché
-        print("\n--- Payload reçu (Étape 2) ---")
-        print(json.dumps(final_data, indent=2))
-        print("----------------------------------")
+        print("\n--- Payload reçu (Étape 2) ---", file=out)
+        print(json_dumps_indent(final_data), file=out)
+        print("----------------------------------", file=out)
 
-    print("\n✅ Réponse finale du LLM :")
-    print(f'💬 "{final_answer}"')
+    print("\n✅ Réponse finale du LLM :", file=out)
+    print(f'💬 "{final_answer}"', file=out)
+
+
+async def run_many(args, questions):
+    """
+    Lance une session de tool calling par question, en parallèle, sur un client HTTP/2 partagé :
+    les temps d'attente réseau des différentes sessions se recouvrent au lieu de s'additionner.
+
+    Avec plusieurs questions, l'affichage de chaque session est mis en mémoire tampon puis écrit
+    d'un seul bloc, précédé de sa question, dès que la session se termine : les sorties des
+    sessions parallèles (tokens en streaming compris) ne se mélangent pas. L'échec d'une session
+    est affiché à la suite de sa sortie, sans interrompre les autres.
+    """
+    async with httpx.AsyncClient(http2=True, limits=httpx.Limits(max_keepalive_connections=10)) as client:
+        if len(questions) == 1:
+            await run_chat_with_tool_calling(args, client, questions[0])
+            return
+
+        async def run_buffered(index: int, question: str):
+            out = io.StringIO()
+            error = None
+            try:
+                await run_chat_with_tool_calling(args, client, question, out=out)
+            except Exception as e:
+                error = e
+            print(f"\n===== Question {index}/{len(questions)} : {question} =====")
+            print(out.getvalue(), end="")
+            if error is not None:
+                print(f"❌ Erreur inattendue : {type(error).__name__}: {error}")
+            sys.stdout.flush()
+
+        await asyncio.gather(
+            *(run_buffered(index, question) for index, question in enumerate(questions, 1)),
+            return_exceptions=True,
+        )
+
+
+def main(args):
+    """
+    Point d'entrée : vérifie la configuration puis exécute le scénario pour chaque question.
+    """
+    if not API_KEY:
+        print("❌ Erreur: La variable d'environnement API_KEY n'est pas définie.")
+        print("Veuillez créer un fichier .env ou l'exporter dans votre session.")
+        return
+
+    print(f"🤖 Modèle utilisé : {args.model or DEFAULT_MODEL}")
+    print(f"⚡ Mode streaming : {'Activé' if args.stream else 'Désactivé'}")
+    print(f"🐛 Mode debug    : {'Activé' if args.debug else 'Désactivé'}")
+    print("-" * 30)
+
+    asyncio.run(run_many(args, args.question or [DEFAULT_QUESTION]))
 
 
 if __name__ == "__main__":
@@ -309,6 +545,15 @@ if __name__ == "__main__":
     parser.add_argument("--stream", action="store_true", help="Activer le mode streaming pour les réponses du LLM.")
     parser.add_argument("--model", type=str, help="Spécifier le modèle LLM à utiliser (ex: qwen3:30b-a3b).")
     parser.add_argument("--debug", action="store_true", help="Afficher les payloads complets envoyés et reçus.")
+    parser.add_argument(
+        "--question",
+        action="append",
+        help="Question à poser (option répétable : les questions sont traitées en parallèle).",
+    )
+    parser.add_argument("--self-test", action="store_true", help="Vérifier la calculatrice localement, sans appeler l'API.")
     args = parser.parse_args()
 
-    run_chat_with_tool_calling(args)
+    if args.self_test:
+        self_test()
+    else:
+        main(args)
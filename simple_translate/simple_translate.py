@@ -4,31 +4,122 @@ Exemple de traduction avec TranslateGemma via l'API LLMaaS.
 Ce script montre comment formater correctement le prompt pour obtenir des résultats optimaux.
 """
 import os
-import requests
+import re
+import sys
+import asyncio
+import functools
+from collections import OrderedDict
+import httpx
 import json
 from dotenv import load_dotenv
+# sse_stream.py est partagé entre les démos : il se trouve dans le dossier common/ à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from sse_stream import SSEParser, response_chunks  # noqa: E402
+
+try:
+    import orjson  # Optionnel : décodage JSON plus rapide des réponses de l'API
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import diskcache  # Optionnel : conserve les traductions d'une exécution à l'autre
+except ImportError:
+    diskcache = None
 
 # Chargement de la configuration
 load_dotenv()
 API_KEY = os.getenv("LLMAAS_API_KEY")
 API_URL = os.getenv("LLMAAS_API_URL", "https://api.ai.cloud-temple.com/v1")
 MODEL = os.getenv("LLMAAS_MODEL", "translategemma:27b")
+CACHE_DIR = os.getenv("LLMAAS_TRANSLATE_CACHE")  # Répertoire du cache disque (nécessite diskcache)
+
+# Cache des traductions, indexé par (modèle, langue source, langue cible, texte). La température
+# étant à 0, une même requête donne la même traduction : un texte déjà traduit ne refait pas
+# d'appel à l'API. Le cache mémoire garde les TRANSLATION_CACHE_SIZE dernières traductions.
+TRANSLATION_CACHE_SIZE = 512
+translation_cache = OrderedDict()
+disk_cache = diskcache.Cache(CACHE_DIR) if diskcache and CACHE_DIR else None
+
+def cache_get(key):
+    """Renvoie la traduction en cache pour `key`, ou None (mémoire puis disque)."""
+    if key in translation_cache:
+        translation_cache.move_to_end(key)
+        return translation_cache[key]
+    if disk_cache is not None:
+        translation = disk_cache.get(key)
+        if translation is not None:
+            cache_put(key, translation, persist=False)
+        return translation
+    return None
+
+def cache_put(key, translation, persist=True):
+    """Ajoute une traduction au cache, en évinçant la moins récemment utilisée si besoin."""
+    translation_cache[key] = translation
+    translation_cache.move_to_end(key)
+    if len(translation_cache) > TRANSLATION_CACHE_SIZE:
+        translation_cache.popitem(last=False)
+    if persist and disk_cache is not None:
+        disk_cache.set(key, translation)
+
+def make_client():
+    """
+    Crée le client HTTP partagé par toutes les traductions : la connexion (TCP + TLS) est réutilisée
+    d'un appel à l'autre, et HTTP/2 permet plusieurs requêtes simultanées sur cette connexion.
+    """
+    return httpx.AsyncClient(http2=True, timeout=60.0, limits=httpx.Limits(max_keepalive_connections=10))
+
+async def iter_sse_deltas(response):
+    """
+    Lit un flux SSE de l'API et produit le contenu textuel de chaque delta, au fil de l'eau.
+    Le découpage en événements est confié à SSEParser (sse_stream.py).
+    """
+    parser = SSEParser()
+    async for chunk in response_chunks(response):
+        for data in parser.feed(chunk):
+            try:
+                content = data["choices"][0]["delta"].get("content")
+            except (KeyError, IndexError):
+                continue
+            if content:
+                yield content
+        if parser.done:
+            return
 
-def translate_text(text, source_lang="English", source_code="en", target_lang="French", target_code="fr"):
+@functools.lru_cache(maxsize=64)
+def make_prompt_builder(source_lang, source_code, target_lang, target_code):
+    """
+    Renvoie une fonction qui construit le prompt TranslateGemma pour un couple de langues.
+    La partie fixe du prompt est formatée une seule fois par couple de langues ; chaque
+    traduction ne fait plus qu'une concaténation `préfixe + texte`.
+    """
+    # Construction du prompt selon le guide officiel TranslateGemma
+    # Notez les deux sauts de ligne avant le texte qui sont importants.
+    prefix = f"""You are a professional {source_lang} ({source_code}) to {target_lang} ({target_code}) translator. Your goal is to accurately convey the meaning and nuances of the original {source_lang} text while adhering to {target_lang} grammar, vocabulary, and cultural sensitivities.
+Produce only the {target_lang} translation, without any additional explanations or commentary. Please translate the following {source_lang} text into {target_lang}:
+
+
+"""
+    return prefix.__add__
+
+async def translate_text(client, text, source_lang="English", source_code="en", target_lang="French", target_code="fr", stream=False, cache=True):
     """
     Traduit un texte en utilisant le format de prompt spécifique à TranslateGemma.
+    Avec stream=True, la traduction est affichée au fur et à mesure de sa génération.
+    Avec cache=False, le cache des traductions n'est ni consulté ni alimenté.
     """
     if not API_KEY:
         print("Erreur: La variable d'environnement LLMAAS_API_KEY n'est pas définie.")
         return None
 
-    # Construction du prompt selon le guide officiel TranslateGemma
-    # Notez les deux sauts de ligne avant {text} qui sont importants.
-    prompt_template = f"""You are a professional {source_lang} ({source_code}) to {target_lang} ({target_code}) translator. Your goal is to accurately convey the meaning and nuances of the original {source_lang} text while adhering to {target_lang} grammar, vocabulary, and cultural sensitivities.
-Produce only the {target_lang} translation, without any additional explanations or commentary. Please translate the following {source_lang} text into {target_lang}:
-
+    cache_key = (MODEL, source_code, target_code, text)
+    translation = cache_get(cache_key) if cache else None
+    if translation is not None:
+        if stream:
+            print(translation)
+        return translation
 
-{text}"""
+    prompt_template = make_prompt_builder(source_lang, source_code, target_lang, target_code)(text)
 
     print(f"--- Traduction de '{source_lang}' vers '{target_lang}' avec le modèle '{MODEL}' ---")
     
@@ -41,7 +132,8 @@ Produce only the {target_lang} translation, without any additional explanations
             }
         ],
         "temperature": 0.0, # Température à 0 pour une traduction déterministe et fidèle
-        "max_tokens": 2048
+        "max_tokens": 2048,
+        "stream": stream
     }
 
     headers = {
@@ -50,31 +142,96 @@ Produce only the {target_lang} translation, without any additional explanations
     }
 
     try:
-        response = requests.post(f"{API_URL}/chat/completions", headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        
-        result = response.json()
-        translation = result['choices'][0]['message']['content'].strip()
-        
+        if stream:
+            async with client.stream("POST", f"{API_URL}/chat/completions", headers=headers, json=payload) as response:
+                if response.is_error:
+                    await response.aread()  # Charge le corps de la réponse pour le message d'erreur.
+                response.raise_for_status()
+
+                parts = []
+                async for content in iter_sse_deltas(response):
+                    parts.append(content)
+                    print(content, end="", flush=True)
+                print()
+            translation = "".join(parts).strip()
+        else:
+            response = await client.post(f"{API_URL}/chat/completions", headers=headers, json=payload)
+            response.raise_for_status()
+
+            result = json_loads(response.content)
+            translation = result['choices'][0]['message']['content'].strip()
+
+        if cache:
+            cache_put(cache_key, translation)
         return translation
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPStatusError as e:
+        print(f"Erreur lors de l'appel API: {e}")
+        print(f"Détails: {e.response.text}")
+        return None
+    except httpx.RequestError as e:
         print(f"Erreur lors de l'appel API: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Détails: {e.response.text}")
         return None
 
-if __name__ == "__main__":
+async def translate_many(texts, **langs):
+    """
+    Traduit plusieurs textes en parallèle sur un même client HTTP/2.
+    Retourne les traductions dans l'ordre des textes (None en cas d'erreur).
+    """
+    async with make_client() as client:
+        return await asyncio.gather(*(translate_text(client, text, **langs) for text in texts))
+
+# Numéro en début de ligne ("1) ...") dans la traduction d'un lot
+NUMBERED_LINE = re.compile(r"^\s*(\d+)\)\s*", re.MULTILINE)
+
+async def translate_batch(texts, **langs):
+    """
+    Traduit plusieurs textes courts en un seul appel à l'API : les textes sont envoyés comme
+    des lignes numérotées ("1) ...", "2) ..."), puis la traduction est redécoupée sur ces numéros.
+    Si le découpage échoue (texte multi-lignes, numérotation altérée), on se replie sur
+    translate_many. Retourne les traductions dans l'ordre des textes (None en cas d'erreur).
+    """
+    source_code, target_code = langs.get("source_code", "en"), langs.get("target_code", "fr")
+    translations = [cache_get((MODEL, source_code, target_code, text)) for text in texts]
+    missing = [i for i, translation in enumerate(translations) if translation is None]
+    if not missing:
+        return translations
+    if any("\n" in texts[i] for i in missing):
+        return await translate_many(texts, **langs)
+
+    numbered = "\n".join(f"{n}) {texts[i]}" for n, i in enumerate(missing, start=1))
+    async with make_client() as client:
+        # Le lot numéroté n'est jamais redemandé tel quel : seules les traductions par ligne sont mises en cache.
+        batch_translation = await translate_text(client, numbered, cache=False, **langs)
+    if batch_translation is None:
+        return await translate_many(texts, **langs)
+
+    parts = NUMBERED_LINE.split(batch_translation)
+    # parts = [préambule, "1", traduction 1, "2", traduction 2, ...]
+    numbers, lines = parts[1::2], [part.strip() for part in parts[2::2]]
+    if numbers != [str(n) for n in range(1, len(missing) + 1)]:
+        return await translate_many(texts, **langs)
+
+    for i, translation in zip(missing, lines):
+        translations[i] = translation
+        cache_put((MODEL, source_code, target_code, texts[i]), translation)
+    return translations
+
+async def main():
     # Texte d'exemple (Description de TranslateGemma en anglais)
     text_to_translate = "TranslateGemma is a new collection of open translation models built on Gemma 3, available in 4B, 12B, and 27B parameter sizes."
     
     print(f"Texte original:\n{text_to_translate}\n")
     
-    translation = translate_text(
-        text_to_translate, 
-        source_lang="English", source_code="en", 
-        target_lang="French", target_code="fr"
-    )
-    
-    if translation:
-        print(f"Traduction:\n{translation}")
+    # En mode streaming, la traduction s'affiche au fil de sa génération.
+    async with make_client() as client:
+        await translate_text(
+            client,
+            text_to_translate, 
+            source_lang="English", source_code="en", 
+            target_lang="French", target_code="fr",
+            stream=True
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
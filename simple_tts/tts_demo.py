@@ -19,9 +19,14 @@ Usage:
 import os
 import sys
 import time
+import atexit
+import asyncio
+import hashlib
+import re
 import argparse
 import subprocess
 import platform
+import shutil
 import tempfile
 from pathlib import Path
 
@@ -60,9 +65,38 @@ DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "tts-1")
 # Voix par défaut
 DEFAULT_VOICE = os.getenv("DEFAULT_VOICE", "alloy")
 
+# Cache disque des audios générés
+# Un même texte demandé avec le même modèle, la même voix et le même format est relu sur disque
+# au lieu de relancer la synthèse. La taille totale du cache est plafonnée (en Mo).
+DEFAULT_CACHE_DIR = os.getenv("LLMAAS_TTS_CACHE", str(Path.home() / ".cache" / "llmaas-tts"))
+CACHE_MAX_MB = float(os.getenv("LLMAAS_TTS_CACHE_MAX_MB", "500"))
+
+# Formats audio proposés par l'API
+AUDIO_FORMATS = ["mp3", "opus", "aac", "flac", "wav", "pcm"]
+
+# Les audios sont rangés dans ce sous-répertoire du répertoire de cache ; seuls les fichiers dont le
+# nom a la forme produite par cache_path_for (SHA-256 + extension audio) sont concernés par l'éviction.
+CACHE_SUBDIR = "tts-audio"
+CACHE_ENTRY_NAME = re.compile(r"^[0-9a-f]{64}\.(?:" + "|".join(AUDIO_FORMATS) + r")$")
+
+# Intervalle minimal entre deux rafraîchissements de la barre de progression (en secondes)
+PROGRESS_INTERVAL = 1 / 30
+
 # Initialisation de la console Rich pour les affichages
 console = Console()
 
+# Client HTTP partagé par toutes les requêtes du processus : les connexions (TCP + TLS) restent
+# ouvertes d'un appel à l'autre, et HTTP/2 permet plusieurs requêtes simultanées sur une connexion.
+# On utilise verify=False ici pour simplifier les tests en environnement de développement interne
+# (si les certificats sont auto-signés). En production réelle, retirez verify=False.
+http_client = httpx.Client(
+    http2=True,
+    verify=False,
+    timeout=httpx.Timeout(None, connect=10.0),
+    limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+)
+atexit.register(http_client.close)
+
 def parse_args():
     """
     Configure et analyse les arguments de la ligne de commande.
@@ -80,6 +114,9 @@ def parse_args():
     
     # Options de source
     parser.add_argument("-f", "--file", help="Fichier texte à lire (ignorer si 'text' est fourni)")
+    parser.add_argument("--input-file", help="Mode lot : fichier texte dont chaque ligne produit un fichier audio distinct")
+    parser.add_argument("--num-parallel-requests", type=int, default=4,
+                        help="Mode lot : nombre maximum de requêtes TTS simultanées (défaut: 4)")
     
     # Options TTS
     parser.add_argument("-v", "--voice", default=DEFAULT_VOICE, 
@@ -91,13 +128,17 @@ def parse_args():
     parser.add_argument("-o", "--output", help="Fichier de sortie (défaut: output.<format>)")
     
     parser.add_argument("--format", default="mp3", 
-                        choices=["mp3", "opus", "aac", "flac", "wav", "pcm"],
+                        choices=AUDIO_FORMATS,
                         help="Format audio de sortie (défaut: mp3)")
     
     # Options API
     parser.add_argument("--api-url", default=DEFAULT_API_URL, help="URL de l'API LLMaaS")
     parser.add_argument("--api-key", default=DEFAULT_API_KEY, help="Clé API (ou via env API_KEY)")
     
+    # Options de cache
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Répertoire du cache audio (défaut: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Ne pas lire ni écrire le cache audio")
+    
     # Options utilitaires
     parser.add_argument("-p", "--play", action="store_true", help="Jouer l'audio directement après génération")
     parser.add_argument("--timeout", type=float, default=300.0, help="Timeout de la requête en secondes (défaut: 300)")
@@ -159,9 +200,78 @@ def play_audio(file_path):
     except Exception as e:
         console.print(f"[red]Erreur lors de la lecture audio : {e}[/]")
 
-def generate_speech(client, api_url, api_key, text, voice, model, output_format, timeout=300.0, debug=False):
+def cache_path_for(cache_dir, text, voice, model, output_format):
+    """
+    Calcule l'emplacement dans le cache de l'audio correspondant à une requête TTS.
+    
+    Returns:
+        Path: Chemin du fichier (dans le sous-répertoire CACHE_SUBDIR), nommé d'après le SHA-256
+        de (modèle, voix, format, texte).
+    """
+    key = hashlib.sha256(f"{model}|{voice}|{output_format}|{text}".encode("utf-8")).hexdigest()
+    return Path(cache_dir).expanduser() / CACHE_SUBDIR / f"{key}.{output_format}"
+
+def cache_store(cache_path, audio_data, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+    """
+    Enregistre un audio dans le cache, puis évince les entrées les moins récemment lues
+    si la taille totale du cache dépasse `max_bytes`.
+    
+    L'écriture passe par un fichier temporaire renommé ensuite (os.replace) : un autre processus
+    ne peut jamais lire un fichier de cache à moitié écrit.
+    """
+    try:
+        with cache_open_temp(cache_path) as tmp:
+            tmp.write(audio_data)
+    except OSError as e:
+        console.print(f"[yellow]Cache audio non mis à jour : {e}[/]")
+        return
+    cache_commit(tmp.name, cache_path, max_bytes)
+
+def cache_read(cache_path):
+    """Renvoie l'audio en cache (et met à jour sa date de lecture pour l'éviction LRU), ou None."""
+    try:
+        os.utime(cache_path)
+        return cache_path.read_bytes()
+    except OSError:
+        return None
+
+def cache_open_temp(cache_path):
+    """Ouvre, à côté de `cache_path`, le fichier temporaire qui recevra l'audio avant cache_commit."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix=".tmp", delete=False)
+
+def cache_commit(tmp_path, cache_path, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+    """
+    Publie un fichier temporaire complet dans le cache (os.replace, atomique), puis évince
+    les entrées les moins récemment lues si la taille totale dépasse `max_bytes`.
     """
-    Effectue l'appel API vers l'endpoint TTS et télécharge le fichier audio.
+    try:
+        os.replace(tmp_path, cache_path)
+        
+        # Éviction LRU : les fichiers les moins récemment lus (st_atime) partent en premier.
+        # Seules les entrées créées par ce script sont prises en compte : un répertoire de cache
+        # mal choisi (ex: --cache-dir .) ne doit jamais faire supprimer d'autres fichiers.
+        entries = sorted(
+            (
+                entry for entry in cache_path.parent.iterdir()
+                if CACHE_ENTRY_NAME.match(entry.name) and entry.is_file() and not entry.is_symlink()
+            ),
+            key=lambda entry: entry.stat().st_atime
+        )
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            total -= entry.stat().st_size
+            entry.unlink()
+    except OSError as e:
+        # Le cache n'est qu'une optimisation : une erreur d'écriture ne fait pas échouer la génération
+        console.print(f"[yellow]Cache audio non mis à jour : {e}[/]")
+
+def generate_speech(client, api_url, api_key, text, voice, model, output_format, timeout=300.0, debug=False, cache_dir=None, sink=None):
+    """
+    Effectue l'appel API vers l'endpoint TTS et écrit le fichier audio dans `sink` au fil du
+    téléchargement : l'audio n'est jamais conservé en entier en mémoire.
     
     Args:
         client (httpx.Client): Le client HTTP pré-configuré.
@@ -173,11 +283,26 @@ def generate_speech(client, api_url, api_key, text, voice, model, output_format,
         output_format (str): Le format audio désiré (mp3, wav, etc.).
         timeout (float): Temps maximum d'attente pour la réponse.
         debug (bool): Si True, affiche des infos techniques.
+        cache_dir (str): Répertoire du cache audio, ou None pour ne pas utiliser de cache.
+        sink (BinaryIO): Fichier (ouvert en écriture binaire) qui reçoit l'audio, ou None pour
+            ne rien conserver hormis le cache.
         
     Returns:
-        tuple: (bytes du fichier audio, temps de génération en secondes) ou (None, 0) en cas d'erreur.
+        tuple: (nombre d'octets écrits, temps de génération en secondes) ou (None, 0) en cas d'erreur.
     """
     
+    # Consultation du cache : un audio déjà généré est recopié depuis le disque, sans appel à l'API
+    cache_path = None
+    if cache_dir:
+        cache_path = cache_path_for(cache_dir, text, voice, model, output_format)
+        if cache_path.exists():
+            console.print(f"[dim]Audio trouvé dans le cache : {cache_path}[/]")
+            os.utime(cache_path)  # Marque l'entrée comme récemment utilisée (atime), pour l'éviction
+            if sink is not None:
+                with open(cache_path, "rb") as cached:
+                    shutil.copyfileobj(cached, sink)
+            return cache_path.stat().st_size, 0.0
+    
     # Construction de l'URL complète
     # On gère le cas où l'utilisateur a déjà inclus /v1 dans l'URL de base
     base_url = api_url.rstrip('/')
@@ -240,8 +365,15 @@ def generate_speech(client, api_url, api_key, text, voice, model, output_format,
                 table.add_row("Content Type", response.headers.get("content-type", "unknown"))
                 console.print(table)
 
-            # Lecture du flux audio chunk par chunk
-            audio_data = bytearray()
+            # Lecture du flux audio chunk par chunk : chaque chunk est écrit directement dans
+            # `sink` (et dans le fichier temporaire du cache), sans tampon intermédiaire.
+            bytes_written = 0
+            cache_file = None
+            if cache_path:
+                try:
+                    cache_file = cache_open_temp(cache_path)
+                except OSError as e:
+                    console.print(f"[yellow]Cache audio non mis à jour : {e}[/]")
             
             # Configuration de la barre de progression Rich
             with Progress(
@@ -255,12 +387,37 @@ def generate_speech(client, api_url, api_key, text, voice, model, output_format,
                 task = progress.add_task("Téléchargement audio...", total=total_bytes if total_bytes > 0 else None)
                 
                 # Boucle de lecture du flux
-                for chunk in response.iter_bytes():
-                    audio_data.extend(chunk)
-                    progress.update(task, advance=len(chunk))
+                # La barre n'est rafraîchie qu'environ 30 fois par seconde (PROGRESS_INTERVAL) : sur
+                # un transfert rapide, un rendu Rich par chunk coûterait plus que l'écriture elle-même.
+                # Les chunks de 64 Ko limitent aussi le nombre de tours de boucle Python.
+                pending = 0
+                last_update = time.monotonic()
+                try:
+                    for chunk in response.iter_bytes(chunk_size=65536):
+                        if sink is not None:
+                            sink.write(chunk)
+                        if cache_file is not None:
+                            cache_file.write(chunk)
+                        bytes_written += len(chunk)
+                        pending += len(chunk)
+                        now = time.monotonic()
+                        if now - last_update > PROGRESS_INTERVAL:
+                            progress.update(task, advance=pending)
+                            pending = 0
+                            last_update = now
+                    progress.update(task, advance=pending)
+                except BaseException:
+                    # Téléchargement interrompu : le fichier temporaire du cache est abandonné
+                    if cache_file is not None:
+                        cache_file.close()
+                        os.unlink(cache_file.name)
+                    raise
             
             generation_time = time.time() - start_time
-            return bytes(audio_data), generation_time
+            if cache_file is not None:
+                cache_file.close()
+                cache_commit(cache_file.name, cache_path)
+            return bytes_written, generation_time
 
     except httpx.RequestError as e:
         console.print(f"[bold red]Erreur de connexion :[/] {e}")
@@ -269,6 +426,117 @@ def generate_speech(client, api_url, api_key, text, voice, model, output_format,
         console.print(f"[bold red]Erreur inattendue :[/] {e}")
         return None, 0
 
+def normalize_text(text):
+    """
+    Normalisation du texte (Astuce pour VibeVoice/TTS-1)
+    Les modèles TTS génératifs sont souvent plus stables avec une ponctuation de fin explicite.
+    Si le texte ne finit pas par une ponctuation forte, on ajoute un point.
+    """
+    if text and text[-1] not in ".!?":
+        return text + "."
+    return text
+
+async def generate_speech_async(client, api_url, api_key, text, voice, model, output_format, timeout=300.0, cache_dir=None):
+    """
+    Variante asynchrone de generate_speech, pour le mode lot : même requête, même cache,
+    mais sans barre de progression individuelle (les requêtes s'exécutent en parallèle).
+    
+    Les accès disque au cache s'exécutent dans un thread, pour ne pas bloquer les autres requêtes.
+    
+    Returns:
+        tuple: (bytes du fichier audio, temps de génération en secondes) ou (None, 0) en cas d'erreur.
+    """
+    loop = asyncio.get_running_loop()
+    cache_path = None
+    if cache_dir:
+        cache_path = cache_path_for(cache_dir, text, voice, model, output_format)
+        cached = await loop.run_in_executor(None, cache_read, cache_path)
+        if cached is not None:
+            return cached, 0.0
+
+    base_url = api_url.rstrip('/')
+    url = f"{base_url}/audio/speech" if base_url.endswith("/v1") else f"{base_url}/v1/audio/speech"
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    payload = {"model": model, "input": text, "voice": voice, "response_format": output_format}
+
+    start_time = time.time()
+    try:
+        async with client.stream("POST", url, headers=headers, json=payload, timeout=timeout) as response:
+            if response.status_code != 200:
+                error_content = (await response.aread()).decode('utf-8', errors='replace')
+                console.print(f"[bold red]Erreur API ({response.status_code}):[/] {error_content}")
+                return None, 0
+            audio_data = bytearray()
+            async for chunk in response.aiter_bytes():
+                audio_data.extend(chunk)
+    except httpx.RequestError as e:
+        console.print(f"[bold red]Erreur de connexion :[/] {e}")
+        return None, 0
+    except Exception as e:
+        console.print(f"[bold red]Erreur inattendue :[/] {e}")
+        return None, 0
+
+    if cache_path:
+        await loop.run_in_executor(None, cache_store, cache_path, audio_data)
+    return bytes(audio_data), time.time() - start_time
+
+async def run_batch(args, lines):
+    """
+    Mode lot : chaque ligne devient une requête TTS indépendante. Les requêtes partagent un
+    client HTTP/2 asynchrone et au plus `--num-parallel-requests` s'exécutent en même temps.
+    Les fichiers sont nommés output_0000.<format>, output_0001.<format>... (dans --output s'il
+    est fourni, sinon dans le répertoire courant).
+    
+    Returns:
+        int: Le nombre de lignes dont la synthèse a échoué.
+    """
+    output_dir = Path(args.output or ".")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = None if args.no_cache else args.cache_dir
+    semaphore = asyncio.Semaphore(max(1, args.num_parallel_requests))
+    loop = asyncio.get_running_loop()
+    failures = 0
+
+    async with httpx.AsyncClient(
+        http2=True,
+        verify=False,  # Voir la remarque sur verify=False à la création de http_client
+        timeout=httpx.Timeout(None, connect=10.0),
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+    ) as client:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[bold blue]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.completed}/{task.total}"),
+            console=console
+        ) as progress:
+            task = progress.add_task("Synthèse des lignes...", total=len(lines))
+
+            async def one(index, line):
+                # Toute erreur est comptée pour cette ligne seulement : elle n'interrompt pas le lot.
+                nonlocal failures
+                try:
+                    async with semaphore:
+                        audio_content, _ = await generate_speech_async(
+                            client, args.api_url, args.api_key, line, args.voice, args.model, args.format,
+                            timeout=args.timeout, cache_dir=cache_dir
+                        )
+                    if audio_content:
+                        path = output_dir / f"output_{index:04d}.{args.format}"
+                        # Écriture dans un thread, pour ne pas bloquer les autres requêtes en cours
+                        await loop.run_in_executor(None, path.write_bytes, audio_content)
+                    else:
+                        failures += 1
+                except Exception as e:
+                    console.print(f"[bold red]Ligne {index} :[/] {e}")
+                    failures += 1
+                finally:
+                    progress.update(task, advance=1)
+
+            await asyncio.gather(*(one(index, line) for index, line in enumerate(lines)), return_exceptions=True)
+
+    return failures
+
 def main():
     """Point d'entrée principal du script."""
     args = parse_args()
@@ -282,6 +550,27 @@ def main():
         console.print("Veuillez configurer le fichier [bold].env[/] (voir .env.example) ou utiliser l'option [bold]--api-key[/].")
         sys.exit(1)
 
+    # Mode lot : une requête par ligne de --input-file, exécutées en parallèle
+    if args.input_file:
+        try:
+            with open(args.input_file, 'r', encoding='utf-8') as f:
+                lines = [normalize_text(line.strip()) for line in f if line.strip()]
+        except Exception as e:
+            console.print(f"[bold red]Erreur de lecture du fichier :[/] {e}")
+            sys.exit(1)
+        
+        start_time = time.time()
+        failures = asyncio.run(run_batch(args, lines))
+        rprint(Panel(
+            f"[bold green]Lot terminé ![/]\n\n"
+            f"Lignes  : {len(lines)} ({failures} en échec)\n"
+            f"Sortie  : {args.output or '.'}\n"
+            f"Temps   : {time.time() - start_time:.2f} s",
+            title="Résultat",
+            border_style="green" if not failures else "yellow"
+        ))
+        sys.exit(1 if failures else 0)
+
     # 2. Récupération du texte à synthétiser
     text_to_speak = ""
     if args.text:
@@ -303,12 +592,10 @@ def main():
             console.print("[red]Texte vide. Annulation.[/]")
             sys.exit(0)
 
-    # 4.1 Normalisation du texte (Astuce pour VibeVoice/TTS-1)
-    # Les modèles TTS génératifs sont souvent plus stables avec une ponctuation de fin explicite.
-    # Si le texte ne finit pas par une ponctuation forte, on ajoute un point.
-    if text_to_speak and text_to_speak[-1] not in ".!?":
+    # 4.1 Normalisation du texte (voir normalize_text)
+    if normalize_text(text_to_speak) != text_to_speak:
         console.print("[dim]Note: Ajout automatique d'un point final pour améliorer la fin de phrase.[/]")
-        text_to_speak += "."
+        text_to_speak = normalize_text(text_to_speak)
 
     # 4.2 Détermination du mode de sortie
     # Si --output n'est pas spécifié, on ne sauvegarde pas (sauf fichier temporaire pour la lecture)
@@ -328,96 +615,114 @@ def main():
     
     console.print(f" • [cyan]Texte ([/]{len(text_to_speak)} chars[cyan]) :[/] \"{text_to_speak[:100]}{'...' if len(text_to_speak)>100 else ''}\"\n")
 
-    # 6. Exécution de la requête API
-    # On utilise verify=False ici pour simplifier les tests en environnement de développement interne
-    # (si les certificats sont auto-signés). En production réelle, retirez verify=False.
-    with httpx.Client(verify=False) as client:
-        audio_content, duration = generate_speech(
-            client, 
-            args.api_url, 
-            args.api_key, 
-            text_to_speak, 
-            args.voice, 
-            args.model, 
-            args.format,
-            timeout=args.timeout,
-            debug=args.debug
-        )
-
-    # 7. Traitement du résultat (Sauvegarde et/ou Lecture)
-    if audio_content:
-        file_size_kb = len(audio_content) / 1024
-        
-        # Cas A : Sauvegarde demandée explicitement
+    # 6. Ouverture de la destination de l'audio, avant la requête : l'audio y est écrit au fil
+    # du téléchargement dans un fichier temporaire (ou nulle part). Avec --output, ce fichier est
+    # créé à côté de la sortie et ne la remplace (os.replace) qu'une fois l'audio reçu : un échec
+    # ne touche jamais un fichier existant.
+    sink = None
+    temp_path = None
+    try:
         if output_file:
-            try:
-                with open(output_file, "wb") as f:
-                    f.write(audio_content)
-                
-                rprint(Panel(
-                    f"[bold green]Génération réussie ![/]\n\n"
-                    f"Fichier : [bold]{output_file}[/]\n"
-                    f"Taille  : {file_size_kb:.1f} KB\n"
-                    f"Temps   : {duration:.2f} s",
-                    title="Résultat",
-                    border_style="green"
-                ))
-                
-                if args.play:
-                    play_audio(output_file)
-                    
-            except Exception as e:
-                console.print(f"[bold red]Erreur lors de l'écriture du fichier :[/] {e}")
-                sys.exit(1)
-
-        # Cas B : Pas de sauvegarde, mais lecture demandée
+            sink = tempfile.NamedTemporaryFile(dir=os.path.dirname(output_file) or ".", suffix=".tmp", delete=False)
+            temp_path = sink.name
+            # Droits usuels (umask) pour la sortie, plutôt que le 0600 des fichiers temporaires
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
         elif args.play:
+            # Création d'un fichier temporaire pour permettre la lecture par le système
+            # On utilise suffix pour que le lecteur identifie le format (mp3, wav...)
+            sink = tempfile.NamedTemporaryFile(delete=False, suffix=f".{args.format}")
+            temp_path = sink.name
+    except Exception as e:
+        console.print(f"[bold red]Erreur lors de l'écriture du fichier :[/] {e}")
+        sys.exit(1)
+
+    # Exécution de la requête API (avec le client HTTP partagé du module)
+    bytes_written = 0
+    try:
+        try:
+            bytes_written, duration = generate_speech(
+                http_client, 
+                args.api_url, 
+                args.api_key, 
+                text_to_speak, 
+                args.voice, 
+                args.model, 
+                args.format,
+                timeout=args.timeout,
+                debug=args.debug,
+                cache_dir=None if args.no_cache else args.cache_dir,
+                sink=sink
+            )
+        finally:
+            if sink is not None:
+                sink.close()
+        if bytes_written and output_file:
+            os.replace(temp_path, output_file)
+    except OSError as e:
+        console.print(f"[bold red]Erreur lors de l'écriture du fichier :[/] {e}")
+        bytes_written = 0
+    finally:
+        if not bytes_written and temp_path:
+            # En cas d'échec, seul le fichier temporaire est supprimé (jamais la sortie existante)
             try:
-                # Création d'un fichier temporaire pour permettre la lecture par le système
-                # On utilise suffix pour que le lecteur identifie le format (mp3, wav...)
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{args.format}") as temp_file:
-                    temp_file.write(audio_content)
-                    temp_path = temp_file.name
-                
-                rprint(Panel(
-                    f"[bold green]Génération réussie ![/]\n\n"
-                    f"Mode    : Lecture sans sauvegarde\n"
-                    f"Taille  : {file_size_kb:.1f} KB\n"
-                    f"Temps   : {duration:.2f} s",
-                    title="Résultat",
-                    border_style="green"
-                ))
-                
-                play_audio(temp_path)
-                
-                # Nettoyage du fichier temporaire après lecture (ou tentative)
-                # Note : Comme play_audio lance un subprocess, la suppression immédiate pourrait couper le son
-                # si le subprocess est non-bloquant (comme start sous Windows).
-                # Pour cet exemple simple, on laisse le fichier temporaire (il sera nettoyé par l'OS plus tard)
-                # ou on attend un peu. Pour afplay/ffplay c'est bloquant donc on peut supprimer.
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass # On ignore les erreurs de suppression (ex: fichier verrouillé sous Windows)
-                    
-            except Exception as e:
-                console.print(f"[bold red]Erreur lors de la lecture temporaire :[/] {e}")
-                sys.exit(1)
+                os.unlink(temp_path)
+            except OSError:
+                pass
+    if not bytes_written:
+        sys.exit(1)
+
+    # 7. Traitement du résultat (Sauvegarde et/ou Lecture)
+    file_size_kb = bytes_written / 1024
+    
+    # Cas A : Sauvegarde demandée explicitement
+    if output_file:
+        rprint(Panel(
+            f"[bold green]Génération réussie ![/]\n\n"
+            f"Fichier : [bold]{output_file}[/]\n"
+            f"Taille  : {file_size_kb:.1f} KB\n"
+            f"Temps   : {duration:.2f} s",
+            title="Résultat",
+            border_style="green"
+        ))
         
-        # Cas C : Ni sauvegarde ni lecture
-        else:
-            rprint(Panel(
-                f"[bold green]Génération réussie ![/]\n\n"
-                f"[yellow]Aucune action de sortie demandée (--output ou --play).[/]\n"
-                f"Taille  : {file_size_kb:.1f} KB\n"
-                f"Temps   : {duration:.2f} s",
-                title="Résultat",
-                border_style="yellow"
-            ))
+        if args.play:
+            play_audio(output_file)
 
+    # Cas B : Pas de sauvegarde, mais lecture demandée
+    elif args.play:
+        rprint(Panel(
+            f"[bold green]Génération réussie ![/]\n\n"
+            f"Mode    : Lecture sans sauvegarde\n"
+            f"Taille  : {file_size_kb:.1f} KB\n"
+            f"Temps   : {duration:.2f} s",
+            title="Résultat",
+            border_style="green"
+        ))
+        
+        play_audio(temp_path)
+        
+        # Nettoyage du fichier temporaire après lecture (ou tentative)
+        # Note : Comme play_audio lance un subprocess, la suppression immédiate pourrait couper le son
+        # si le subprocess est non-bloquant (comme start sous Windows).
+        # Pour cet exemple simple, on laisse le fichier temporaire (il sera nettoyé par l'OS plus tard)
+        # ou on attend un peu. Pour afplay/ffplay c'est bloquant donc on peut supprimer.
+        try:
+            os.unlink(temp_path)
+        except:
+            pass # On ignore les erreurs de suppression (ex: fichier verrouillé sous Windows)
+    
+    # Cas C : Ni sauvegarde ni lecture (l'audio n'a été conservé que dans le cache, s'il est actif)
     else:
-        # En cas d'échec de la génération (audio_content est None)
-        sys.exit(1)
+        rprint(Panel(
+            f"[bold green]Génération réussie ![/]\n\n"
+            f"[yellow]Aucune action de sortie demandée (--output ou --play).[/]\n"
+            f"Taille  : {file_size_kb:.1f} KB\n"
+            f"Temps   : {duration:.2f} s",
+            title="Résultat",
+            border_style="yellow"
+        ))
 
 if __name__ == "__main__":
     main()
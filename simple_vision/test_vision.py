@@ -6,6 +6,7 @@ Ce script montre comment envoyer une image locale avec une question
 à un modèle de vision (multimodal) et afficher sa réponse.
 """
 import os
+import atexit
 import base64
 import httpx
 import json
@@ -22,6 +23,11 @@ API_KEY = os.getenv("API_KEY")
 MODEL = os.getenv("DEFAULT_MODEL", "granite3.2-vision:2b")
 IMAGE_PATH = "image_example.png" # L'image doit être dans le même répertoire
 
+# Client HTTP partagé par toutes les requêtes du processus : la connexion (TCP + TLS) est réutilisée
+# d'un appel à l'autre, et HTTP/2 permet plusieurs requêtes simultanées sur cette connexion.
+http_client = httpx.Client(http2=True, limits=httpx.Limits(max_keepalive_connections=16, max_connections=32))
+atexit.register(http_client.close)
+
 # --- Fonctions ---
 
 def encode_image_to_base64(image_path: str) -> str:
@@ -111,43 +117,42 @@ def run_vision_test(stream: bool = False):
     print("➡️ Envoi de la requête au LLM de vision...")
     final_answer = ""
     try:
-        with httpx.Client() as client:
-            if not stream:
-                # Mode non-streaming
-                response = client.post(
-                    f"{API_URL}/chat/completions",
-                    headers={"Authorization": f"Bearer {API_KEY}"},
-                    json=payload,
-                    timeout=120, # Les modèles de vision peuvent être plus longs
-                )
+        if not stream:
+            # Mode non-streaming
+            response = http_client.post(
+                f"{API_URL}/chat/completions",
+                headers={"Authorization": f"Bearer {API_KEY}"},
+                json=payload,
+                timeout=120, # Les modèles de vision peuvent être plus longs
+            )
+            response.raise_for_status()
+            response_data = response.json()
+            final_answer = response_data["choices"][0]["message"]["content"]
+        else:
+            # Mode streaming
+            with http_client.stream(
+                "POST",
+                f"{API_URL}/chat/completions",
+                headers={"Authorization": f"Bearer {API_KEY}"},
+                json=payload,
+                timeout=120,
+            ) as response:
                 response.raise_for_status()
-                response_data = response.json()
-                final_answer = response_data["choices"][0]["message"]["content"]
-            else:
-                # Mode streaming
-                with client.stream(
-                    "POST",
-                    f"{API_URL}/chat/completions",
-                    headers={"Authorization": f"Bearer {API_KEY}"},
-                    json=payload,
-                    timeout=120,
-                ) as response:
-                    response.raise_for_status()
-                    print("⏳ Réception de la réponse en streaming...")
-                    for line in response.iter_lines():
-                        if line.startswith("data:"):
-                            data_str = line[len("data: "):]
-                            if data_str.strip() == "[DONE]":
-                                break
-                            try:
-                                chunk = json.loads(data_str)
-                                content = chunk.get("choices", [{}])[0].get("delta", {}).get("content")
-                                if content:
-                                    final_answer += content
-                                    print(content, end="", flush=True)
-                            except json.JSONDecodeError:
-                                print(f"\n⚠️  Avertissement: Impossible de parser le chunk JSON: {data_str}")
-                                continue
+                print("⏳ Réception de la réponse en streaming...")
+                for line in response.iter_lines():
+                    if line.startswith("data:"):
+                        data_str = line[len("data: "):]
+                        if data_str.strip() == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data_str)
+                            content = chunk.get("choices", [{}])[0].get("delta", {}).get("content")
+                            if content:
+                                final_answer += content
+                                print(content, end="", flush=True)
+                        except json.JSONDecodeError:
+                            print(f"\n⚠️  Avertissement: Impossible de parser le chunk JSON: {data_str}")
+                            continue
     except httpx.HTTPStatusError as e:
         print(f"\n❌ Erreur API (HTTP Status): {e}")
         # Essayer de lire le corps de la réponse d'erreur, même en streaming